@@ -1,21 +1,32 @@
 """
 Sentiment analysis and insights endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
-from app.core.database import get_db
+from app.core.database import get_db, replica_reads_allowed
+from app.core.executors import run_with_session
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User
-from app.models.feedback import Feedback
+from app.models.feedback import FeedbackCategory, SentimentCategory
 from app.ml.insight_generator import InsightGenerator
 from app.services.trend_analyzer import TrendAnalyzer
 from app.services.heat_index_calculator import HeatIndexCalculator
+from app.services.week_series import WeekSeriesEngine
+from app.services.analytics_scope import AnalyticsScope
+from app.services.feedback_cube import CubeAnalytics
+from app.services.keyword_index import KeywordIndex
+from app.services.response_cache import versioned_response
+from app.services.report_snapshot import INSIGHT_SECTIONS, current_week_snapshot
+from app.utils.weeks import parse_week_start, week_key, week_keys_back, week_start_from_key
 from pydantic import BaseModel
 
 router = APIRouter()
 
+MAX_WEEKS_BACK = 52  # Longest trend window: bounds the series read and the weeks an ETag covers
+
 
 class TrendResponse(BaseModel):
     current_week: dict
@@ -35,67 +46,57 @@ class InsightResponse(BaseModel):
 
 
 @router.get("/trends", response_model=TrendResponse)
+@versioned_response("trends", weeks_covered=lambda params: 2)
 async def get_trends(
     week_start: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get week-over-week trend analysis"""
-    # Parse week_start if it's a string, or use current week
-    if week_start:
-        try:
-            week_start = datetime.fromisoformat(week_start.replace('Z', '+00:00'))
-        except:
-            try:
-                week_start = datetime.strptime(week_start, '%Y-%m-%d')
-            except:
-                # Default to current week if parsing fails
-                today = datetime.now()
-                week_start = today - timedelta(days=today.weekday())
-    else:
-        # Use current week if not provided
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
     
-    week_end = week_start + timedelta(days=6)
     previous_week_start = week_start - timedelta(days=7)
-    previous_week_end = previous_week_start + timedelta(days=6)
     
-    analyzer = TrendAnalyzer(db)
-    trends = analyzer.calculate_week_over_week_change(
-        week_start, week_end, previous_week_start, previous_week_end
-    )
+    trends = await db.run_sync(lambda session: TrendAnalyzer(session, scope).calculate_week_over_week_change(
+        week_start, previous_week_start
+    ))
     
     return trends
 
 
 @router.get("/insights")
+@versioned_response("insights", weeks_covered=lambda params: 4)  # Momentum looks back 4 weeks
 async def get_insights(
     week_start: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get actionable insights and recommendations"""
-    # Parse week_start if it's a string, or use current week
-    if week_start:
-        try:
-            week_start = datetime.fromisoformat(week_start.replace('Z', '+00:00'))
-        except:
-            try:
-                week_start = datetime.strptime(week_start, '%Y-%m-%d')
-            except:
-                # Default to current week if parsing fails
-                today = datetime.now()
-                week_start = today - timedelta(days=today.weekday())
-    else:
-        # Use current week if not provided
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
+    
+    return await run_with_session("analytics", build_insights, week_start, scope, read_only=replica_reads_allowed(db))
+
+
+def build_insights(db: Session, week_start: datetime, scope: AnalyticsScope) -> dict:
+    """Insights payload of a week for a batch / location scope (runs on the analytics executor)"""
+    # All feedback: the week's report snapshot has every section, unless feedback landed since
+    if scope.is_all:
+        snapshot = current_week_snapshot(db, week_start)
+        if snapshot is not None:
+            return {section: snapshot[section] for section in INSIGHT_SECTIONS}
     
     week_end = week_start + timedelta(days=6)
     previous_week_start = week_start - timedelta(days=7)
     
-    generator = InsightGenerator(db)
+    generator = InsightGenerator(db, scope)
     
     # Generate action items
     action_items = generator.generate_action_items(
@@ -108,28 +109,17 @@ async def get_insights(
     # Detect assessment stress
     assessment_stress = generator.detect_assessment_stress(week_start, week_end)
     
-    # Get feedback for summary
-    feedback_list = db.query(Feedback).filter(
-        Feedback.week_start_date >= week_start,
-        Feedback.week_start_date <= week_end
-    ).all()
+    # Get weekly counts for summary (current and previous week in one query)
+    current_counts, prev_counts = WeekSeriesEngine(db, scope).get_series(week_start, 2)
     
     # Calculate overall sentiment
-    total = len(feedback_list)
-    positive = sum(1 for f in feedback_list 
-                  if f.sentiment_analysis and 
-                  f.sentiment_analysis.sentiment_category.value == "positive")
+    total = current_counts["volume"]
+    positive = current_counts["positive"]
     overall_sentiment = (positive / total * 100) if total > 0 else 0
     
     # Calculate sentiment change
-    prev_feedback = db.query(Feedback).filter(
-        Feedback.week_start_date >= previous_week_start,
-        Feedback.week_start_date < week_start
-    ).all()
-    prev_total = len(prev_feedback)
-    prev_positive = sum(1 for f in prev_feedback 
-                       if f.sentiment_analysis and 
-                       f.sentiment_analysis.sentiment_category.value == "positive")
+    prev_total = prev_counts["volume"]
+    prev_positive = prev_counts["positive"]
     prev_sentiment = (prev_positive / prev_total * 100) if prev_total > 0 else 0
     sentiment_change = overall_sentiment - prev_sentiment if prev_total > 0 else None
     
@@ -164,92 +154,76 @@ async def get_insights(
 
 
 @router.get("/lifecycle")
+@versioned_response("lifecycle")
 async def get_lifecycle_trends(
-    week_start: datetime,
+    week_start: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get trainee lifecycle sentiment trends"""
-    week_end = week_start + timedelta(days=6)
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
     
-    analyzer = TrendAnalyzer(db)
-    trends = analyzer.get_lifecycle_trends(week_start, week_end)
+    trends = await db.run_sync(lambda session: TrendAnalyzer(session, scope).get_lifecycle_trends(week_start))
     
     return trends
 
 
 @router.get("/category-trends")
+@versioned_response("category-trends", weeks_covered=lambda params: params["weeks_back"])
 async def get_category_trends(
     week_start: Optional[str] = None,
-    weeks_back: int = 8,
+    weeks_back: int = Query(8, ge=1, le=MAX_WEEKS_BACK),
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get category-wise trends for 8 weeks"""
-    # Parse week_start if it's a string
-    if week_start:
-        try:
-            week_start = datetime.fromisoformat(week_start.replace('Z', '+00:00'))
-        except:
-            try:
-                week_start = datetime.strptime(week_start, '%Y-%m-%d')
-            except:
-                today = datetime.now()
-                week_start = today - timedelta(days=today.weekday())
-    else:
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
     
-    week_end = week_start + timedelta(days=6)
-    
-    analyzer = TrendAnalyzer(db)
-    trends = analyzer.get_category_trends(week_start, week_end, weeks_back)
+    trends = await db.run_sync(
+        lambda session: TrendAnalyzer(session, scope).get_category_trends(week_start, weeks_back)
+    )
     
     return trends
 
 
 @router.get("/8-week-trends")
+@versioned_response("8-week-trends", weeks_covered=lambda params: params["weeks_back"])
 async def get_8_week_trends(
     week_start: Optional[str] = None,
+    weeks_back: int = Query(8, ge=1, le=MAX_WEEKS_BACK),
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get 8-week sentiment trend data"""
-    # Parse week_start if it's a string
-    if week_start:
-        try:
-            week_start = datetime.fromisoformat(week_start.replace('Z', '+00:00'))
-        except:
-            try:
-                week_start = datetime.strptime(week_start, '%Y-%m-%d')
-            except:
-                today = datetime.now()
-                week_start = today - timedelta(days=today.weekday())
-    else:
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
-    
-    analyzer = TrendAnalyzer(db)
+    """Get 8-week (or `weeks_back`-week) sentiment trend data"""
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
+    
     trends = []
     
-    for i in range(8):
-        week_start_date = week_start - timedelta(weeks=i)
-        week_end_date = week_start_date + timedelta(days=6)
-        
-        feedback = db.query(Feedback).filter(
-            Feedback.week_start_date >= week_start_date,
-            Feedback.week_start_date <= week_end_date
-        ).all()
-        
-        if feedback:
-            sentiment_dist = analyzer._calculate_sentiment_distribution(feedback)
+    # All weeks come back from one grouped query instead of one query per week
+    series = await db.run_sync(lambda session: WeekSeriesEngine(session, scope).get_series(week_start, weeks_back))
+    
+    for week in series:
+        if week["volume"]:
+            sentiment_dist = TrendAnalyzer.distribution_from_counts(week)
             trends.append({
-                "week": week_start_date.isoformat(),
-                "week_label": week_start_date.strftime('%b %d'),
+                "week": week["week_start"].isoformat(),
+                "week_label": week["week_start"].strftime('%b %d'),
                 "positive": sentiment_dist["positive"],
                 "neutral": sentiment_dist["neutral"],
                 "negative": sentiment_dist["negative"],
-                "volume": len(feedback)
+                "volume": week["volume"]
             })
     
     # Reverse to show oldest to newest
@@ -258,33 +232,128 @@ async def get_8_week_trends(
     return {"trends": trends}
 
 
+@router.get("/heat-index-trend")
+@versioned_response("heat-index-trend", weeks_covered=lambda params: params["weeks_back"])
+async def get_heat_index_trend(
+    week_start: Optional[str] = None,
+    weeks_back: int = Query(8, ge=1, le=MAX_WEEKS_BACK),
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the engagement heat index of the last `weeks_back` weeks (oldest to newest)"""
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
+    
+    # Computed from the stored cube components: one grouped query for all weeks
+    series = await db.run_sync(lambda session: CubeAnalytics(session, scope).heat_index_series(week_start, weeks_back))
+    
+    trend = [
+        {
+            "week": week["week_start"].isoformat(),
+            "week_label": week["week_start"].strftime('%b %d'),
+            "heat_index": week["heat_index"],
+            "volume": week["volume"]
+        }
+        for week in reversed(series) if week["volume"]
+    ]
+    
+    return {"trend": trend}
+
+
+@router.get("/heat-index-matrix")
+@versioned_response("heat-index-matrix", weeks_covered=lambda params: params["weeks_back"])
+async def get_heat_index_matrix(
+    week_start: Optional[str] = None,
+    weeks_back: int = Query(8, ge=1, le=MAX_WEEKS_BACK),
+    location: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the engagement heat index per batch and week (None where a batch has no feedback)"""
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, None, location)
+    
+    # Every batch and week from one grouped query over the stored cube components
+    matrix = await db.run_sync(lambda session: CubeAnalytics(session, scope).heat_index_matrix(week_start, weeks_back))
+    
+    # Oldest to newest, like the other trend endpoints
+    keys = week_keys_back(week_key(week_start), weeks_back)[::-1]
+    return {
+        "weeks": [week_start_from_key(key).isoformat() for key in keys],
+        "batches": [
+            {
+                "batch": batch,
+                "heat_index": [weeks[key]["heat_index"] if key in weeks else None for key in keys],
+                "volume": [weeks[key]["volume"] if key in weeks else 0 for key in keys]
+            }
+            for batch, weeks in sorted(matrix.items())
+        ]
+    }
+
+
+@router.get("/top-keywords")
+@versioned_response("top-keywords", weeks_covered=lambda params: params["weeks_back"])
+async def get_top_keywords(
+    week_start: Optional[str] = None,
+    weeks_back: int = Query(8, ge=1, le=MAX_WEEKS_BACK),
+    limit: int = 10,
+    sentiment: Optional[str] = "negative",
+    category: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the most mentioned category keywords of the last `weeks_back` weeks with their weekly counts"""
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
+    
+    try:
+        sentiment = SentimentCategory(sentiment) if sentiment else None
+        category = FeedbackCategory(category) if category else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    # Top-k read over the per-week keyword counts maintained at ingest
+    trend = await db.run_sync(
+        lambda session: KeywordIndex(session, scope).trend(week_start, weeks_back, sentiment, category, limit)
+    )
+    
+    # Oldest to newest, like the other trend endpoints
+    keys = week_keys_back(week_key(week_start), weeks_back)[::-1]
+    return {
+        "weeks": [week_start_from_key(key).isoformat() for key in keys],
+        "keywords": [
+            {
+                "keyword": item["keyword"],
+                "total": item["total"],
+                "counts": [item["weeks"].get(key, 0) for key in keys]
+            }
+            for item in trend
+        ]
+    }
+
+
 @router.get("/category-heatmap")
+@versioned_response("category-heatmap")
 async def get_category_heatmap(
     week_start: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get category sentiment heatmap data"""
-    # Parse week_start if it's a string
-    if week_start:
-        try:
-            week_start = datetime.fromisoformat(week_start.replace('Z', '+00:00'))
-        except:
-            try:
-                week_start = datetime.strptime(week_start, '%Y-%m-%d')
-            except:
-                today = datetime.now()
-                week_start = today - timedelta(days=today.weekday())
-    else:
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
-    
-    week_end = week_start + timedelta(days=6)
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    week_start = parse_week_start(week_start)
+    scope = AnalyticsScope.for_user(current_user, batch, location)
     
-    feedback_list = db.query(Feedback).filter(
-        Feedback.week_start_date >= week_start,
-        Feedback.week_start_date <= week_end
-    ).all()
+    week_categories = (await db.run_sync(lambda session: WeekSeriesEngine(session, scope).get_week(week_start)))["categories"]
     
     # Group by category
     category_data = {}
@@ -298,21 +367,12 @@ async def get_category_heatmap(
     ]
     
     for category in categories:
-        category_data[category] = {
+        category_data[category] = week_categories.get(category, {
             "positive": 0,
             "neutral": 0,
             "negative": 0,
             "total": 0
-        }
-    
-    for feedback in feedback_list:
-        for mapping in feedback.category_mappings:
-            category = mapping.category.value
-            if category in category_data:
-                if feedback.sentiment_analysis:
-                    sentiment = feedback.sentiment_analysis.sentiment_category.value
-                    category_data[category][sentiment] += 1
-                    category_data[category]["total"] += 1
+        })
     
     # Calculate sentiment scores for heatmap (0-100, where 100 is all positive)
     heatmap_data = []
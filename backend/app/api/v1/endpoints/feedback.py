@@ -1,18 +1,28 @@
 """
 Feedback upload and management endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import get_db, replica_configured, SessionLocal, ReadSessionLocal
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User, UserRole
-from app.models.feedback import Feedback, SentimentAnalysis, CategoryMapping, TraineeStage, SentimentCategory, FeedbackCategory
+from app.models.feedback import Feedback, SentimentAnalysis, SentimentCategory
 from app.services.file_processor import FileProcessor
-from app.ml.sentiment_analyzer import sentiment_analyzer
-from app.ml.category_mapper import category_mapper
+from app.services.feedback_ingestor import FeedbackIngestor
+from app.services.feedback_export import EXPORT_FORMATS, export_available, stream_export
+from app.services.feedback_search import SEARCH_SORTS, search_feedback
+from app.services.semantic_index import SemanticIndexUnavailable, similar_feedback
+from app.services.analytics_scope import AnalyticsScope
+from app.services.data_versions import use_replica_for_week_range
 from app.core.config import settings
+from app.core.executors import run_with_session
+from app.utils.weeks import week_key, parse_week_start
+from app.utils.pagination import MAX_PAGE_SIZE, after, decode_cursor, paginate, set_next_cursor
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -31,11 +41,34 @@ class FeedbackResponse(BaseModel):
         from_attributes = True
 
 
+class SearchResult(BaseModel):
+    id: int
+    trainee_id: str
+    location: str
+    training_batch: str
+    week_start_date: datetime
+    rating_score: Optional[int]
+    sentiment_category: Optional[str]
+    score: float
+    snippet: str  # Matched terms wrapped in <mark></mark>
+
+
+class SimilarFeedback(BaseModel):
+    id: int
+    trainee_id: str
+    location: str
+    training_batch: str
+    week_start_date: datetime
+    rating_score: Optional[int]
+    open_text: str
+    score: float  # Cosine similarity, 1 for the same meaning
+
+
 @router.post("/upload")
 async def upload_feedback_file(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload and process feedback file (CSV/Excel)"""
     # Check permissions
@@ -55,78 +88,26 @@ async def upload_feedback_file(
             detail={"errors": result["errors"], "total_rows": result["total_rows"]}
         )
     
-    # Save feedback records
-    saved_count = 0
-    errors = []
+    # Score and save feedback records on the ingest executor
+    def save_records(session: Session):
+        saved_count = 0
+        errors = []
+        
+        ingestor = FeedbackIngestor(session)
+        ingestor.prepare(result["data"])
+        
+        for record in result["data"]:
+            try:
+                ingestor.ingest(record)
+                saved_count += 1
+            except Exception as e:
+                errors.append(f"Error saving record: {str(e)}")
+                continue
+        
+        ingestor.commit()
+        return saved_count, errors
     
-    for record in result["data"]:
-        try:
-            # Determine week dates if not provided
-            week_start = record.get("week_start_date")
-            week_end = record.get("week_end_date")
-            
-            if not week_start:
-                # Default to current week
-                today = datetime.now()
-                week_start = today - timedelta(days=today.weekday())
-                week_end = week_start + timedelta(days=6)
-            
-            # Determine trainee stage (simplified - would need trainee start date)
-            # For now, we'll leave it as None and update later
-            
-            # Create feedback record
-            feedback = Feedback(
-                trainee_id=record["trainee_id"],
-                location=record["location"],
-                training_batch=record["training_batch"],
-                week_start_date=week_start,
-                week_end_date=week_end,
-                rating_score=record["rating_score"],
-                open_text=record["open_text"],
-                category_tags=record.get("category_tags")
-            )
-            
-            db.add(feedback)
-            db.flush()  # Get feedback ID
-            
-            # Perform sentiment analysis
-            sentiment_result = sentiment_analyzer.analyze(record["open_text"])
-            emotional_tone = sentiment_analyzer.detect_emotional_tone(
-                record["open_text"],
-                sentiment_result["sentiment"]
-            )
-            
-            sentiment_analysis = SentimentAnalysis(
-                feedback_id=feedback.id,
-                sentiment_category=SentimentCategory(sentiment_result["sentiment"]),
-                emotional_tone=emotional_tone,
-                confidence_score=sentiment_result["confidence"],
-                raw_sentiment_scores=sentiment_result["scores"]
-            )
-            db.add(sentiment_analysis)
-            
-            # Map categories
-            category_mappings = category_mapper.map_categories(
-                record["open_text"],
-                record.get("category_tags")
-            )
-            
-            for mapping in category_mappings:
-                category_mapping = CategoryMapping(
-                    feedback_id=feedback.id,
-                    category=FeedbackCategory(mapping["category"]),
-                    relevance_score=mapping["relevance_score"],
-                    keywords_matched=mapping["keywords_matched"]
-                )
-                db.add(category_mapping)
-            
-            saved_count += 1
-            
-        except Exception as e:
-            errors.append(f"Error saving record: {str(e)}")
-            continue
-    
-    db.commit()
+    saved_count, errors = await run_with_session("ingest", save_records)
     
     return {
         "message": "File processed successfully",
@@ -139,44 +120,230 @@ async def upload_feedback_file(
 
 @router.get("/", response_model=List[FeedbackResponse])
 async def get_feedback(
+    response: Response,
     week_start: Optional[datetime] = None,
     batch: Optional[str] = None,
     location: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100
+    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)
 ):
-    """Get feedback records with filters"""
-    query = db.query(Feedback)
+    """
+    Get feedback records with filters, in id order
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one
+    (`skip` still works but costs more the deeper it goes, and cannot be
+    combined with `cursor`).
+    """
+    # Only the response columns: open_text and the other wide columns are never read
+    query = select(
+        Feedback.id,
+        Feedback.trainee_id,
+        Feedback.location,
+        Feedback.training_batch,
+        Feedback.rating_score,
+        SentimentAnalysis.sentiment_category,
+        SentimentAnalysis.confidence_score,
+    ).outerjoin(
+        SentimentAnalysis, SentimentAnalysis.feedback_id == Feedback.id
+    )
     
     # Apply role-based filtering
     if current_user.role == UserRole.BATCH_OWNER:
         if current_user.batch_access:
             allowed_batches = current_user.batch_access.split(",")
-            query = query.filter(Feedback.training_batch.in_(allowed_batches))
+            query = query.where(Feedback.training_batch.in_(allowed_batches))
         else:
             # No batch access configured
             return []
     
     # Apply filters
     if week_start:
-        week_end = week_start + timedelta(days=6)
-        query = query.filter(
-            Feedback.week_start_date >= week_start,
-            Feedback.week_start_date <= week_end
-        )
+        query = query.where(Feedback.week_key == week_key(week_start))
     
     if batch:
-        query = query.filter(Feedback.training_batch == batch)
+        query = query.where(Feedback.training_batch == batch)
     
     if location:
-        query = query.filter(Feedback.location == location)
+        query = query.where(Feedback.location == location)
+    
+    if cursor:
+        if skip:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass either skip or cursor, not both")
+        try:
+            query = query.where(after([Feedback.id], decode_cursor(cursor, [int])))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    rows = (await db.execute(query.order_by(Feedback.id).offset(skip).limit(limit + 1))).all()
+    feedback_list, next_cursor = paginate(rows, limit, lambda row: (row.id,))
+    set_next_cursor(response, next_cursor)
+    
+    return [
+        FeedbackResponse(
+            id=row.id,
+            trainee_id=row.trainee_id,
+            location=row.location,
+            training_batch=row.training_batch,
+            rating_score=row.rating_score,
+            sentiment_category=row.sentiment_category.value if row.sentiment_category else None,
+            confidence_score=row.confidence_score,
+        )
+        for row in feedback_list
+    ]
+
+
+@router.get("/search", response_model=List[SearchResult])
+async def search_feedback_text(
+    response: Response,
+    q: str,
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    sort: str = "relevance",
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search feedback texts, best match first (or newest first with sort=recent)
+
+    `q` takes web-search syntax: words, `or`, "phrases" and -excluded words.
+    `week_from` and `week_to` (any day of the first and last week) bound the
+    search. Pass the X-Next-Cursor header of a page as `cursor` to get the
+    next one.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="q must not be empty")
+    if sort not in SEARCH_SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of {', '.join(SEARCH_SORTS)}"
+        )
+    try:
+        first_week = week_key(parse_week_start(week_from, strict=True)) if week_from else None
+        last_week = week_key(parse_week_start(week_to, strict=True)) if week_to else None
+        sentiment = SentimentCategory(sentiment) if sentiment else None
+        after_key = decode_cursor(cursor, [float, int] if sort == "relevance" else [int]) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    limit = max(1, min(limit, 100))
     
-    feedback_list = query.offset(skip).limit(limit).all()
+    # Batch owners only search their own batches
+    scope = AnalyticsScope.for_user(current_user, batch, location)
     
-    return feedback_list
+    rows = await db.run_sync(
+        search_feedback, q, scope, first_week, last_week, sentiment, sort, after_key, limit
+    )
+    results, next_cursor = paginate(
+        rows, limit, lambda row: (row["score"], row["id"]) if sort == "relevance" else (row["id"],)
+    )
+    set_next_cursor(response, next_cursor)
+    
+    return [
+        SearchResult(
+            **{**row, "sentiment_category": row["sentiment_category"].value if row["sentiment_category"] else None}
+        )
+        for row in results
+    ]
 
 
+@router.get("/similar", response_model=List[SimilarFeedback])
+async def find_similar_feedback(
+    q: Optional[str] = None,
+    feedback_id: Optional[int] = None,
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Feedback closest in meaning to a text (`q`) or to a stored feedback (`feedback_id`)
 
+    Paraphrases match without shared words ("laptop keeps freezing" finds
+    "system hangs" once such feedback exists). `week_from` and `week_to`
+    (any day of the first and last week) bound the search.
+    """
+    if (q is None or not q.strip()) == (feedback_id is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass either q or feedback_id")
+    try:
+        first_week = week_key(parse_week_start(week_from, strict=True)) if week_from else None
+        last_week = week_key(parse_week_start(week_to, strict=True)) if week_to else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    limit = max(1, min(limit, 100))
+    
+    # Batch owners only see their own batches
+    scope = AnalyticsScope.for_user(current_user, batch, location)
+    
+    try:
+        return await run_with_session(
+            "analytics", similar_feedback, q, feedback_id, scope, first_week, last_week, limit, read_only=True
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SemanticIndexUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
 
+
+@router.get("/export")
+async def export_feedback(
+    format: str = "csv",
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Export feedback with sentiment and categories as CSV, NDJSON or Parquet
+
+    `week_from` and `week_to` (any day of the first and last week) bound
+    the export; both are optional. The file is streamed in chunks.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of {', '.join(EXPORT_FORMATS)}"
+        )
+    if not export_available(format):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{format} export requires pyarrow"
+        )
+    try:
+        first_week = week_key(parse_week_start(week_from, strict=True)) if week_from else None
+        last_week = week_key(parse_week_start(week_to, strict=True)) if week_to else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    # Apply role-based filtering
+    allowed_batches = None
+    if current_user.role == UserRole.BATCH_OWNER:
+        allowed_batches = current_user.batch_access.split(",") if current_user.batch_access else []
+    
+    # Stream from the analytics replica if it is current for a bounded range
+    read_only = not replica_configured()
+    if first_week is not None and last_week is not None and first_week <= last_week:
+        read_only = await use_replica_for_week_range(db, first_week, last_week)
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"feedback_{first_week or 'start'}_{last_week or 'latest'}.{extension}"
+    # A plain generator: the response iterates it on the threadpool, off the event loop
+    return StreamingResponse(
+        stream_export(
+            ReadSessionLocal if read_only else SessionLocal, format,
+            week_from=first_week, week_to=last_week, batch=batch, location=location,
+            allowed_batches=allowed_batches
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
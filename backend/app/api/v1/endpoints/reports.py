@@ -1,23 +1,33 @@
 """
 Report generation endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import Optional
-from app.core.database import get_db
-from app.core.config import settings
+from typing import List, Optional, Tuple
+from app.core.database import get_db, allow_replica_reads, replica_configured
+from app.core.executors import run_with_session
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User
-from app.models.feedback import Feedback, SentimentAnalysis, SentimentCategory
 from app.models.report import WeeklyReport, ActionItem, ActionPriority, ActionStatus
 from app.services.trend_analyzer import TrendAnalyzer
-from app.services.heat_index_calculator import HeatIndexCalculator
-from app.services.pdf_generator import PDFGenerator
-from app.ml.insight_generator import InsightGenerator
+from app.services.pdf_cache import pdf_filename
+from app.services.pdf_jobs import FAILED, RenderJob, RenderQueueFull, render_queue
+from app.services.report_archive import ArchiveEntry, stream_report_archive
+from app.services.report_snapshot import (
+    build_report_snapshot, ensure_report_snapshot, report_snapshot, snapshot_weeks, stale_reports
+)
+from app.services.data_versions import get_week_versions, use_replica_for_weeks
+from app.utils.weeks import week_key, parse_week_start, shift_week_key
+from app.utils.http_cache import make_etag, latest, is_not_modified, set_validators, not_modified
+from app.utils.pagination import MAX_PAGE_SIZE, after, decode_cursor, paginate, set_next_cursor
 from pydantic import BaseModel
-import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -31,132 +41,141 @@ class WeeklyReportResponse(BaseModel):
     heat_index: float
     total_feedback_count: int
     executive_summary: Optional[str]
+    report_data: Optional[dict]  # Snapshot of every computed section (app.services.report_snapshot)
+    stale: bool = False  # Feedback landed in the snapshot's weeks after it was generated
+    
+    class Config:
+        from_attributes = True
+
+
+class WeeklyReportSummary(BaseModel):
+    """Report listing row (no summary text or report data)"""
+    id: int
+    week_start_date: datetime
+    week_end_date: datetime
+    week_key: Optional[int]
+    overall_sentiment_score: float
+    sentiment_change: Optional[float]
+    heat_index: float
+    total_feedback_count: int
+    positive_count: int
+    neutral_count: int
+    negative_count: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
     
     class Config:
         from_attributes = True
 
 
+BULK_EXPORT_MAX_WEEKS = 53  # Weeks per report archive
+
+# Columns of a listing row (the summary fields)
+SUMMARY_COLUMNS = [getattr(WeeklyReport, field) for field in WeeklyReportSummary.model_fields]
+
+
+def report_validators(db: Session, reports: List[WeeklyReport], *params) -> Tuple[str, Optional[datetime]]:
+    """ETag and Last-Modified for report payloads (report timestamps plus their snapshot weeks' data versions)"""
+    weeks = {report.id: snapshot_weeks(report.week_key) for report in reports if report.week_key is not None}
+    versions = get_week_versions(db, {key for keys in weeks.values() for key in keys})
+    etag = make_etag("reports", params, [
+        (report.id, report.created_at, report.updated_at, [versions[key][0] for key in weeks.get(report.id, [])])
+        for report in reports
+    ])
+    last_modified = latest(
+        [report.updated_at or report.created_at for report in reports] +
+        [updated_at for _, updated_at in versions.values()]
+    )
+    return etag, last_modified
+
+
+async def load_reports(db: AsyncSession, query, entities: bool = True) -> List:
+    """
+    Reports matching `query`, from the analytics replica unless it lags behind their weeks
+
+    Returns WeeklyReport objects, or the rows of a column query when
+    `entities` is False.
+    """
+    async def fetch(query):
+        result = await db.execute(query)
+        return (result.scalars() if entities else result).all()
+    
+    allow_replica_reads(db)
+    reports = await fetch(query)
+    if replica_configured():
+        weeks = {report.week_key for report in reports if report.week_key is not None}
+        if not await use_replica_for_weeks(db, weeks):
+            reports = await fetch(query.execution_options(populate_existing=True))
+    # Validators always reflect the primary's data versions
+    allow_replica_reads(db, False)
+    return reports
+
+
 @router.post("/weekly/generate")
 async def generate_weekly_report(
     week_start: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Generate weekly sentiment analysis report"""
-    # Parse week_start if it's a string
-    if isinstance(week_start, str):
-        try:
-            week_start = datetime.fromisoformat(week_start.replace('Z', '+00:00'))
-        except:
-            # Try parsing as date string
-            try:
-                week_start = datetime.strptime(week_start, '%Y-%m-%d')
-            except:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid week_start format. Use ISO format or YYYY-MM-DD"
-                )
-    
-    # If no week_start provided, use current week
-    if week_start is None:
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
+    # Normalize week_start to the start of its ISO week (current week if missing)
+    try:
+        week_start = parse_week_start(week_start, strict=True)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    week_end = week_start + timedelta(days=6)
-    previous_week_start = week_start - timedelta(days=7)
-    previous_week_end = previous_week_start + timedelta(days=6)
+    report = await run_with_session("analytics", save_weekly_report, week_start)
     
-    # Get feedback for the week
-    feedback_list = db.query(Feedback).filter(
-        Feedback.week_start_date >= week_start,
-        Feedback.week_start_date <= week_end
-    ).all()
+    # Pre-render the PDF in the background; exports of this version then find it ready
+    try:
+        render_queue.submit(report)
+    except RenderQueueFull as e:
+        logger.warning(f"PDF of report {report.id} not pre-rendered: {e}")
+    
+    return report
+
+
+def save_weekly_report(db: Session, week_start: datetime) -> WeeklyReport:
+    """Compute and store the report of a week and its snapshot (runs on the analytics executor)"""
+    report_week_key = week_key(week_start)
+    week_end = week_start + timedelta(days=6)
     
-    if not feedback_list:
+    snapshot = build_report_snapshot(db, week_start)
+    overview = snapshot["overview"]
+    if not overview["total_feedback_count"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No feedback found for the specified week"
         )
     
-    # Calculate sentiment distribution
-    total = len(feedback_list)
-    positive = sum(1 for f in feedback_list 
-                  if f.sentiment_analysis and 
-                  f.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE)
-    neutral = sum(1 for f in feedback_list 
-                 if f.sentiment_analysis and 
-                 f.sentiment_analysis.sentiment_category == SentimentCategory.NEUTRAL)
-    negative = sum(1 for f in feedback_list 
-                  if f.sentiment_analysis and 
-                  f.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE)
-    
-    overall_sentiment = (positive / total * 100) if total > 0 else 0
-    
-    # Calculate week-over-week change
-    prev_feedback = db.query(Feedback).filter(
-        Feedback.week_start_date >= previous_week_start,
-        Feedback.week_start_date <= previous_week_end
-    ).all()
-    prev_total = len(prev_feedback)
-    prev_positive = sum(1 for f in prev_feedback 
-                       if f.sentiment_analysis and 
-                       f.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE)
-    prev_sentiment = (prev_positive / prev_total * 100) if prev_total > 0 else 0
-    sentiment_change = overall_sentiment - prev_sentiment if prev_total > 0 else None
-    
-    # Calculate heat index
-    calculator = HeatIndexCalculator()
-    heat_index = calculator.calculate(feedback_list)
-    
-    # Generate insights
-    generator = InsightGenerator(db)
-    action_items_data = generator.generate_action_items(
-        week_start, week_end, previous_week_start
-    )
-    
-    # Generate top strengths and concerns from actual data
-    strengths_concerns = generator.generate_top_strengths_and_concerns(week_start, week_end)
-    top_strengths = strengths_concerns["strengths"]
-    top_concerns = strengths_concerns["concerns"]
-    
-    executive_summary = generator.generate_executive_summary(
-        week_start, week_end, overall_sentiment, sentiment_change,
-        top_strengths, top_concerns
-    )
-    
     # Create or update report
     existing_report = db.query(WeeklyReport).filter(
-        WeeklyReport.week_start_date == week_start
+        WeeklyReport.week_key == report_week_key
     ).first()
     
     if existing_report:
-        existing_report.overall_sentiment_score = overall_sentiment
-        existing_report.sentiment_change = sentiment_change
-        existing_report.heat_index = heat_index
-        existing_report.total_feedback_count = total
-        existing_report.positive_count = positive
-        existing_report.neutral_count = neutral
-        existing_report.negative_count = negative
-        existing_report.executive_summary = executive_summary
         report = existing_report
+        for field, value in overview.items():
+            setattr(report, field, value)
+        report.executive_summary = snapshot["executive_summary"]
+        report.report_data = snapshot
     else:
         report = WeeklyReport(
             week_start_date=week_start,
             week_end_date=week_end,
-            overall_sentiment_score=overall_sentiment,
-            sentiment_change=sentiment_change,
-            heat_index=heat_index,
-            total_feedback_count=total,
-            positive_count=positive,
-            neutral_count=neutral,
-            negative_count=negative,
-            executive_summary=executive_summary
+            week_key=report_week_key,
+            executive_summary=snapshot["executive_summary"],
+            report_data=snapshot,
+            **overview
         )
         db.add(report)
         db.flush()
     
     # Create action items
-    for item_data in action_items_data:
+    for item_data in snapshot["action_items"]:
         action_item = ActionItem(
             report_id=report.id,
             priority=ActionPriority(item_data["priority"]),
@@ -177,11 +196,14 @@ async def generate_weekly_report(
 @router.get("/weekly/{week_id}", response_model=WeeklyReportResponse)
 async def get_weekly_report(
     week_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get weekly report by ID"""
-    report = db.query(WeeklyReport).filter(WeeklyReport.id == week_id).first()
+    reports = await load_reports(db, select(WeeklyReport).where(WeeklyReport.id == week_id))
+    report = reports[0] if reports else None
     
     if not report:
         raise HTTPException(
@@ -189,32 +211,70 @@ async def get_weekly_report(
             detail="Report not found"
         )
     
-    return report
+    etag, last_modified = await db.run_sync(report_validators, [report])
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    
+    stale = await db.run_sync(stale_reports, [report])
+    return WeeklyReportResponse.model_validate(report).model_copy(update={"stale": report.id in stale})
 
 
-@router.get("/weekly")
+@router.get("/weekly", response_model=List[WeeklyReportSummary])
 async def list_weekly_reports(
-    skip: int = 0,
-    limit: int = 10,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """List weekly reports"""
-    reports = db.query(WeeklyReport).order_by(
-        WeeklyReport.week_start_date.desc()
-    ).offset(skip).limit(limit).all()
+    """
+    List weekly reports, newest week first
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one
+    (`skip` still works but costs more the deeper it goes, and cannot be
+    combined with `cursor`).
+    """
+    order = [WeeklyReport.week_start_date, WeeklyReport.id]
+    query = select(*SUMMARY_COLUMNS)
+    if cursor:
+        if skip:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass either skip or cursor, not both")
+        try:
+            query = query.where(after(order, decode_cursor(cursor, [datetime, int]), descending=True))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    rows = await load_reports(db, query.order_by(
+        *(column.desc() for column in order)
+    ).offset(skip).limit(limit + 1), entities=False)
+    reports, next_cursor = paginate(rows, limit, lambda row: (row.week_start_date, row.id))
+    
+    etag, last_modified = await db.run_sync(report_validators, reports, skip, limit, cursor)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    set_next_cursor(response, next_cursor)
     
     return reports
 
 
-@router.get("/export/pdf/{week_id}")
-async def export_pdf_report(
-    week_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Export weekly report as PDF"""
-    report = db.query(WeeklyReport).filter(WeeklyReport.id == week_id).first()
+class PDFJobResponse(BaseModel):
+    """Status of a report PDF render"""
+    job_id: str
+    report_id: int
+    status: str  # queued, rendering, ready or failed
+    position: int  # Renders queued ahead of this one
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+
+async def submit_pdf_job(db: AsyncSession, week_id: int) -> RenderJob:
+    """Queue the PDF render of a report (ready at once when its content is cached)"""
+    report = await db.get(WeeklyReport, week_id)
     
     if not report:
         raise HTTPException(
@@ -222,24 +282,154 @@ async def export_pdf_report(
             detail="Report not found"
         )
     
-    # Generate PDF
-    pdf_dir = os.path.join(settings.UPLOAD_DIR, "pdfs")
-    os.makedirs(pdf_dir, exist_ok=True)
+    # Reports generated before snapshots get one first: the PDF renders from it alone
+    if report_snapshot(report) is None:
+        await run_with_session("analytics", ensure_report_snapshot, report.id)
+        await db.refresh(report)
     
-    pdf_filename = f"report_{week_id}_{report.week_start_date.strftime('%Y%m%d')}.pdf"
-    pdf_path = os.path.join(pdf_dir, pdf_filename)
+    try:
+        return render_queue.submit(report)
+    except RenderQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+
+
+async def pdf_download(db: AsyncSession, job: RenderJob) -> FileResponse:
+    """The rendered PDF of a finished job"""
+    if job.status == FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"PDF rendering failed: {job.error}"
+        )
+    report = await db.get(WeeklyReport, job.report_id)
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report not found"
+        )
+    return FileResponse(
+        job.path,
+        media_type="application/pdf",
+        filename=pdf_filename(report)
+    )
+
+
+@router.post("/export/pdf/{week_id}", response_model=PDFJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_pdf_export(
+    week_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Queue the PDF export of a weekly report
+
+    Poll GET /export/jobs/{job_id} until its status is "ready", then
+    download it from GET /export/jobs/{job_id}/pdf.
+    """
+    job = await submit_pdf_job(db, week_id)
+    return render_queue.describe(job)
+
+
+@router.get("/export/jobs/{job_id}", response_model=PDFJobResponse)
+async def get_pdf_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Status of a PDF export"""
+    job = render_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    return render_queue.describe(job)
+
+
+@router.get("/export/jobs/{job_id}/pdf")
+async def download_pdf_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Download the PDF of a finished export"""
+    job = render_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    if not job.done:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"PDF is not ready yet ({job.status})"
+        )
+    return await pdf_download(db, job)
+
+
+@router.get("/export/archive")
+async def export_report_archive(
+    week_from: str,
+    week_to: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Export the weekly reports of a week range as a ZIP archive
+
+    `week_from` and `week_to` are any day of the first and last week (at
+    most BULK_EXPORT_MAX_WEEKS weeks). The archive holds each week's PDF and
+    JSON plus manifest.json, and is streamed as the PDFs finish rendering.
+    """
+    try:
+        first_week = week_key(parse_week_start(week_from, strict=True))
+        last_week = week_key(parse_week_start(week_to, strict=True))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if first_week > last_week or shift_week_key(first_week, BULK_EXPORT_MAX_WEEKS) <= last_week:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"week_from must not be after week_to, and the range spans at most {BULK_EXPORT_MAX_WEEKS} weeks"
+        )
     
-    generator = PDFGenerator(db)
-    generator.generate_pdf(report, pdf_path)
+    result = await db.execute(select(WeeklyReport).where(
+        WeeklyReport.week_key >= first_week, WeeklyReport.week_key <= last_week
+    ).order_by(WeeklyReport.week_key))
+    reports = result.scalars().all()
+    if not reports:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No reports found for the specified weeks"
+        )
     
-    # Update report with PDF path
-    report.pdf_path = pdf_path
-    db.commit()
+    # Reports generated before snapshots get one first: the PDF renders from it alone
+    for report in reports:
+        if report_snapshot(report) is None:
+            await run_with_session("analytics", ensure_report_snapshot, report.id)
+            await db.refresh(report)
+    stale = await db.run_sync(stale_reports, reports)
+    entries = [
+        ArchiveEntry(report, WeeklyReportResponse.model_validate(report).model_copy(
+            update={"stale": report.id in stale}
+        ).model_dump(mode="json"))
+        for report in reports
+    ]
     
-    # Return file
-    return FileResponse(
-        pdf_path,
-        media_type="application/pdf",
-        filename=pdf_filename
+    return StreamingResponse(
+        stream_report_archive(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="reports_{first_week}_{last_week}.zip"'}
     )
 
+
+@router.get("/export/pdf/{week_id}")
+async def export_pdf_report(
+    week_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Export weekly report as PDF (waits for the render; see POST /export/pdf/{week_id})"""
+    job = await render_queue.wait(await submit_pdf_job(db, week_id))
+    return await pdf_download(db, job)
@@ -2,15 +2,19 @@
 API endpoint for automated data sync
 """
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime, timedelta
 from app.core.database import get_db
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User, UserRole
+from app.core.config import settings
+from app.core.executors import run_with_session
 from app.services.file_processor import FileProcessor
-from app.ml.sentiment_analyzer import SentimentAnalyzer
-from app.ml.category_mapper import CategoryMapper
+from app.services.feedback_ingestor import FeedbackIngestor
+from app.utils.weeks import parse_week_start
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,7 +27,7 @@ async def sync_upload_feedback(
     file: UploadFile = File(...),
     week_start: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Automated sync endpoint for feedback data upload.
@@ -51,12 +55,10 @@ async def sync_upload_feedback(
         )
     
     try:
-        # Read file content
-        contents = await file.read()
-        
         # Process file
-        processor = FileProcessor()
-        feedback_data = processor.process_file(contents, file.filename)
+        processor = FileProcessor(settings.UPLOAD_DIR)
+        result = await processor.process_file(file)
+        feedback_data = result["data"]
         
         if not feedback_data:
             raise HTTPException(
@@ -64,82 +66,42 @@ async def sync_upload_feedback(
                 detail="No valid feedback data found in file"
             )
         
-        # Parse week_start if provided
-        week_start_date = None
-        if week_start:
-            try:
-                week_start_date = datetime.fromisoformat(week_start.replace('Z', '+00:00'))
-            except:
-                try:
-                    week_start_date = datetime.strptime(week_start, '%Y-%m-%d')
-                except:
-                    pass
-        
-        # Process feedback with sentiment analysis
-        analyzer = SentimentAnalyzer()
-        category_mapper = CategoryMapper()
+        # An explicit week_start overrides the dates in the file
+        week_start_date = parse_week_start(week_start) if week_start else None
         
-        processed_count = 0
-        for data in feedback_data:
-            # Use provided week_start or extract from data
-            if not week_start_date and data.get('week_start_date'):
-                try:
-                    week_start_date = datetime.fromisoformat(str(data['week_start_date']))
-                except:
-                    pass
-            
-            # If still no week_start, use current week
-            if not week_start_date:
-                today = datetime.now()
-                week_start_date = today - timedelta(days=today.weekday())
-            
-            # Import models
-            from app.models.feedback import Feedback, SentimentAnalysis, FeedbackCategory, CategoryMapping
+        # Score and store through the same pipeline as /feedback/upload
+        def save_records(session: Session):
+            ingestor = FeedbackIngestor(session)
             
-            feedback = Feedback(
-                trainee_id=data.get('trainee_id', ''),
-                location=data.get('location', ''),
-                training_batch=data.get('training_batch', ''),
-                rating_score=data.get('rating_score'),
-                open_text=data.get('open_text', ''),
-                week_start_date=week_start_date
-            )
-            db.add(feedback)
-            db.flush()
-            
-            # Perform sentiment analysis
-            sentiment_result = analyzer.analyze(data.get('open_text', ''))
-            sentiment_analysis = SentimentAnalysis(
-                feedback_id=feedback.id,
-                sentiment_category=sentiment_result['sentiment'],
-                confidence_score=sentiment_result['confidence'],
-                emotional_tone=sentiment_result.get('emotional_tone')
-            )
-            db.add(sentiment_analysis)
+            if week_start_date:
+                for data in feedback_data:
+                    data["week_start_date"] = week_start_date
+                    data["week_end_date"] = week_start_date + timedelta(days=6)
+            ingestor.prepare(feedback_data)
             
-            # Map categories
-            categories = category_mapper.map_categories(data.get('open_text', ''), data.get('category_tags'))
-            for cat, keywords in categories.items():
-                category_mapping = CategoryMapping(
-                    feedback_id=feedback.id,
-                    category=FeedbackCategory(cat),
-                    keywords_matched=keywords
-                )
-                db.add(category_mapping)
+            synced_week_start = week_start_date
+            processed_count = 0
+            for data in feedback_data:
+                feedback = ingestor.ingest(data)
+                synced_week_start = synced_week_start or feedback.week_start_date
+                processed_count += 1
             
-            processed_count += 1
+            ingestor.commit()
+            return synced_week_start, processed_count
         
-        db.commit()
+        synced_week_start, processed_count = await run_with_session("ingest", save_records)
         
         return {
             "message": "Feedback data synced successfully",
             "processed_count": processed_count,
-            "week_start": week_start_date.isoformat() if week_start_date else None
+            "week_start": synced_week_start.isoformat() if synced_week_start else None
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error syncing feedback data: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing file: {str(e)}"
@@ -149,17 +111,16 @@ async def sync_upload_feedback(
 @router.get("/status")
 async def get_sync_status(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get sync status and last sync time"""
     from app.models.feedback import Feedback
-    from sqlalchemy import func
     
     # Get last feedback entry
-    last_feedback = db.query(Feedback).order_by(Feedback.created_at.desc()).first()
+    last_feedback = await db.scalar(select(Feedback).order_by(Feedback.created_at.desc()).limit(1))
     
     # Get total feedback count
-    total_count = db.query(func.count(Feedback.id)).scalar()
+    total_count = await db.scalar(select(func.count(Feedback.id)))
     
     return {
         "last_sync": last_feedback.created_at.isoformat() if last_feedback else None,
@@ -3,7 +3,7 @@ Application configuration settings
 """
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import List, Union
+from typing import List, Optional, Union
 import os
 import json
 
@@ -18,7 +18,28 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./feedback.db"
+    ANALYTICS_DATABASE_URL: Optional[str] = None  # Read replica for analysis, report listing and export reads
     
+    # SQLite connection profile (ignored for other databases)
+    SQLITE_WAL: bool = True  # Write-ahead log: reads proceed during writes
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Durable with WAL except on power loss; "FULL" to fsync every commit
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait this long for a lock before "database is locked"
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # Page cache per connection
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Bytes of the file read through mmap (0 disables)
+    
+    # Week-partitioned feedback tables (PostgreSQL only, see app/utils/partitioning.py)
+    FEEDBACK_PARTITIONING: bool = False  # Convert existing tables on the next startup when enabled
+    FEEDBACK_PARTITION_PERIOD: str = "month"  # "week" or "month"; keep it once partitions exist
+    FEEDBACK_PARTITIONS_AHEAD: int = 2  # Future periods created at startup
+    
+    # Cold-data archive of raw feedback (see app/services/feedback_archive.py)
+    ARCHIVE_DIR: str = "./archive"  # Week-partitioned Parquet files
+    ARCHIVE_AFTER_WEEKS: int = 52  # Weeks older than this move out of the database
+    ARCHIVE_COMPRESSION: str = "zstd"  # Parquet codec ("zstd", "snappy", "gzip" or "none"), also used by exports
+    
+    # Bulk feedback export (GET /feedback/export)
+    EXPORT_CHUNK_ROWS: int = 5000  # Rows fetched (yield_per) and encoded per chunk
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     
@@ -33,11 +54,47 @@ class Settings(BaseSettings):
     # File Upload
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     UPLOAD_DIR: str = "./uploads"
+    PDF_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # Rendered report PDFs kept under UPLOAD_DIR/pdfs
+    PDF_QUEUE_SIZE: int = 64  # PDF renders queued or running at once (see app/services/pdf_jobs.py)
+    PDF_JOBS_KEPT: int = 256  # Finished render jobs kept for status queries
     
     # ML Model
     SENTIMENT_MODEL: str = "cardiffnlp/twitter-roberta-base-sentiment-latest"
     DEVICE: str = "cpu"  # or "cuda" for GPU
     
+    # Analytics
+    ANALYTICS_FRAME_CACHE_WEEKS: int = 64  # Week frames kept in memory by the columnar engine
+    ANALYTICS_BACKEND: str = "cube"  # "cube" (pre-aggregated rollups), "columnar" (in-process NumPy) or "duckdb"
+    ANALYTICS_DUCKDB_SOURCE: str = "auto"  # "sqlite" (attach the database file), "parquet" or "auto"
+    ANALYTICS_SNAPSHOT_DIR: str = "./analytics_snapshots"  # Parquet snapshots read by DuckDB
+    
+    # Semantic similarity index (GET /feedback/similar, see app/services/semantic_index.py)
+    SEMANTIC_INDEX_ENABLED: bool = True
+    SEMANTIC_INDEX_DIR: str = "./semantic_index"  # Fitted projection and per-week vector segments
+    SEMANTIC_DIMENSIONS: int = 128  # Vector size (float32)
+    SEMANTIC_HASH_FEATURES: int = 2 ** 16  # Hashed word and bigram features
+    SEMANTIC_FIT_SAMPLE: int = 50000  # Feedback texts the projection is fitted on
+    SEMANTIC_MIN_FEEDBACK: int = 50  # Feedback needed before the index is built automatically
+    SEMANTIC_BLOCK_ROWS: int = 65536  # Vectors scored per matrix product
+    
+    # Response cache (analysis endpoints)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIZE: int = 512  # Entries kept in the in-process LRU
+    RESPONSE_CACHE_REDIS: bool = False  # Also share cached responses through REDIS_URL
+    RESPONSE_CACHE_TTL: int = 24 * 60 * 60  # Seconds (Redis tier only)
+    
+    # Executors for CPU-heavy work (pool size per workload, see app/core/executors.py)
+    EXECUTOR_AUTH_WORKERS: int = 4  # Password hashing and verification
+    EXECUTOR_ANALYTICS_WORKERS: int = 4  # Insights and weekly report generation
+    EXECUTOR_INGEST_WORKERS: int = 2  # Upload parsing, scoring and storage
+    EXECUTOR_PDF_WORKERS: int = 2  # PDF rendering
+    EXECUTOR_PDF_PROCESSES: bool = True  # Render PDFs in worker processes (threads when False)
+    
+    # Event loop lag monitor
+    LOOP_LAG_INTERVAL_MS: int = 100  # Sampling interval
+    LOOP_LAG_WINDOW: int = 600  # Samples kept for percentiles (one minute at 100 ms)
+    LOOP_LAG_WARN_MS: int = 250  # Log a warning when a sample exceeds this
+    
     @field_validator('CORS_ORIGINS', mode='before')
     @classmethod
     def parse_cors_origins(cls, v):
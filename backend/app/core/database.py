@@ -1,38 +1,165 @@
 """
 Database connection and session management
+
+The API runs on an async engine (aiosqlite for SQLite, asyncpg for
+PostgreSQL) so a query waiting on the database does not block the event
+loop. Synchronous engines serve startup (table creation, migrations,
+seeding), command-line scripts and executor work: a writer engine for
+ingest and report generation, and a reader engine for read-only analytics.
+
+SQLite connections are tuned on connect: WAL journaling (readers no longer
+wait for a long upload transaction), synchronous=NORMAL, a larger page
+cache, memory-mapped reads and a busy timeout instead of immediate
+"database is locked" errors. Reader connections are also query-only.
+
+With ANALYTICS_DATABASE_URL set, the reader engines point at that read
+replica. Request sessions are routing sessions: they write to the primary
+and read from the replica only after `allow_replica_reads` (see
+`app.services.data_versions.use_replica_for_weeks` for the lag guard).
 """
-from sqlalchemy import create_engine
+from typing import AsyncIterator, Optional, Union
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
 
-# SQLite requires different connection arguments
-if settings.DATABASE_URL.startswith("sqlite"):
-    # SQLite configuration
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},  # Required for SQLite
-        echo=False  # Set to True for SQL query logging
-    )
-else:
+# Async driver for each synchronous URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Async equivalent of a database URL (e.g. sqlite:/// -> sqlite+aiosqlite:///)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def apply_sqlite_pragmas(dbapi_connection, read_only: bool = False) -> None:
+    """Apply the SQLite settings profile to a new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")  # Persistent, stored in the database file
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")  # Negative: KiB, not pages
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _tune_sqlite(engine: Engine, read_only: bool = False) -> None:
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, read_only)
+
+
+def create_sync_engine(url: str, read_only: bool = False) -> Engine:
+    """Synchronous engine for `url`, with the SQLite profile applied to SQLite databases"""
+    if is_sqlite(url):
+        # SQLite configuration
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},  # Required for SQLite
+            echo=False  # Set to True for SQL query logging
+        )
+        _tune_sqlite(engine, read_only)
+        return engine
     # PostgreSQL configuration
-    engine = create_engine(
-        settings.DATABASE_URL,
+    return create_engine(
+        url,
         pool_pre_ping=True,
         pool_size=10,
         max_overflow=20,
     )
 
+
+def create_async_app_engine(url: str, read_only: bool = False) -> AsyncEngine:
+    """Async engine for the synchronous URL `url`"""
+    if is_sqlite(url):
+        async_engine = create_async_engine(async_database_url(url), echo=False)
+        _tune_sqlite(async_engine.sync_engine, read_only)
+        return async_engine
+    return create_async_engine(
+        async_database_url(url),
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20,
+    )
+
+
+# Writer: ingest, report generation, startup and scripts
+engine = create_sync_engine(settings.DATABASE_URL)
+async_engine = create_async_app_engine(settings.DATABASE_URL)
+
+# Reader: read-only executor work (insights, PDF rendering) and routed request
+# reads. The analytics replica when configured; otherwise SQLite gets its own
+# query-only connections and other databases share the writer's pool.
+if settings.ANALYTICS_DATABASE_URL:
+    read_engine = create_sync_engine(settings.ANALYTICS_DATABASE_URL, read_only=True)
+    async_read_engine: Optional[AsyncEngine] = create_async_app_engine(settings.ANALYTICS_DATABASE_URL, read_only=True)
+else:
+    read_engine = create_sync_engine(settings.DATABASE_URL, read_only=True) if is_sqlite(settings.DATABASE_URL) else engine
+    async_read_engine = None
+
+# Session.info key set by `allow_replica_reads`
+REPLICA_READS = "replica_reads"
+
+
+def replica_configured() -> bool:
+    return async_read_engine is not None
+
+
+def allow_replica_reads(db: Union[Session, AsyncSession], allowed: bool = True) -> None:
+    """Let `db` send its reads to the analytics replica (writes always go to the primary)"""
+    db.info[REPLICA_READS] = allowed
+
+
+def replica_reads_allowed(db: Union[Session, AsyncSession]) -> bool:
+    return db.info.get(REPLICA_READS, False)
+
+
+class RoutingSession(Session):
+    """Session that reads from the analytics replica once `allow_replica_reads` is set"""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            async_read_engine is not None
+            and self.info.get(REPLICA_READS)
+            and not self._flushing
+            and not getattr(clause, "is_dml", False)
+        ):
+            return async_read_engine.sync_engine
+        return async_engine.sync_engine
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Objects stay usable after commit: async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency for getting an async database session
 
+    Services written against the synchronous Session API run on the same
+    connection through `await db.run_sync(...)`.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,174 @@
+"""
+Bounded executors for CPU-heavy work
+
+Every workload has its own pool, sized in Settings, so a burst of one kind
+of work (say PDF exports) cannot starve another (logins), and none of it
+runs on the event loop. Callers beyond a pool's size wait on an asyncio
+semaphore rather than piling up in an unbounded executor queue.
+
+Workloads:
+    auth       password hashing and verification (threads: pbkdf2 releases the GIL)
+    analytics  insights and weekly report generation (threads)
+    ingest     upload parsing, scoring and storage (threads)
+    pdf        PDF rendering (processes: ReportLab is pure Python)
+
+Work that needs the database gets its own synchronous session through
+`run_with_session`; sessions are never shared with the request's
+AsyncSession.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+import asyncio
+import multiprocessing
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal, ReadSessionLocal, create_sync_engine
+
+
+class Workload:
+    """A bounded pool for one kind of work, created on first use"""
+
+    def __init__(self, name: str, workers: int, processes: bool = False):
+        self.name = name
+        self.workers = max(1, workers)
+        self.processes = processes
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self._executor: Optional[Executor] = None
+        self._executor_lock = Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.processes:
+                    # Spawned, not forked: the parent has an event loop and driver threads
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"{self.name}-worker")
+            return self._executor
+
+    def _bound(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one loop; test clients may run several in turn
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    async def run(self, func: Callable, *args, started: Optional[Callable[[], None]] = None) -> Any:
+        """Run `func(*args)` on the pool, waiting for a free worker first (then calling `started`)"""
+        semaphore = self._bound()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        loop = asyncio.get_running_loop()
+        try:
+            if started is not None:
+                started()
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self._finished(semaphore)
+            raise
+        # Released when the work ends, not when the caller stops waiting: a cancelled caller's call keeps running
+        future.add_done_callback(lambda _: self._release(loop, semaphore))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore) -> None:
+        # Called on the worker thread (or the process pool's management thread)
+        try:
+            loop.call_soon_threadsafe(self._finished, semaphore)
+        except RuntimeError:  # The loop is closed; its semaphore went with it
+            pass
+
+    def _finished(self, semaphore: asyncio.Semaphore) -> None:
+        self.active -= 1
+        self.completed += 1
+        semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "kind": "processes" if self.processes else "threads",
+            "workers": self.workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+        }
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+workloads: Dict[str, Workload] = {
+    "auth": Workload("auth", settings.EXECUTOR_AUTH_WORKERS),
+    "analytics": Workload("analytics", settings.EXECUTOR_ANALYTICS_WORKERS),
+    "ingest": Workload("ingest", settings.EXECUTOR_INGEST_WORKERS),
+    "pdf": Workload("pdf", settings.EXECUTOR_PDF_WORKERS, processes=settings.EXECUTOR_PDF_PROCESSES),
+}
+
+
+async def run_blocking(workload: str, func: Callable, *args) -> Any:
+    """Run a CPU-heavy call on the workload's pool"""
+    return await workloads[workload].run(func, *args)
+
+
+async def run_with_session(
+    workload: str,
+    func: Callable[..., Any],
+    *args,
+    read_only: bool = False,
+    started: Optional[Callable[[], None]] = None
+) -> Any:
+    """
+    Run `func(db, *args)` on the workload's pool with a synchronous session
+
+    `read_only` work gets a reader session, everything else the writer.
+    `started` is called once a worker is free and the call is handed to it.
+    Process pools receive the database URL and open their own engine, so
+    `func` and `args` must be picklable there.
+    """
+    database_url = None
+    if workloads[workload].processes:
+        session_factory = ReadSessionLocal if read_only else SessionLocal
+        database_url = session_factory.kw["bind"].url.render_as_string(hide_password=False)
+    return await workloads[workload].run(_call_with_session, database_url, read_only, func, *args, started=started)
+
+
+_worker_engines: Dict[Tuple[str, bool], Engine] = {}
+_worker_engines_lock = Lock()
+
+
+def _call_with_session(database_url: Optional[str], read_only: bool, func: Callable[..., Any], *args) -> Any:
+    if database_url is None:
+        db = ReadSessionLocal() if read_only else SessionLocal()
+    else:
+        with _worker_engines_lock:
+            engine = _worker_engines.get((database_url, read_only))
+            if engine is None:
+                engine = _worker_engines[(database_url, read_only)] = create_sync_engine(database_url, read_only)
+        db = Session(bind=engine, autoflush=False)
+    try:
+        return func(db, *args)
+    finally:
+        db.close()
+
+
+def executor_stats() -> Dict[str, Dict]:
+    return {name: workload.stats() for name, workload in workloads.items()}
+
+
+def shutdown_executors() -> None:
+    for workload in workloads.values():
+        workload.shutdown()
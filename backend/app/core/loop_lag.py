@@ -0,0 +1,70 @@
+"""
+Event loop lag monitor
+
+A background task sleeps for a fixed interval and records how late it
+wakes up. Anything holding the event loop (a blocking query, CPU work in
+a handler) shows up directly as lag.
+"""
+from typing import Dict, Optional
+from collections import deque
+import asyncio
+import contextlib
+import logging
+import statistics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Samples the running loop's scheduling delay every `interval_ms`"""
+
+    def __init__(self, interval_ms: int, window: int, warn_ms: Optional[int] = None):
+        self.interval = interval_ms / 1000
+        self.warn_ms = warn_ms
+        self.samples: "deque[float]" = deque(maxlen=window)
+        self.max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - started - self.interval) * 1000)
+            self.samples.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+            if self.warn_ms is not None and lag_ms > self.warn_ms:
+                logger.warning(f"Event loop blocked for {lag_ms:.0f} ms")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self.samples.clear()
+            self.max_ms = 0.0
+            self._task = asyncio.get_running_loop().create_task(self._sample())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> Dict:
+        """Lag percentiles over the window, and the maximum since start (milliseconds)"""
+        samples = list(self.samples)
+        if not samples:
+            return {"samples": 0, "interval_ms": self.interval * 1000}
+        ordered = sorted(samples)
+        return {
+            "samples": len(samples),
+            "interval_ms": self.interval * 1000,
+            "last_ms": round(samples[-1], 1),
+            "mean_ms": round(statistics.fmean(samples), 1),
+            "p50_ms": round(ordered[len(ordered) // 2], 1),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 1),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+loop_lag_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_MS, settings.LOOP_LAG_WINDOW, settings.LOOP_LAG_WARN_MS)
@@ -1,22 +1,32 @@
 """
 Main FastAPI application entry point
 """
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.api.v1.endpoints.users import require_admin
+from app.core.database import async_engine
+from app.core.executors import executor_stats, shutdown_executors
+from app.core.loop_lag import loop_lag_monitor
+from app.services.pdf_jobs import render_queue
 from app.utils.init_db import init_db
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
+    """Initialize database on startup, release pooled connections and workers on shutdown"""
     print("Initializing database...")
     init_db()
     print("Database initialized!")
+    loop_lag_monitor.start()
     yield
+    await loop_lag_monitor.stop()
+    shutdown_executors()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -34,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include API router
@@ -58,6 +69,16 @@ async def health_check():
     return JSONResponse(content={"status": "healthy"})
 
 
+@app.get("/health/runtime", dependencies=[Depends(require_admin)])
+async def runtime_health():
+    """Event loop lag, executor pool usage and the PDF render queue (admins only)"""
+    return JSONResponse(content={
+        "event_loop_lag": loop_lag_monitor.stats(),
+        "executors": executor_stats(),
+        "pdf_jobs": render_queue.stats()
+    })
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -4,9 +4,16 @@ AI-powered insight generation engine
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func
 from app.models.feedback import Feedback, SentimentAnalysis, FeedbackCategory, SentimentCategory
 from app.models.report import ActionItem, ActionPriority
+from app.models.analytics import KeywordFlag
+from app.services.week_series import WeekSeriesEngine
+from app.services.analytics_backend import get_metrics_backend
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.services.keyword_index import KeywordIndex
+from app.services.representative_quotes import QuoteIndex, APPRECIATION, TRAINER_RECOGNITION, MENTOR_RECOGNITION
+from app.utils.weeks import week_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,8 +22,23 @@ logger = logging.getLogger(__name__)
 class InsightGenerator:
     """Generate actionable insights, risk flags, and recommendations"""
     
-    def __init__(self, db: Session):
+    STRESS_KEYWORDS = ["pressure", "difficult", "revision", "exam", "assessment", "stress", "anxious"]
+    
+    APPRECIATION_KEYWORDS = [
+        "thank", "appreciate", "great", "excellent", "helpful", "supportive",
+        "amazing", "wonderful", "fantastic", "outstanding", "brilliant"
+    ]
+    
+    TRAINER_KEYWORDS = ["trainer", "instructor", "teacher", "faculty"]
+    
+    MENTOR_KEYWORDS = ["mentor", "guide", "coach"]
+    
+    def __init__(self, db: Session, scope: AnalyticsScope = ALL_FEEDBACK):
         self.db = db
+        self.scope = scope
+        self.analytics = get_metrics_backend(db, scope)
+        self.keywords = KeywordIndex(db, scope)
+        self.quotes = QuoteIndex(db, scope)
     
     def generate_action_items(
         self,
@@ -27,40 +49,19 @@ class InsightGenerator:
         """Generate actionable recommendations"""
         action_items = []
         
-        # Get current week feedback
-        current_feedback = self.db.query(Feedback).filter(
-            and_(
-                Feedback.week_start_date >= week_start,
-                Feedback.week_start_date <= week_end
-            )
-        ).all()
-        
-        # Analyze by category
-        category_issues = {}
-        for feedback in current_feedback:
-            if feedback.sentiment_analysis and feedback.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE:
-                for mapping in feedback.category_mappings:
-                    category = mapping.category.value
-                    if category not in category_issues:
-                        category_issues[category] = {
-                            "count": 0,
-                            "keywords": set(),
-                            "examples": []
-                        }
-                    category_issues[category]["count"] += 1
-                    if mapping.keywords_matched:
-                        category_issues[category]["keywords"].update(mapping.keywords_matched)
-                    if len(category_issues[category]["examples"]) < 3:
-                        category_issues[category]["examples"].append(feedback.open_text[:200])
+        # Negative feedback per category this week, and the keywords they matched most
+        current_week = self.analytics.series(week_start, 1)[0]
+        themes = self.keywords.top_by_category([week_key(week_start)], SentimentCategory.NEGATIVE, limit=5)
         
         # Generate action items based on issue frequency
-        for category, data in category_issues.items():
-            if data["count"] >= 5:  # Threshold for action item
-                priority = ActionPriority.URGENT if data["count"] >= 15 else ActionPriority.HIGH
+        for category, counts in current_week["categories"].items():
+            count = counts["negative"]
+            if count >= 5:  # Threshold for action item
+                priority = ActionPriority.URGENT if count >= 15 else ActionPriority.HIGH
                 
                 # Generate description based on keywords
-                keywords_str = ", ".join(list(data["keywords"])[:5])
-                description = f"Address {data['count']} negative feedback items in {category.replace('_', ' ').title()}. "
+                keywords_str = ", ".join(keyword for keyword, _ in themes.get(category, []))
+                description = f"Address {count} negative feedback items in {category.replace('_', ' ').title()}. "
                 description += f"Common themes: {keywords_str}."
                 
                 # Assign owner based on category
@@ -79,27 +80,15 @@ class InsightGenerator:
                     "category": category,
                     "title": f"Address {category.replace('_', ' ').title()} Concerns",
                     "description": description,
-                    "confidence_score": min(data["count"] / 20.0, 1.0),
+                    "confidence_score": min(count / 20.0, 1.0),
                     "assigned_to": assigned_to
                 })
         
         # Compare with previous week for trend-based actions
         if previous_week_start:
-            prev_week_end = previous_week_start + timedelta(days=7)
-            prev_feedback = self.db.query(Feedback).filter(
-                and_(
-                    Feedback.week_start_date >= previous_week_start,
-                    Feedback.week_start_date <= prev_week_end
-                )
-            ).all()
-            
             # Calculate sentiment change
-            current_negative = sum(1 for f in current_feedback 
-                                 if f.sentiment_analysis and 
-                                 f.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE)
-            prev_negative = sum(1 for f in prev_feedback 
-                              if f.sentiment_analysis and 
-                              f.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE)
+            current_negative = current_week["negative"]
+            prev_negative = self.analytics.series(previous_week_start, 1)[0]["negative"]
             
             if prev_negative > 0:
                 change_pct = ((current_negative - prev_negative) / prev_negative) * 100
@@ -124,51 +113,28 @@ class InsightGenerator:
         """Generate risk flags and alerts"""
         risk_flags = []
         
-        # Get feedback with repeated keywords
-        feedback_list = self.db.query(Feedback).filter(
-            and_(
-                Feedback.week_start_date >= week_start,
-                Feedback.week_start_date <= week_end
-            )
-        ).all()
-        
-        # Track keyword frequency
-        keyword_frequency = {}
-        for feedback in feedback_list:
-            if feedback.sentiment_analysis and feedback.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE:
-                for mapping in feedback.category_mappings:
-                    if mapping.keywords_matched:
-                        for keyword in mapping.keywords_matched:
-                            keyword_frequency[keyword] = keyword_frequency.get(keyword, 0) + 1
-        
-        # Flag repeated keywords
-        for keyword, count in keyword_frequency.items():
-            if count >= 20:  # Threshold for risk flag
-                risk_flags.append({
-                    "type": "repeated_keyword",
-                    "severity": "high" if count >= 30 else "medium",
-                    "message": f"Keyword '{keyword}' mentioned {count} times in negative feedback",
-                    "category": "pattern_detection",
-                    "recommendation": f"Investigate and address issues related to '{keyword}'"
-                })
+        # Flag keywords repeated in negative feedback (counted per week at ingest)
+        for keyword, count in self.keywords.top([week_key(week_start)], SentimentCategory.NEGATIVE, min_count=20):
+            risk_flags.append({
+                "type": "repeated_keyword",
+                "severity": "high" if count >= 30 else "medium",
+                "message": f"Keyword '{keyword}' mentioned {count} times in negative feedback",
+                "category": "pattern_detection",
+                "recommendation": f"Investigate and address issues related to '{keyword}'"
+            })
         
         # Check for unresolved issues (negative sentiment for multiple weeks)
         # This would require querying previous weeks - simplified here
-        negative_count = sum(1 for f in feedback_list 
-                           if f.sentiment_analysis and 
-                           f.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE)
-        total_count = len(feedback_list)
-        
-        if total_count > 0:
-            negative_pct = (negative_count / total_count) * 100
-            if negative_pct > 40:  # High negative percentage
-                risk_flags.append({
-                    "type": "high_negative_sentiment",
-                    "severity": "high",
-                    "message": f"High negative sentiment: {negative_pct:.1f}% of feedback is negative",
-                    "category": "sentiment_analysis",
-                    "recommendation": "Immediate intervention required. Review top concerns and take action."
-                })
+        negative_pct = self.analytics.negative_percentage(week_start)
+        
+        if negative_pct is not None and negative_pct > 40:  # High negative percentage
+            risk_flags.append({
+                "type": "high_negative_sentiment",
+                "severity": "high",
+                "message": f"High negative sentiment: {negative_pct:.1f}% of feedback is negative",
+                "category": "sentiment_analysis",
+                "recommendation": "Immediate intervention required. Review top concerns and take action."
+            })
         
         return risk_flags
     
@@ -178,22 +144,9 @@ class InsightGenerator:
         week_end: datetime
     ) -> Optional[Dict]:
         """Detect assessment stress patterns"""
-        stress_keywords = ["pressure", "difficult", "revision", "exam", "assessment", "stress", "anxious"]
-        
-        feedback_list = self.db.query(Feedback).filter(
-            and_(
-                Feedback.week_start_date >= week_start,
-                Feedback.week_start_date <= week_end
-            )
-        ).all()
-        
-        stress_mentions = 0
-        total_feedback = len(feedback_list)
-        
-        for feedback in feedback_list:
-            text_lower = feedback.open_text.lower()
-            if any(keyword in text_lower for keyword in stress_keywords):
-                stress_mentions += 1
+        # STRESS_KEYWORDS matches are flagged per feedback at ingest
+        stress_mentions = self.analytics.flag_count(week_start, KeywordFlag.ASSESSMENT_STRESS)
+        total_feedback = self.analytics.series(week_start, 1)[0]["volume"]
         
         if stress_mentions >= 10 and total_feedback > 0:
             stress_pct = (stress_mentions / total_feedback) * 100
@@ -207,89 +160,52 @@ class InsightGenerator:
         
         return None
     
+    def top_categories_with_quotes(
+        self,
+        week_start: datetime,
+        sentiment: SentimentCategory,
+        limit: int = 3
+    ) -> List[Dict]:
+        """The `limit` categories with the most `sentiment` feedback in the week, with their two best quotes"""
+        sentiment = SentimentCategory(sentiment)
+        categories = self.analytics.series(week_start, 1)[0]["categories"]
+        top = sorted(
+            ((category, counts[sentiment.value]) for category, counts in categories.items() if counts[sentiment.value]),
+            key=lambda item: item[1],
+            reverse=True
+        )[:limit]
+        quotes = self.quotes.quotes([week_key(week_start)], sentiment, [category for category, _ in top], limit=2)
+        return [
+            {
+                'category': category.replace('_', ' ').title(),
+                'count': count,
+                'quotes': [quote['text'] for quote in quotes.get(category, [])]
+            }
+            for category, count in top
+        ]
+    
     def generate_top_strengths_and_concerns(
         self,
         week_start: datetime,
         week_end: datetime
     ) -> Dict[str, List[Dict]]:
         """Generate top strengths and concerns from actual feedback data with supporting quotes"""
-        feedback_list = self.db.query(Feedback).filter(
-            and_(
-                Feedback.week_start_date >= week_start,
-                Feedback.week_start_date <= week_end
-            )
-        ).all()
-        
-        # Analyze positive feedback for strengths
-        positive_feedback = [f for f in feedback_list 
-                           if f.sentiment_analysis and 
-                           f.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE]
-        
-        # Analyze negative feedback for concerns
-        negative_feedback = [f for f in feedback_list 
-                           if f.sentiment_analysis and 
-                           f.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE]
-        
-        # Count category mentions in positive feedback with quotes
-        strength_categories = {}
-        for feedback in positive_feedback:
-            for mapping in feedback.category_mappings:
-                category = mapping.category.value.replace('_', ' ').title()
-                if category not in strength_categories:
-                    strength_categories[category] = {
-                        'count': 0,
-                        'quotes': []
-                    }
-                strength_categories[category]['count'] += 1
-                # Collect quotes (max 2 per category)
-                if len(strength_categories[category]['quotes']) < 2:
-                    quote = feedback.open_text[:200] + "..." if len(feedback.open_text) > 200 else feedback.open_text
-                    strength_categories[category]['quotes'].append(quote)
-        
-        # Count category mentions in negative feedback with quotes
-        concern_categories = {}
-        for feedback in negative_feedback:
-            for mapping in feedback.category_mappings:
-                category = mapping.category.value.replace('_', ' ').title()
-                if category not in concern_categories:
-                    concern_categories[category] = {
-                        'count': 0,
-                        'quotes': []
-                    }
-                concern_categories[category]['count'] += 1
-                # Collect quotes (max 2 per category)
-                if len(concern_categories[category]['quotes']) < 2:
-                    quote = feedback.open_text[:200] + "..." if len(feedback.open_text) > 200 else feedback.open_text
-                    concern_categories[category]['quotes'].append(quote)
-        
-        # Get top 3 strengths with quotes
-        top_strengths = sorted(
-            strength_categories.items(),
-            key=lambda x: x[1]['count'],
-            reverse=True
-        )[:3]
+        # Category counts from the metrics backend, quotes picked at ingest
         top_strengths_list = [
             {
-                'category': cat,
-                'description': f"{cat} received {data['count']} positive mentions",
-                'quotes': data['quotes']
+                'category': item['category'],
+                'description': f"{item['category']} received {item['count']} positive mentions",
+                'quotes': item['quotes']
             }
-            for cat, data in top_strengths
+            for item in self.top_categories_with_quotes(week_start, SentimentCategory.POSITIVE)
         ]
-        
-        # Get top 3 concerns with quotes
-        top_concerns = sorted(
-            concern_categories.items(),
-            key=lambda x: x[1]['count'],
-            reverse=True
-        )[:3]
         top_concerns_list = [
             {
-                'category': cat,
-                'description': f"{cat} received {data['count']} negative mentions",
-                'quotes': data['quotes']
+                'category': item['category'],
+                'description': f"{item['category']} received {item['count']} negative mentions",
+                'quotes': item['quotes']
             }
-            for cat, data in top_concerns
+            for item in self.top_categories_with_quotes(week_start, SentimentCategory.NEGATIVE)
         ]
         
         # If no data, provide defaults
@@ -350,66 +266,17 @@ class InsightGenerator:
         week_end: datetime
     ) -> Dict:
         """Generate appreciation tracker with positive feedback highlights and trainer/mentor recognition"""
-        feedback_list = self.db.query(Feedback).filter(
-            and_(
-                Feedback.week_start_date >= week_start,
-                Feedback.week_start_date <= week_end
-            )
-        ).all()
-        
-        # Filter positive feedback
-        positive_feedback = [f for f in feedback_list 
-                           if f.sentiment_analysis and 
-                           f.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE]
-        
-        # Extract appreciation keywords
-        appreciation_keywords = [
-            "thank", "appreciate", "great", "excellent", "helpful", "supportive",
-            "amazing", "wonderful", "fantastic", "outstanding", "brilliant"
-        ]
-        
-        trainer_mentions = []
-        mentor_mentions = []
-        general_appreciation = []
-        
-        for feedback in positive_feedback:
-            text_lower = feedback.open_text.lower()
-            
-            # Check for appreciation keywords
-            has_appreciation = any(keyword in text_lower for keyword in appreciation_keywords)
-            
-            if has_appreciation:
-                # Check for trainer mentions
-                trainer_keywords = ["trainer", "instructor", "teacher", "faculty"]
-                if any(keyword in text_lower for keyword in trainer_keywords):
-                    trainer_mentions.append({
-                        "text": feedback.open_text[:200] + "..." if len(feedback.open_text) > 200 else feedback.open_text,
-                        "location": feedback.location,
-                        "batch": feedback.training_batch
-                    })
-                
-                # Check for mentor mentions
-                mentor_keywords = ["mentor", "guide", "coach"]
-                if any(keyword in text_lower for keyword in mentor_keywords):
-                    mentor_mentions.append({
-                        "text": feedback.open_text[:200] + "..." if len(feedback.open_text) > 200 else feedback.open_text,
-                        "location": feedback.location,
-                        "batch": feedback.training_batch
-                    })
-                
-                # General appreciation
-                if len(general_appreciation) < 5:
-                    general_appreciation.append({
-                        "text": feedback.open_text[:200] + "..." if len(feedback.open_text) > 200 else feedback.open_text,
-                        "location": feedback.location,
-                        "batch": feedback.training_batch
-                    })
+        # Positive feedback with APPRECIATION_KEYWORDS, and TRAINER_KEYWORDS / MENTOR_KEYWORDS, quoted at ingest
+        quotes = self.quotes.quotes(
+            [week_key(week_start)], SentimentCategory.POSITIVE,
+            [TRAINER_RECOGNITION, MENTOR_RECOGNITION, APPRECIATION], limit=5
+        )
         
         return {
-            "trainer_recognition": trainer_mentions[:5],  # Top 5
-            "mentor_recognition": mentor_mentions[:5],  # Top 5
-            "general_appreciation": general_appreciation[:5],  # Top 5
-            "total_positive_feedback": len(positive_feedback)
+            "trainer_recognition": quotes.get(TRAINER_RECOGNITION, []),  # Top 5
+            "mentor_recognition": quotes.get(MENTOR_RECOGNITION, []),  # Top 5
+            "general_appreciation": quotes.get(APPRECIATION, []),  # Top 5
+            "total_positive_feedback": self.analytics.series(week_start, 1)[0]["positive"]
         }
     
     def detect_unresolved_feedback_loops(
@@ -421,45 +288,31 @@ class InsightGenerator:
         """Detect unresolved feedback loops (negative sentiment for 3+ consecutive weeks)"""
         unresolved_loops = []
         
-        # Check each week going back
-        for week_offset in range(weeks_to_check):
-            check_week_start = week_start - timedelta(weeks=week_offset)
-            check_week_end = check_week_start + timedelta(days=6)
-            
-            feedback_list = self.db.query(Feedback).filter(
-                and_(
-                    Feedback.week_start_date >= check_week_start,
-                    Feedback.week_start_date <= check_week_end
-                )
-            ).all()
-            
-            if not feedback_list:
+        # Fetch every week being checked in one grouped query
+        series = WeekSeriesEngine(self.db, self.scope).get_series(week_start, weeks_to_check)
+        
+        for week in series:
+            if not week["volume"]:
                 continue
             
             # Calculate negative sentiment percentage
-            negative_count = sum(1 for f in feedback_list 
-                               if f.sentiment_analysis and 
-                               f.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE)
-            total = len(feedback_list)
-            negative_pct = (negative_count / total * 100) if total > 0 else 0
+            total = week["volume"]
+            negative_pct = (week["negative"] / total * 100) if total > 0 else 0
             
             # If negative sentiment > 40% for this week, track it
             if negative_pct > 40:
                 # Group by category to find recurring issues
-                category_issues = {}
-                for feedback in feedback_list:
-                    if feedback.sentiment_analysis and feedback.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE:
-                        for mapping in feedback.category_mappings:
-                            category = mapping.category.value
-                            if category not in category_issues:
-                                category_issues[category] = 0
-                            category_issues[category] += 1
+                category_issues = {
+                    category: counts["negative"]
+                    for category, counts in week["categories"].items()
+                    if counts["negative"] > 0
+                }
                 
                 # Find most common issue category
                 if category_issues:
                     top_category = max(category_issues.items(), key=lambda x: x[1])
                     unresolved_loops.append({
-                        "week": check_week_start.isoformat(),
+                        "week": week["week_start"].isoformat(),
                         "negative_percentage": negative_pct,
                         "top_category": top_category[0],
                         "category_count": top_category[1],
@@ -487,45 +340,25 @@ class InsightGenerator:
         """Track praise momentum - increasing positive feedback trends"""
         momentum_data = []
         
-        for week_offset in range(weeks_back):
-            check_week_start = week_start - timedelta(weeks=week_offset)
-            check_week_end = check_week_start + timedelta(days=6)
-            
-            feedback_list = self.db.query(Feedback).filter(
-                and_(
-                    Feedback.week_start_date >= check_week_start,
-                    Feedback.week_start_date <= check_week_end
-                )
-            ).all()
-            
-            if not feedback_list:
+        # Fetch every week being tracked in one grouped query
+        series = WeekSeriesEngine(self.db, self.scope).get_series(week_start, weeks_back)
+        
+        for week in series:
+            if not week["volume"]:
                 continue
             
             # Count positive feedback
-            positive_count = sum(1 for f in feedback_list 
-                               if f.sentiment_analysis and 
-                               f.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE)
-            total = len(feedback_list)
+            positive_count = week["positive"]
+            total = week["volume"]
             positive_pct = (positive_count / total * 100) if total > 0 else 0
             
-            # Track trainer/mentor mentions
-            trainer_mentions = 0
-            mentor_mentions = 0
-            for feedback in feedback_list:
-                if feedback.sentiment_analysis and feedback.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE:
-                    text_lower = feedback.open_text.lower()
-                    if "trainer" in text_lower or "instructor" in text_lower:
-                        trainer_mentions += 1
-                    if "mentor" in text_lower or "guide" in text_lower:
-                        mentor_mentions += 1
-            
             momentum_data.append({
-                "week": check_week_start.isoformat(),
+                "week": week["week_start"].isoformat(),
                 "positive_percentage": positive_pct,
                 "positive_count": positive_count,
                 "total_feedback": total,
-                "trainer_mentions": trainer_mentions,
-                "mentor_mentions": mentor_mentions
+                "trainer_mentions": week["trainer_mentions"],
+                "mentor_mentions": week["mentor_mentions"]
             })
         
         # Calculate trend
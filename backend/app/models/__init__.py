@@ -5,6 +5,10 @@ from app.models.user import User
 from app.models.feedback import Feedback, SentimentAnalysis, CategoryMapping
 from app.models.report import WeeklyReport, ActionItem, TrendData
 from app.models.audit import AuditLog
+from app.models.analytics import (
+    AnalyticsBatch, AnalyticsLocation, FeedbackFact, FeedbackCube, KeywordCount, RepresentativeQuote,
+    WeekDataVersion
+)
 
 __all__ = [
     "User",
@@ -15,6 +19,13 @@ __all__ = [
     "ActionItem",
     "TrendData",
     "AuditLog",
+    "AnalyticsBatch",
+    "AnalyticsLocation",
+    "FeedbackFact",
+    "FeedbackCube",
+    "KeywordCount",
+    "RepresentativeQuote",
+    "WeekDataVersion",
 ]
 
 
@@ -0,0 +1,156 @@
+"""
+Compact analytics models
+
+`FeedbackFact` holds one narrow, integer-only row per feedback so the
+aggregate queries can scan a single table without joining `feedback`,
+`sentiment_analysis` and `category_mappings`. `FeedbackCube` rolls the
+facts up further, to counts per week, batch, location, category,
+sentiment and stage, so sliced dashboards read a handful of rows per week.
+`KeywordCount` counts the category keywords matched in feedback texts
+along the same dimensions, and `RepresentativeQuote` keeps the best quotes
+of each week, batch, location, sentiment and topic.
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+import enum
+from app.core.database import Base
+from app.models.feedback import SentimentCategory, EmotionalTone, FeedbackCategory, TraineeStage
+
+
+class SentimentCode(enum.IntEnum):
+    """Small-integer sentiment codes (UNKNOWN when no analysis exists)"""
+    UNKNOWN = 0
+    POSITIVE = 1
+    NEUTRAL = 2
+    NEGATIVE = 3
+
+
+class KeywordFlag(enum.IntFlag):
+    """Per-row keyword flags, computed once at ingest"""
+    ENGAGEMENT = 1  # HeatIndexCalculator.ENGAGEMENT_KEYWORDS
+    ASSESSMENT_STRESS = 2  # InsightGenerator.STRESS_KEYWORDS
+    APPRECIATION = 4  # InsightGenerator.APPRECIATION_KEYWORDS
+    TRAINER_MENTION = 8  # "trainer" / "instructor" (praise momentum)
+    MENTOR_MENTION = 16  # "mentor" / "guide" (praise momentum)
+    TRAINER_RECOGNITION = 32  # InsightGenerator.TRAINER_KEYWORDS
+    MENTOR_RECOGNITION = 64  # InsightGenerator.MENTOR_KEYWORDS
+
+
+SENTIMENT_CODES = {
+    SentimentCategory.POSITIVE: SentimentCode.POSITIVE,
+    SentimentCategory.NEUTRAL: SentimentCode.NEUTRAL,
+    SentimentCategory.NEGATIVE: SentimentCode.NEGATIVE,
+}
+
+# 0 means "no tone"/"unknown stage"; enum members are numbered from 1 in declaration order
+TONE_CODES = {tone: code for code, tone in enumerate(EmotionalTone, start=1)}
+STAGE_CODES = {stage: code for code, stage in enumerate(TraineeStage, start=1)}
+
+# One bit per feedback category
+CATEGORY_BITS = {category: 1 << bit for bit, category in enumerate(FeedbackCategory)}
+
+# Cube category codes: every feedback is counted under ALL_CATEGORIES, and once more per mapped category
+ALL_CATEGORIES = 0
+CATEGORY_CODES = {category: code for code, category in enumerate(FeedbackCategory, start=1)}
+
+
+def category_mask(categories) -> int:
+    """Combine feedback categories into a bitmask"""
+    mask = 0
+    for category in categories:
+        mask |= CATEGORY_BITS[FeedbackCategory(category)]
+    return mask
+
+
+class AnalyticsBatch(Base):
+    """Training batch dimension (integer id per batch name)"""
+    __tablename__ = "dim_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+
+class AnalyticsLocation(Base):
+    """Location dimension (integer id per location name)"""
+    __tablename__ = "dim_locations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+
+class FeedbackFact(Base):
+    """Denormalized analytics row, one per feedback, written by the ingest pipeline"""
+    __tablename__ = "feedback_facts"
+
+    feedback_id = Column(Integer, primary_key=True)  # No foreign key: facts outlive archived feedback
+    week_key = Column(Integer, nullable=False)  # ISO week YYYYWW
+    batch_id = Column(Integer, ForeignKey("dim_batches.id"), nullable=False)
+    location_id = Column(Integer, ForeignKey("dim_locations.id"), nullable=False)
+    sentiment_code = Column(SmallInteger, nullable=False, default=SentimentCode.UNKNOWN)
+    tone_code = Column(SmallInteger, nullable=False, default=0)
+    stage_code = Column(SmallInteger, nullable=False, default=0)
+    category_mask = Column(SmallInteger, nullable=False, default=0)
+    keyword_flags = Column(SmallInteger, nullable=False, default=0)
+    rating_score = Column(SmallInteger, nullable=True)  # 1-5
+
+    # Relationships
+    feedback = relationship("Feedback", primaryjoin="foreign(FeedbackFact.feedback_id) == Feedback.id")
+
+    __table_args__ = (
+        Index("ix_feedback_facts_week_batch_location", "week_key", "batch_id", "location_id"),
+    )
+
+
+class FeedbackCube(Base):
+    """Feedback counts and rating sums per week, batch, location, category, sentiment and stage"""
+    __tablename__ = "feedback_cube"
+
+    week_key = Column(Integer, primary_key=True)  # ISO week YYYYWW
+    batch_id = Column(Integer, primary_key=True)  # dim_batches.id
+    location_id = Column(Integer, primary_key=True)  # dim_locations.id
+    category_code = Column(SmallInteger, primary_key=True)  # ALL_CATEGORIES or CATEGORY_CODES
+    sentiment_code = Column(SmallInteger, primary_key=True)
+    stage_code = Column(SmallInteger, primary_key=True)
+    feedback_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)  # Feedback with a rating
+    engagement_count = Column(Integer, nullable=False, default=0)  # KeywordFlag.ENGAGEMENT
+    stress_count = Column(Integer, nullable=False, default=0)  # KeywordFlag.ASSESSMENT_STRESS
+    trainer_mention_count = Column(Integer, nullable=False, default=0)  # KeywordFlag.TRAINER_MENTION
+    mentor_mention_count = Column(Integer, nullable=False, default=0)  # KeywordFlag.MENTOR_MENTION
+
+
+class KeywordCount(Base):
+    """Category keyword matches per week, batch, location, category and sentiment"""
+    __tablename__ = "keyword_counts"
+
+    week_key = Column(Integer, primary_key=True)  # ISO week YYYYWW
+    batch_id = Column(Integer, primary_key=True)  # dim_batches.id
+    location_id = Column(Integer, primary_key=True)  # dim_locations.id
+    category_code = Column(SmallInteger, primary_key=True)  # CATEGORY_CODES
+    sentiment_code = Column(SmallInteger, primary_key=True)
+    keyword = Column(String(100), primary_key=True)
+    mention_count = Column(Integer, nullable=False, default=0)  # Feedback whose category mapping matched it
+
+
+class RepresentativeQuote(Base):
+    """Best-scoring feedback quotes per week, batch, location, sentiment and topic"""
+    __tablename__ = "representative_quotes"
+
+    week_key = Column(Integer, primary_key=True)  # ISO week YYYYWW
+    batch_id = Column(Integer, primary_key=True)  # dim_batches.id
+    location_id = Column(Integer, primary_key=True)  # dim_locations.id
+    sentiment_code = Column(SmallInteger, primary_key=True)
+    topic = Column(String(40), primary_key=True)  # A FeedbackCategory value or a recognition topic
+    feedback_id = Column(Integer, primary_key=True)
+    score = Column(Float, nullable=False)  # Sentiment confidence x category relevance
+    text = Column(Text, nullable=False)  # Truncated to QUOTE_LENGTH
+
+
+class WeekDataVersion(Base):
+    """Per-week data version, bumped by every ingest that writes to the week"""
+    __tablename__ = "week_data_versions"
+
+    week_key = Column(Integer, primary_key=True)  # ISO week YYYYWW
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,7 +1,7 @@
 """
 Feedback and sentiment analysis models
 """
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, JSON, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -52,6 +52,7 @@ class Feedback(Base):
     training_batch = Column(String(100), index=True, nullable=False)
     week_start_date = Column(DateTime(timezone=True), index=True, nullable=False)
     week_end_date = Column(DateTime(timezone=True), nullable=False)
+    week_key = Column(Integer, nullable=True)  # ISO week YYYYWW, set at ingest (indexed below)
     rating_score = Column(Integer, nullable=True)  # 1-5
     open_text = Column(Text, nullable=False)
     category_tags = Column(String(500), nullable=True)  # Comma-separated tags
@@ -61,6 +62,11 @@ class Feedback(Base):
     # Relationships
     sentiment_analysis = relationship("SentimentAnalysis", back_populates="feedback", uselist=False)
     category_mappings = relationship("CategoryMapping", back_populates="feedback")
+    
+    __table_args__ = (
+        Index("ix_feedback_week_key_batch_location", "week_key", "training_batch", "location"),
+        Index("ix_feedback_week_key_id", "week_key", "id"),  # Keyset pages of one week
+    )
 
 
 class SentimentAnalysis(Base):
@@ -69,6 +75,7 @@ class SentimentAnalysis(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     feedback_id = Column(Integer, ForeignKey("feedback.id"), unique=True, nullable=False)
+    week_key = Column(Integer, nullable=True)  # The feedback's week_key (partition key on PostgreSQL)
     sentiment_category = Column(Enum(SentimentCategory), nullable=False)
     emotional_tone = Column(Enum(EmotionalTone), nullable=True)
     confidence_score = Column(Float, nullable=False)  # 0.0-1.0
@@ -84,7 +91,8 @@ class CategoryMapping(Base):
     __tablename__ = "category_mappings"
     
     id = Column(Integer, primary_key=True, index=True)
-    feedback_id = Column(Integer, ForeignKey("feedback.id"), nullable=False)
+    feedback_id = Column(Integer, ForeignKey("feedback.id"), index=True, nullable=False)
+    week_key = Column(Integer, nullable=True)  # The feedback's week_key (partition key on PostgreSQL)
     category = Column(Enum(FeedbackCategory), nullable=False)
     relevance_score = Column(Float, nullable=False)  # 0.0-1.0
     keywords_matched = Column(JSON, nullable=True)  # List of matched keywords
@@ -31,6 +31,7 @@ class WeeklyReport(Base):
     id = Column(Integer, primary_key=True, index=True)
     week_start_date = Column(DateTime(timezone=True), index=True, nullable=False)
     week_end_date = Column(DateTime(timezone=True), nullable=False)
+    week_key = Column(Integer, index=True, nullable=True)  # ISO week YYYYWW
     overall_sentiment_score = Column(Float, nullable=False)  # Percentage
     sentiment_change = Column(Float, nullable=True)  # Week-over-week change percentage
     heat_index = Column(Float, nullable=False)  # 0-100
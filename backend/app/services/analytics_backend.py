@@ -0,0 +1,57 @@
+"""
+Analytics backend selection
+"""
+from typing import Iterable, Union
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.services.columnar_analytics import ColumnarAnalytics, week_frame_cache
+from app.services.feedback_cube import CubeAnalytics
+from app.services import duckdb_analytics
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_BACKENDS = ("cube", "columnar", "duckdb")
+
+_warned_fallback = False
+
+
+def use_duckdb() -> bool:
+    """Whether ANALYTICS_BACKEND selects DuckDB and the package is installed"""
+    global _warned_fallback
+    if settings.ANALYTICS_BACKEND not in ANALYTICS_BACKENDS:
+        raise ValueError(f"Unknown ANALYTICS_BACKEND: {settings.ANALYTICS_BACKEND}")
+    if settings.ANALYTICS_BACKEND != "duckdb":
+        return False
+    if not duckdb_analytics.duckdb_available():
+        if not _warned_fallback:
+            logger.warning("ANALYTICS_BACKEND=duckdb but duckdb is not installed, using the columnar backend")
+            _warned_fallback = True
+        return False
+    return True
+
+
+def get_metrics_backend(db: Session, scope: AnalyticsScope = ALL_FEEDBACK) -> Union[CubeAnalytics, ColumnarAnalytics]:
+    """Backend for the per-week metrics (heat index, distributions, keyword flags)"""
+    if settings.ANALYTICS_BACKEND == "cube" or not scope.is_all:
+        return CubeAnalytics(db, scope)
+    return ColumnarAnalytics(db)
+
+
+def get_analytics_backend(
+    db: Session,
+    scope: AnalyticsScope = ALL_FEEDBACK
+) -> Union[CubeAnalytics, ColumnarAnalytics, duckdb_analytics.DuckDBAnalytics]:
+    """Backend for series and lifecycle aggregations, per ANALYTICS_BACKEND (batch / location slices use the cube)"""
+    if use_duckdb() and scope.is_all:
+        return duckdb_analytics.DuckDBAnalytics(db)
+    return get_metrics_backend(db, scope)
+
+
+def invalidate_weeks(db: Session, keys: Iterable[int]) -> None:
+    """Called after ingest commits: drop cached frames and refresh snapshots of the changed weeks"""
+    keys = set(keys)
+    week_frame_cache.invalidate(keys)
+    if use_duckdb() and duckdb_analytics.snapshot_source(db) == "parquet":
+        duckdb_analytics.refresh_snapshots(db, keys)
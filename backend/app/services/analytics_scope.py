@@ -0,0 +1,78 @@
+"""
+Batch and location slices of the analytics
+
+An AnalyticsScope restricts dashboards to some training batches and/or
+locations. Endpoints build it from their `batch` / `location` filters and
+the caller's role: batch owners only ever see their own batches
+(User.batch_access).
+"""
+from typing import FrozenSet, Iterable, List, Optional
+from app.models.feedback import Feedback
+from app.models.analytics import AnalyticsBatch, AnalyticsLocation
+from app.models.user import User, UserRole
+
+
+def allowed_batches(user: User) -> Optional[List[str]]:
+    """Batches a user may see (None: all of them)"""
+    if user.role != UserRole.BATCH_OWNER:
+        return None
+    return sorted(batch.strip() for batch in (user.batch_access or "").split(",") if batch.strip())
+
+
+class AnalyticsScope:
+    """Batches and locations included in an aggregation (None: no restriction)"""
+
+    __slots__ = ("batches", "locations")
+
+    def __init__(self, batches: Optional[Iterable[str]] = None, locations: Optional[Iterable[str]] = None):
+        self.batches: Optional[FrozenSet[str]] = frozenset(batches) if batches is not None else None
+        self.locations: Optional[FrozenSet[str]] = frozenset(locations) if locations is not None else None
+
+    @classmethod
+    def for_user(cls, user: User, batch: Optional[str] = None, location: Optional[str] = None) -> "AnalyticsScope":
+        """The scope of a request's `batch` / `location` filters, limited to what `user` may see"""
+        batches = [batch] if batch else None
+        permitted = allowed_batches(user)
+        if permitted is not None:
+            batches = [name for name in (batches or permitted) if name in permitted]
+        return cls(batches, [location] if location else None)
+
+    @property
+    def is_all(self) -> bool:
+        return self.batches is None and self.locations is None
+
+    @property
+    def is_empty(self) -> bool:
+        """Nothing can match (e.g. a batch owner without batch access)"""
+        return self.batches == frozenset() or self.locations == frozenset()
+
+    def feedback_criteria(self) -> list:
+        """SQL criteria selecting the scope's Feedback rows"""
+        criteria = []
+        if self.batches is not None:
+            criteria.append(Feedback.training_batch.in_(sorted(self.batches)))
+        if self.locations is not None:
+            criteria.append(Feedback.location.in_(sorted(self.locations)))
+        return criteria
+
+    def restrict(self, query, batch_id_column, location_id_column):
+        """Restrict a query over a table with batch / location dimension ids to the scope"""
+        if self.batches is not None:
+            query = query.join(AnalyticsBatch, AnalyticsBatch.id == batch_id_column).filter(
+                AnalyticsBatch.name.in_(sorted(self.batches))
+            )
+        if self.locations is not None:
+            query = query.join(AnalyticsLocation, AnalyticsLocation.id == location_id_column).filter(
+                AnalyticsLocation.name.in_(sorted(self.locations))
+            )
+        return query
+
+    def matches(self, feedback: Feedback) -> bool:
+        return (
+            (self.batches is None or feedback.training_batch in self.batches)
+            and (self.locations is None or feedback.location in self.locations)
+        )
+
+
+# Every batch and location
+ALL_FEEDBACK = AnalyticsScope()
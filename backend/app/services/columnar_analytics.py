@@ -0,0 +1,290 @@
+"""
+In-memory columnar analytics engine
+
+Loads the `feedback_facts` rows of a week into NumPy columns once and
+computes the dashboard metrics (sentiment distribution, heat index,
+category breakdown, risk thresholds, momentum inputs) with array
+operations. Loaded week frames are kept in a bounded LRU keyed on the
+week and its data version (app.services.data_versions): any writer that
+bumps a week's version, in this process or another, makes its cached frame
+unreachable. The ingest pipeline also drops the frames of the weeks it
+writes to right away.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import chain
+from threading import Lock
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.feedback import FeedbackCategory
+from app.models.analytics import FeedbackFact, SentimentCode, KeywordFlag, CATEGORY_BITS, STAGE_CODES
+from app.services.data_versions import get_week_versions
+from app.services.heat_index_calculator import HeatIndexCalculator
+from app.utils.weeks import week_key, week_keys_back, week_start_from_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+SENTIMENTS = {
+    "positive": SentimentCode.POSITIVE,
+    "neutral": SentimentCode.NEUTRAL,
+    "negative": SentimentCode.NEGATIVE,
+}
+
+STAGE_NAMES = {code: stage.value for stage, code in STAGE_CODES.items()}
+
+# Column name -> dtype, in the order they are selected from feedback_facts
+FRAME_COLUMNS = {
+    "sentiment": np.int8,
+    "rating": np.int8,  # 0 when the feedback has no rating
+    "category_mask": np.int16,
+    "keyword_flags": np.int16,
+    "batch_id": np.int32,
+    "location_id": np.int32,
+    "stage_code": np.int8,
+}
+
+
+def week_summary(
+    key: int,
+    volume: int,
+    counts: Dict[str, int],
+    categories: Dict[str, Dict[str, int]],
+    trainer_mentions: int,
+    mentor_mentions: int
+) -> Dict:
+    """
+    Build the per-week metrics dict shared by all analytics backends
+
+    `counts` and each entry of `categories` map sentiment -> count; category
+    totals are added here and categories without feedback are dropped.
+    """
+    week_start = week_start_from_key(key)
+    category_counts = {}
+    for category, sentiment_counts in categories.items():
+        total = sum(sentiment_counts.values())
+        if total:
+            category_counts[category] = {**sentiment_counts, "total": total}
+
+    return {
+        "week_key": key,
+        "week_start": week_start,
+        "week_end": week_start + timedelta(days=6),
+        "volume": volume,
+        **counts,
+        "categories": category_counts,
+        "trainer_mentions": trainer_mentions,
+        "mentor_mentions": mentor_mentions
+    }
+
+
+class WeekFrame:
+    """Columns of one week's feedback facts"""
+
+    __slots__ = ("week_key", *FRAME_COLUMNS)
+
+    def __init__(self, key: int, data: Optional[np.ndarray] = None):
+        self.week_key = key
+        for index, (name, dtype) in enumerate(FRAME_COLUMNS.items()):
+            column = data[:, index] if data is not None else ()
+            setattr(self, name, np.asarray(column, dtype=dtype))
+
+    def __len__(self) -> int:
+        return len(self.sentiment)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in FRAME_COLUMNS)
+
+    def has_flag(self, flag: int) -> np.ndarray:
+        """Boolean mask of rows with a keyword flag set"""
+        return (self.keyword_flags & int(flag)) != 0
+
+    def in_category(self, category: FeedbackCategory) -> np.ndarray:
+        """Boolean mask of rows mapped to a category"""
+        return (self.category_mask & CATEGORY_BITS[category]) != 0
+
+    def sentiment_counts(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Count rows per sentiment, optionally restricted to a boolean mask"""
+        codes = self.sentiment if mask is None else self.sentiment[mask]
+        counts = np.bincount(codes, minlength=len(SentimentCode))
+        return {sentiment: int(counts[code]) for sentiment, code in SENTIMENTS.items()}
+
+
+class WeekFrameCache:
+    """Bounded, thread-safe LRU of week frames keyed by week key and data version"""
+
+    def __init__(self, max_weeks: int):
+        self.max_weeks = max_weeks
+        self._frames: "OrderedDict[int, Tuple[int, WeekFrame]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: int, version: int) -> Optional[WeekFrame]:
+        """The cached frame of a week at `version` (None if missing or loaded at another version)"""
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._frames.move_to_end(key)
+            return entry[1]
+
+    def put(self, frame: WeekFrame, version: int) -> None:
+        with self._lock:
+            self._frames[frame.week_key] = (version, frame)  # Replaces the frame of any other version
+            self._frames.move_to_end(frame.week_key)
+            while len(self._frames) > self.max_weeks:
+                self._frames.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[int]) -> None:
+        with self._lock:
+            for key in keys:
+                self._frames.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+week_frame_cache = WeekFrameCache(settings.ANALYTICS_FRAME_CACHE_WEEKS)
+
+
+class ColumnarAnalytics:
+    """Dashboard metrics computed over cached week frames"""
+
+    def __init__(self, db: Session, cache: WeekFrameCache = week_frame_cache):
+        self.db = db
+        self.cache = cache
+
+    def frames(self, keys: List[int]) -> Dict[int, WeekFrame]:
+        """Get frames for the given week keys, loading all cache misses in one query"""
+        versions = get_week_versions(self.db, keys)
+        frames = {}
+        missing = []
+        for key in keys:
+            frame = self.cache.get(key, versions[key][0])
+            if frame is None:
+                missing.append(key)
+            else:
+                frames[key] = frame
+
+        if missing:
+            for frame in self._load(missing):
+                self.cache.put(frame, versions[frame.week_key][0])
+                frames[frame.week_key] = frame
+
+        return frames
+
+    def frame(self, week_start: datetime) -> WeekFrame:
+        """Get the frame of the week containing `week_start`"""
+        key = week_key(week_start)
+        return self.frames([key])[key]
+
+    def _load(self, keys: List[int]) -> List[WeekFrame]:
+        """Read the fact columns of the given weeks and split them per week"""
+        rows = self.db.query(
+            FeedbackFact.week_key,
+            FeedbackFact.sentiment_code,
+            func.coalesce(FeedbackFact.rating_score, 0),
+            FeedbackFact.category_mask,
+            FeedbackFact.keyword_flags,
+            FeedbackFact.batch_id,
+            FeedbackFact.location_id,
+            FeedbackFact.stage_code
+        ).filter(
+            FeedbackFact.week_key.in_(keys)
+        ).order_by(
+            FeedbackFact.week_key,
+            FeedbackFact.feedback_id
+        ).all()
+
+        width = len(FRAME_COLUMNS) + 1
+        data = np.fromiter(
+            chain.from_iterable(rows), dtype=np.int64, count=len(rows) * width
+        ).reshape(-1, width)
+        week_column = data[:, 0]
+
+        frames = []
+        for key in keys:
+            start, end = np.searchsorted(week_column, [key, key + 1])
+            frames.append(WeekFrame(key, data[start:end, 1:]))
+        return frames
+
+    def summary(self, frame: WeekFrame) -> Dict:
+        """
+        Aggregate one week frame
+
+        Returns the per-week dict used by WeekSeriesEngine (see `week_summary`)
+        """
+        is_positive = frame.sentiment == SentimentCode.POSITIVE
+
+        categories = {}
+        for category in FeedbackCategory:
+            categories[category.value] = frame.sentiment_counts(frame.in_category(category))
+
+        return week_summary(
+            frame.week_key,
+            volume=len(frame),
+            counts=frame.sentiment_counts(),
+            categories=categories,
+            trainer_mentions=int(np.count_nonzero(is_positive & frame.has_flag(KeywordFlag.TRAINER_MENTION))),
+            mentor_mentions=int(np.count_nonzero(is_positive & frame.has_flag(KeywordFlag.MENTOR_MENTION)))
+        )
+
+    def series(self, week_start: datetime, weeks_back: int = 8) -> List[Dict]:
+        """Week summaries for `weeks_back` weeks ending with `week_start` (newest first)"""
+        keys = week_keys_back(week_key(week_start), weeks_back)
+        frames = self.frames(keys)
+        return [self.summary(frames[key]) for key in keys]
+
+    def stage_sentiment(self, week_start: datetime) -> Dict[str, Dict[str, int]]:
+        """Sentiment counts (with "total") per trainee stage name of a week ("unknown" when unset)"""
+        frame = self.frame(week_start)
+        stages = {}
+        for stage_code in np.unique(frame.stage_code):
+            counts = frame.sentiment_counts(frame.stage_code == stage_code)
+            counts["total"] = sum(counts.values())
+            stages[STAGE_NAMES.get(int(stage_code), "unknown")] = counts
+        return stages
+
+    def sentiment_distribution(self, week_start: datetime) -> Dict[str, float]:
+        """Sentiment percentages of a week"""
+        frame = self.frame(week_start)
+        total = len(frame)
+        if total == 0:
+            return {"positive": 0, "neutral": 0, "negative": 0}
+        return {sentiment: count / total * 100 for sentiment, count in frame.sentiment_counts().items()}
+
+    def heat_index(self, week_start: datetime) -> float:
+        """Engagement heat index of a week (same weights as HeatIndexCalculator)"""
+        frame = self.frame(week_start)
+        if len(frame) == 0:
+            return 0.0
+
+        ratings = frame.rating[frame.rating > 0]
+        return HeatIndexCalculator.score(
+            total_count=len(frame),
+            positive_count=int(np.count_nonzero(frame.sentiment == SentimentCode.POSITIVE)),
+            avg_rating=float(ratings.mean()) if ratings.size else None,
+            engagement_mentions=int(np.count_nonzero(frame.has_flag(KeywordFlag.ENGAGEMENT)))
+        )
+
+    def category_breakdown(self, week_start: datetime) -> Dict[str, Dict[str, int]]:
+        """Sentiment counts per category of a week (categories without feedback omitted)"""
+        return self.summary(self.frame(week_start))["categories"]
+
+    def negative_percentage(self, week_start: datetime) -> Optional[float]:
+        """Share of negative feedback in a week (None when the week is empty)"""
+        frame = self.frame(week_start)
+        if len(frame) == 0:
+            return None
+        return np.count_nonzero(frame.sentiment == SentimentCode.NEGATIVE) / len(frame) * 100
+
+    def flag_count(self, week_start: datetime, flag: KeywordFlag) -> int:
+        """Number of feedback in a week whose text matched a keyword flag"""
+        return int(np.count_nonzero(self.frame(week_start).has_flag(flag)))
@@ -0,0 +1,102 @@
+"""
+Per-week data versions
+
+Every ingest bumps the version of the weeks it writes to, in the same
+transaction as the feedback rows. Caches and HTTP validators derive from
+these versions, so a change to one week only invalidates what depends on it.
+They also serve as the read replica's lag guard: the replica may serve a
+week only once it has replayed that week's current version.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import datetime, timezone
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import allow_replica_reads, replica_configured
+from app.models.analytics import WeekDataVersion
+from app.utils.upserts import increment_rows
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def bump_week_versions(db: Session, keys: Iterable[int]) -> None:
+    """Increment the data version of each week (the caller commits)"""
+    # One upsert per week: concurrent ingests never lose a bump, nor race on a week's first row
+    increment_rows(
+        db, WeekDataVersion, ["week_key"], ["version"], {(key,): [1] for key in set(keys)},
+        values={"updated_at": datetime.now(timezone.utc)}
+    )
+
+
+def get_week_versions(db: Session, keys: Iterable[int]) -> Dict[int, Tuple[int, Optional[datetime]]]:
+    """Current (version, updated_at) per week; weeks never ingested are (0, None)"""
+    keys = list(keys)
+    versions = {key: (0, None) for key in keys}
+    for key, version, updated_at in db.query(
+        WeekDataVersion.week_key, WeekDataVersion.version, WeekDataVersion.updated_at
+    ).filter(WeekDataVersion.week_key.in_(keys)):
+        versions[key] = (version, updated_at)
+    return versions
+
+
+def get_week_range_versions(db: Session, first_week: int, last_week: int) -> Dict[int, int]:
+    """Version per week from `first_week` to `last_week`, for the weeks ever ingested (one range query)"""
+    return dict(db.query(WeekDataVersion.week_key, WeekDataVersion.version).filter(
+        WeekDataVersion.week_key.between(first_week, last_week)
+    ))
+
+
+async def use_replica_for_weeks(
+    db: AsyncSession,
+    keys: Iterable[int],
+    primary_versions: Optional[Dict[int, Tuple[int, Optional[datetime]]]] = None
+) -> bool:
+    """
+    Route `db`'s reads to the analytics replica if it is current for `keys`
+
+    The replica is current when its data version of every week matches the
+    primary's (`primary_versions`, read from the primary when not given).
+    Otherwise, e.g. right after an ingest, reads stay on the primary.
+    Returns whether reads may use the read side (always True without a
+    replica: the local reader engine sees the primary's data).
+    """
+    if not replica_configured():
+        allow_replica_reads(db)
+        return True
+
+    keys = list(keys)
+    if primary_versions is None:
+        allow_replica_reads(db, False)
+        primary_versions = await db.run_sync(get_week_versions, keys)
+
+    replica_versions = await _replica_versions(db, get_week_versions, keys)
+    current = replica_versions is not None and all(
+        replica_versions[key][0] == primary_versions[key][0] for key in keys
+    )
+    allow_replica_reads(db, current)
+    return current
+
+
+async def use_replica_for_week_range(db: AsyncSession, first_week: int, last_week: int) -> bool:
+    """`use_replica_for_weeks` for every week from `first_week` to `last_week`, however many"""
+    if not replica_configured():
+        allow_replica_reads(db)
+        return True
+
+    allow_replica_reads(db, False)
+    primary_versions = await db.run_sync(get_week_range_versions, first_week, last_week)
+    # Weeks missing from both sides were never ingested: equal maps mean every week is current
+    current = await _replica_versions(db, get_week_range_versions, first_week, last_week) == primary_versions
+    allow_replica_reads(db, current)
+    return current
+
+
+async def _replica_versions(db: AsyncSession, read_versions, *args):
+    """`read_versions(db, *args)` on the replica (None if it is unavailable)"""
+    allow_replica_reads(db)
+    try:
+        return await db.run_sync(read_versions, *args)
+    except SQLAlchemyError as e:
+        logger.warning(f"Analytics replica unavailable, reading from the primary: {e}")
+        return None
@@ -0,0 +1,211 @@
+"""
+DuckDB analytics backend
+
+Runs the multi-week trend, heatmap and lifecycle aggregations in an
+embedded DuckDB over the `feedback_facts` table. SQLite databases are
+attached directly (read-only); other databases are read from Parquet
+snapshots, one file per week, that ingest refreshes for the weeks it
+writes (see `refresh_snapshots`).
+
+Enabled with ANALYTICS_BACKEND=duckdb. `duckdb` is an optional dependency.
+"""
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+import os
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.feedback import FeedbackCategory
+from app.models.analytics import FeedbackFact, SentimentCode, KeywordFlag, CATEGORY_BITS
+from app.services.columnar_analytics import SENTIMENTS, STAGE_NAMES, week_summary
+from app.utils.weeks import week_key, week_keys_back
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import duckdb
+except ImportError:  # Optional dependency
+    duckdb = None
+
+SNAPSHOT_TABLE = "feedback_facts"
+SNAPSHOT_COLUMNS = [
+    "feedback_id", "batch_id", "location_id", "sentiment_code", "tone_code",
+    "stage_code", "category_mask", "keyword_flags", "rating_score"
+]
+
+
+def _count_where(condition: str) -> str:
+    return f"count(*) FILTER (WHERE {condition})"
+
+
+# Same columns, in the same order, as ColumnarAnalytics.summary needs
+_SERIES_COLUMNS = [
+    "week_key",
+    "count(*)",
+    *(_count_where(f"sentiment_code = {int(code)}") for code in SENTIMENTS.values()),
+    _count_where(f"sentiment_code = {int(SentimentCode.POSITIVE)} AND keyword_flags & {int(KeywordFlag.TRAINER_MENTION)} <> 0"),
+    _count_where(f"sentiment_code = {int(SentimentCode.POSITIVE)} AND keyword_flags & {int(KeywordFlag.MENTOR_MENTION)} <> 0"),
+    *(
+        _count_where(f"sentiment_code = {int(code)} AND category_mask & {CATEGORY_BITS[category]} <> 0")
+        for category in FeedbackCategory
+        for code in SENTIMENTS.values()
+    ),
+]
+
+_connections: Dict[str, "duckdb.DuckDBPyConnection"] = {}
+_connections_lock = Lock()
+
+
+def duckdb_available() -> bool:
+    return duckdb is not None
+
+
+def snapshot_source(db: Session) -> str:
+    """Resolve ANALYTICS_DUCKDB_SOURCE ("auto" attaches SQLite files, snapshots otherwise)"""
+    source = settings.ANALYTICS_DUCKDB_SOURCE
+    if source == "auto":
+        return "sqlite" if db.get_bind().url.get_backend_name() == "sqlite" else "parquet"
+    if source not in ("sqlite", "parquet"):
+        raise ValueError(f"Unknown ANALYTICS_DUCKDB_SOURCE: {source}")
+    return source
+
+
+def _week_snapshot_path(directory: Path, key: int) -> Path:
+    return directory / SNAPSHOT_TABLE / f"week_key={key}" / "data.parquet"
+
+
+def refresh_snapshots(db: Session, keys: Optional[Iterable[int]] = None, directory: Optional[str] = None) -> int:
+    """
+    Rewrite the Parquet snapshot of the given weeks (all weeks when `keys` is None)
+
+    Returns the number of week files written.
+    """
+    directory = Path(directory or settings.ANALYTICS_SNAPSHOT_DIR)
+    if keys is None:
+        keys = [key for (key,) in db.query(FeedbackFact.week_key).distinct()]
+
+    written = 0
+    for key in keys:
+        rows = db.query(
+            *(getattr(FeedbackFact, column) for column in SNAPSHOT_COLUMNS)
+        ).filter(
+            FeedbackFact.week_key == key
+        ).order_by(FeedbackFact.feedback_id).all()
+
+        path = _week_snapshot_path(directory, key)
+        if not rows:
+            if path.exists():
+                path.unlink()
+            continue
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        frame = pd.DataFrame.from_records(rows, columns=SNAPSHOT_COLUMNS)
+        temp_path = path.with_suffix(".tmp")
+        with duckdb.connect() as conn:
+            conn.register("week_facts", frame)
+            conn.execute(f"COPY week_facts TO '{temp_path}' (FORMAT parquet, COMPRESSION zstd)")
+        os.replace(temp_path, path)  # Readers never see a half-written file
+        written += 1
+
+    return written
+
+
+class DuckDBAnalytics:
+    """Analytics backend with the same interface as ColumnarAnalytics, aggregated in DuckDB"""
+
+    def __init__(self, db: Session):
+        if duckdb is None:
+            raise RuntimeError("ANALYTICS_BACKEND=duckdb requires the duckdb package")
+        self.db = db
+        self.source = snapshot_source(db)
+
+    def _cursor(self) -> "duckdb.DuckDBPyConnection":
+        """Cursor on the shared connection for this source, with a `facts` view"""
+        if self.source == "sqlite":
+            source_key = os.path.abspath(self.db.get_bind().url.database)
+        else:
+            source_key = os.path.abspath(settings.ANALYTICS_SNAPSHOT_DIR)
+
+        with _connections_lock:
+            conn = _connections.get(source_key)
+            if conn is None:
+                conn = duckdb.connect()
+                if self.source == "sqlite":
+                    conn.execute(f"ATTACH '{source_key}' AS app (TYPE sqlite, READ_ONLY)")
+                    conn.execute(f"CREATE VIEW facts AS SELECT * FROM app.{SNAPSHOT_TABLE}")
+                else:
+                    pattern = Path(source_key) / SNAPSHOT_TABLE / "*" / "data.parquet"
+                    conn.execute(
+                        f"CREATE VIEW facts AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true)"
+                    )
+                _connections[source_key] = conn
+        return conn.cursor()
+
+    def _has_data(self) -> bool:
+        if self.source == "sqlite":
+            return True
+        return any((Path(settings.ANALYTICS_SNAPSHOT_DIR) / SNAPSHOT_TABLE).glob("*/data.parquet"))
+
+    def series(self, week_start: datetime, weeks_back: int = 8) -> List[Dict]:
+        """Week summaries for `weeks_back` weeks ending with `week_start` (newest first)"""
+        keys = week_keys_back(week_key(week_start), weeks_back)
+        rows = {}
+        if keys and self._has_data():
+            with self._cursor() as cursor:
+                result = cursor.execute(
+                    f"SELECT {', '.join(_SERIES_COLUMNS)} FROM facts "
+                    f"WHERE week_key IN ({', '.join(str(key) for key in keys)}) GROUP BY week_key"
+                ).fetchall()
+            rows = {row[0]: row for row in result}
+
+        return [self._summary(key, rows.get(key)) for key in keys]
+
+    def _summary(self, key: int, row: Optional[tuple]) -> Dict:
+        if row is None:
+            row = (key, 0) + (0,) * (len(_SERIES_COLUMNS) - 2)
+
+        values = iter(row[2:])
+        counts = {sentiment: next(values) for sentiment in SENTIMENTS}
+        trainer_mentions, mentor_mentions = next(values), next(values)
+        categories = {
+            category.value: {sentiment: next(values) for sentiment in SENTIMENTS}
+            for category in FeedbackCategory
+        }
+        return week_summary(key, row[1], counts, categories, trainer_mentions, mentor_mentions)
+
+    def stage_sentiment(self, week_start: datetime) -> Dict[str, Dict[str, int]]:
+        """Sentiment counts (with "total") per trainee stage name of a week ("unknown" when unset)"""
+        if not self._has_data():
+            return {}
+
+        with self._cursor() as cursor:
+            rows = cursor.execute(
+                "SELECT stage_code, sentiment_code, count(*) FROM facts "
+                "WHERE week_key = ? GROUP BY stage_code, sentiment_code",
+                [week_key(week_start)]
+            ).fetchall()
+
+        sentiment_names = {int(code): sentiment for sentiment, code in SENTIMENTS.items()}
+        stages = {}
+        for stage_code, sentiment_code, count in rows:
+            counts = stages.setdefault(
+                STAGE_NAMES.get(stage_code, "unknown"),
+                {"positive": 0, "neutral": 0, "negative": 0, "total": 0}
+            )
+            if sentiment_code in sentiment_names:
+                counts[sentiment_names[sentiment_code]] += count
+                counts["total"] += count
+        return stages
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Wrote {refresh_snapshots(session)} week snapshots to {settings.ANALYTICS_SNAPSHOT_DIR}")
+    finally:
+        session.close()
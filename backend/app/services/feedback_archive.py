@@ -0,0 +1,297 @@
+"""
+Cold-data archive of raw feedback
+
+The archive job moves weeks older than ARCHIVE_AFTER_WEEKS out of the hot
+tables. Each week's feedback, with its sentiment analysis and category
+mappings, is exported to one compressed Parquet file. The rows are then
+deleted from `feedback`, `sentiment_analysis` and `category_mappings`.
+The analytics facts stay in the database, so trends, heatmaps, lifecycle
+and every other aggregate are unaffected. Readers of raw feedback
+(insights, report generation, PDF export) go through `week_feedback` /
+`with_archived`, which add the archived rows of a week, read from the
+memory-mapped file.
+
+Layout:
+    {ARCHIVE_DIR}/feedback/week_key=202441/data.parquet
+
+Run the job with `python -m app.services.feedback_archive`. `pyarrow` is
+an optional dependency (required once weeks are archived).
+"""
+from typing import Callable, Dict, List, Optional
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import os
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.models.feedback import (
+    Feedback, SentimentAnalysis, CategoryMapping, SentimentCategory, EmotionalTone, FeedbackCategory, TraineeStage
+)
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.utils.partitioning import same_week_loads
+from app.utils.weeks import week_key, current_week_start, shift_week_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency
+    pa = None
+    pq = None
+
+ARCHIVE_TABLE = "feedback"
+DELETE_CHUNK = 500
+
+if pa is not None:
+    ARCHIVE_SCHEMA = pa.schema([
+        ("id", pa.int64()),
+        ("trainee_id", pa.string()),
+        ("location", pa.string()),
+        ("training_batch", pa.string()),
+        ("week_start_date", pa.timestamp("us")),
+        ("week_end_date", pa.timestamp("us")),
+        ("week_key", pa.int32()),
+        ("rating_score", pa.int16()),
+        ("open_text", pa.string()),
+        ("category_tags", pa.string()),
+        ("trainee_stage", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("sentiment_analysis", pa.struct([
+            ("id", pa.int64()),
+            ("sentiment_category", pa.string()),
+            ("emotional_tone", pa.string()),
+            ("confidence_score", pa.float64()),
+            ("raw_sentiment_scores", pa.string()),  # JSON
+            ("created_at", pa.timestamp("us")),
+        ])),
+        ("category_mappings", pa.list_(pa.struct([
+            ("id", pa.int64()),
+            ("category", pa.string()),
+            ("relevance_score", pa.float64()),
+            ("keywords_matched", pa.string()),  # JSON
+            ("created_at", pa.timestamp("us")),
+        ]))),
+    ])
+
+
+def archive_available() -> bool:
+    return pa is not None
+
+
+def _week_archive_path(key: int, directory: Optional[str] = None) -> Path:
+    return Path(directory or settings.ARCHIVE_DIR) / ARCHIVE_TABLE / f"week_key={key}" / "data.parquet"
+
+
+def archived_week_keys(directory: Optional[str] = None) -> List[int]:
+    """Week keys with an archive file, oldest first"""
+    root = Path(directory or settings.ARCHIVE_DIR) / ARCHIVE_TABLE
+    return sorted(int(path.parent.name.split("=", 1)[1]) for path in root.glob("week_key=*/data.parquet"))
+
+
+def is_archived(key: int, directory: Optional[str] = None) -> bool:
+    return _week_archive_path(key, directory).exists()
+
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite returns naive datetimes, PostgreSQL aware ones; the archive stores naive UTC
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _enum_value(value) -> Optional[str]:
+    return value.value if hasattr(value, "value") else value
+
+
+def _archive_record(feedback: Feedback) -> Dict:
+    analysis = feedback.sentiment_analysis
+    return {
+        "id": feedback.id,
+        "trainee_id": feedback.trainee_id,
+        "location": feedback.location,
+        "training_batch": feedback.training_batch,
+        "week_start_date": utc_naive(feedback.week_start_date),
+        "week_end_date": utc_naive(feedback.week_end_date),
+        "week_key": feedback.week_key,
+        "rating_score": feedback.rating_score,
+        "open_text": feedback.open_text,
+        "category_tags": feedback.category_tags,
+        "trainee_stage": _enum_value(feedback.trainee_stage),
+        "created_at": utc_naive(feedback.created_at),
+        "sentiment_analysis": None if analysis is None else {
+            "id": analysis.id,
+            "sentiment_category": _enum_value(analysis.sentiment_category),
+            "emotional_tone": _enum_value(analysis.emotional_tone),
+            "confidence_score": analysis.confidence_score,
+            "raw_sentiment_scores": json.dumps(analysis.raw_sentiment_scores),
+            "created_at": utc_naive(analysis.created_at),
+        },
+        "category_mappings": [{
+            "id": mapping.id,
+            "category": _enum_value(mapping.category),
+            "relevance_score": mapping.relevance_score,
+            "keywords_matched": json.dumps(mapping.keywords_matched),
+            "created_at": utc_naive(mapping.created_at),
+        } for mapping in feedback.category_mappings],
+    }
+
+
+def _feedback_from_record(record: Dict) -> Feedback:
+    """Rebuild a (transient, never added to a session) Feedback with its sentiment and categories"""
+    analysis = record["sentiment_analysis"]
+    return Feedback(
+        id=record["id"],
+        trainee_id=record["trainee_id"],
+        location=record["location"],
+        training_batch=record["training_batch"],
+        week_start_date=record["week_start_date"],
+        week_end_date=record["week_end_date"],
+        week_key=record["week_key"],
+        rating_score=record["rating_score"],
+        open_text=record["open_text"],
+        category_tags=record["category_tags"],
+        trainee_stage=TraineeStage(record["trainee_stage"]) if record["trainee_stage"] else None,
+        created_at=record["created_at"],
+        sentiment_analysis=None if analysis is None else SentimentAnalysis(
+            id=analysis["id"],
+            feedback_id=record["id"],
+            week_key=record["week_key"],
+            sentiment_category=SentimentCategory(analysis["sentiment_category"]),
+            emotional_tone=EmotionalTone(analysis["emotional_tone"]) if analysis["emotional_tone"] else None,
+            confidence_score=analysis["confidence_score"],
+            raw_sentiment_scores=json.loads(analysis["raw_sentiment_scores"]),
+            created_at=analysis["created_at"],
+        ),
+        category_mappings=[CategoryMapping(
+            id=mapping["id"],
+            feedback_id=record["id"],
+            week_key=record["week_key"],
+            category=FeedbackCategory(mapping["category"]),
+            relevance_score=mapping["relevance_score"],
+            keywords_matched=json.loads(mapping["keywords_matched"]),
+            created_at=mapping["created_at"],
+        ) for mapping in record["category_mappings"] or []],
+    )
+
+
+def _read_records(path: Path) -> List[Dict]:
+    # Memory-mapped: pages are read from the file cache as the columns are decoded
+    return pq.read_table(path, memory_map=True).to_pylist()
+
+
+def read_archived_week(key: int, directory: Optional[str] = None) -> List[Feedback]:
+    """The archived feedback of week `key` (with sentiment and categories), in id order"""
+    path = _week_archive_path(key, directory)
+    if not path.exists():
+        return []
+    if pq is None:
+        raise RuntimeError("pyarrow is required to read archived feedback")
+    return [_feedback_from_record(record) for record in _read_records(path)]
+
+
+def with_archived(
+    feedback: List[Feedback],
+    key: int,
+    predicate: Optional[Callable[[Feedback], bool]] = None
+) -> List[Feedback]:
+    """`feedback` (hot rows of week `key`) plus the week's archived feedback matching `predicate`, in id order"""
+    if not is_archived(key):
+        return feedback
+    hot_ids = {item.id for item in feedback}
+    archived = [
+        item for item in read_archived_week(key)
+        if item.id not in hot_ids and (predicate is None or predicate(item))
+    ]
+    return sorted(feedback + archived, key=lambda item: item.id)
+
+
+def week_feedback(db: Session, key: int, scope: AnalyticsScope = ALL_FEEDBACK) -> List[Feedback]:
+    """All feedback of week `key` in `scope` with sentiment and categories loaded, hot and archived, in id order"""
+    hot = db.query(Feedback).options(
+        selectinload(Feedback.sentiment_analysis),
+        selectinload(Feedback.category_mappings),
+        *same_week_loads(key)
+    ).filter(
+        Feedback.week_key == key,
+        *scope.feedback_criteria()
+    ).order_by(Feedback.id).all()
+    return with_archived(hot, key, None if scope.is_all else scope.matches)
+
+
+def archive_week(db: Session, key: int, directory: Optional[str] = None) -> int:
+    """
+    Export the hot feedback of week `key` to its archive file, then delete it from the hot tables
+
+    Rows already archived for the week are kept (late feedback is appended).
+    The file is complete before the delete commits, so a failure leaves rows
+    in both places rather than in neither; readers prefer the hot copy.
+    Returns the number of feedback rows moved.
+    """
+    feedback = db.query(Feedback).options(
+        selectinload(Feedback.sentiment_analysis),
+        selectinload(Feedback.category_mappings),
+        *same_week_loads(key)
+    ).filter(
+        Feedback.week_key == key
+    ).order_by(Feedback.id).all()
+    if not feedback:
+        return 0
+
+    path = _week_archive_path(key, directory)
+    records = {record["id"]: record for record in (_read_records(path) if path.exists() else [])}
+    records.update((item.id, _archive_record(item)) for item in feedback)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    table = pa.Table.from_pylist([records[feedback_id] for feedback_id in sorted(records)], schema=ARCHIVE_SCHEMA)
+    pq.write_table(table, temp_path, compression=settings.ARCHIVE_COMPRESSION)
+    os.replace(temp_path, path)  # Readers never see a half-written file
+
+    # Only the exported rows: feedback ingested meanwhile stays hot
+    ids = [item.id for item in feedback]
+    db.expunge_all()
+    for start in range(0, len(ids), DELETE_CHUNK):
+        chunk = ids[start:start + DELETE_CHUNK]
+        for model in (CategoryMapping, SentimentAnalysis):
+            db.query(model).filter(
+                model.week_key == key, model.feedback_id.in_(chunk)
+            ).delete(synchronize_session=False)
+        db.query(Feedback).filter(
+            Feedback.week_key == key, Feedback.id.in_(chunk)
+        ).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
+
+
+def archive_weeks(db: Session, before_key: Optional[int] = None, directory: Optional[str] = None) -> Dict[int, int]:
+    """
+    Archive every week older than `before_key` (default: ARCHIVE_AFTER_WEEKS before the current week)
+
+    Returns the number of feedback rows moved per week.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to archive feedback")
+    if before_key is None:
+        before_key = shift_week_key(week_key(current_week_start()), -settings.ARCHIVE_AFTER_WEEKS)
+
+    keys = [key for (key,) in db.query(Feedback.week_key).filter(
+        Feedback.week_key < before_key
+    ).distinct().order_by(Feedback.week_key)]
+    moved = {}
+    for key in keys:
+        moved[key] = archive_week(db, key, directory)
+        logger.info(f"Archived {moved[key]} feedback rows of week {key}")
+    return moved
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        moved = archive_weeks(session)
+        print(f"Archived {sum(moved.values())} feedback rows from {len(moved)} weeks to {settings.ARCHIVE_DIR}")
+    finally:
+        session.close()
@@ -0,0 +1,314 @@
+"""
+Pre-aggregated feedback cube
+
+`feedback_cube` holds, per week × batch × location × category × sentiment
+× stage, the number of feedback, their rating sum and count, and the
+keyword-flag counts the dashboards use. Every feedback is counted under
+ALL_CATEGORIES and once more under each category it maps to, so weekly
+totals and category breakdowns are both single lookups.
+
+The ingest pipeline keeps the cube current: `CubeDelta` collects the
+changes of an upload from its facts and `apply` adds them with atomic
+upserts, in the same transaction as the rows. `rebuild_cube` recomputes
+weeks from `feedback_facts` (migration and `python -m app.services.feedback_cube`).
+
+`CubeAnalytics` answers the analytics backend interface from the cube
+for any AnalyticsScope. A week is at most a few rows per batch, location,
+category and sentiment, whatever its feedback volume. The heat index is a
+formula over the stored volume, positive count, rating sum and engagement
+count, so a series of weeks or a batch × week matrix is one grouped query.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import SmallInteger, case, func, literal, select
+from sqlalchemy.orm import Session
+from app.models.feedback import FeedbackCategory
+from app.models.analytics import (
+    AnalyticsBatch, FeedbackCube, FeedbackFact, KeywordFlag, SentimentCode,
+    ALL_CATEGORIES, CATEGORY_BITS, CATEGORY_CODES
+)
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.services.columnar_analytics import SENTIMENTS, STAGE_NAMES, week_summary
+from app.services.heat_index_calculator import HeatIndexCalculator
+from app.utils.upserts import increment_rows
+from app.utils.weeks import week_key, week_keys_back, week_start_from_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+CUBE_KEYS = ["week_key", "batch_id", "location_id", "category_code", "sentiment_code", "stage_code"]
+
+# Keyword flags with a cube measure
+FLAG_MEASURES = {
+    KeywordFlag.ENGAGEMENT: "engagement_count",
+    KeywordFlag.ASSESSMENT_STRESS: "stress_count",
+    KeywordFlag.TRAINER_MENTION: "trainer_mention_count",
+    KeywordFlag.MENTOR_MENTION: "mentor_mention_count",
+}
+
+CUBE_MEASURES = ["feedback_count", "rating_sum", "rating_count", *FLAG_MEASURES.values()]
+
+CATEGORY_NAMES = {code: category.value for category, code in CATEGORY_CODES.items()}
+SENTIMENT_NAMES = {int(code): sentiment for sentiment, code in SENTIMENTS.items()}
+
+
+def _empty_totals() -> Dict[str, int]:
+    return {"volume": 0, **{sentiment: 0 for sentiment in SENTIMENTS}, **{measure: 0 for measure in CUBE_MEASURES}}
+
+
+def _heat_index(totals: Dict[str, int]) -> float:
+    """Heat index of summed cube measures (0 without feedback)"""
+    if totals["volume"] == 0:
+        return 0.0
+    return HeatIndexCalculator.score(
+        total_count=totals["volume"],
+        positive_count=totals["positive"],
+        avg_rating=totals["rating_sum"] / totals["rating_count"] if totals["rating_count"] else None,
+        engagement_mentions=totals["engagement_count"]
+    )
+
+
+def _fact_cells(fact: FeedbackFact) -> Iterable[Tuple[int, ...]]:
+    """Cube keys a fact is counted under"""
+    mask = fact.category_mask or 0
+    for code in [ALL_CATEGORIES] + [CATEGORY_CODES[category] for category, bit in CATEGORY_BITS.items() if mask & bit]:
+        yield (
+            fact.week_key, fact.batch_id, fact.location_id, code,
+            int(fact.sentiment_code or 0), int(fact.stage_code or 0)
+        )
+
+
+def _fact_measures(fact: FeedbackFact) -> List[int]:
+    flags = fact.keyword_flags or 0
+    rating = fact.rating_score or 0
+    return [1, rating, 1 if rating > 0 else 0, *(1 if flags & flag else 0 for flag in FLAG_MEASURES)]
+
+
+class CubeDelta:
+    """Cube changes of the facts written in one transaction"""
+
+    def __init__(self):
+        self.cells: Dict[Tuple[int, ...], List[int]] = {}
+
+    def add(self, fact: FeedbackFact) -> None:
+        measures = _fact_measures(fact)
+        for cell in _fact_cells(fact):
+            totals = self.cells.setdefault(cell, [0] * len(CUBE_MEASURES))
+            for index, value in enumerate(measures):
+                totals[index] += value
+
+    def apply(self, db: Session) -> None:
+        """Add the changes to the cube in the session's transaction (the caller commits)"""
+        increment_rows(db, FeedbackCube, CUBE_KEYS, CUBE_MEASURES, self.cells)
+
+    def clear(self) -> None:
+        self.cells.clear()
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+
+def rebuild_cube(db: Session, keys: Optional[Iterable[int]] = None) -> int:
+    """Recompute the cube of the given weeks (all weeks when None) from feedback_facts; returns facts counted"""
+    keys = sorted(set(keys)) if keys is not None else None
+
+    deleted = db.query(FeedbackCube)
+    if keys is not None:
+        deleted = deleted.filter(FeedbackCube.week_key.in_(keys))
+    deleted.delete(synchronize_session=False)
+
+    measures = [
+        func.count(),
+        func.coalesce(func.sum(func.coalesce(FeedbackFact.rating_score, 0)), 0),
+        func.sum(case((FeedbackFact.rating_score > 0, 1), else_=0)),
+        *(
+            func.sum(case((FeedbackFact.keyword_flags.op("&")(int(flag)) != 0, 1), else_=0))
+            for flag in FLAG_MEASURES
+        ),
+    ]
+    categories = [(ALL_CATEGORIES, None)] + [
+        (CATEGORY_CODES[category], FeedbackFact.category_mask.op("&")(bit) != 0)
+        for category, bit in CATEGORY_BITS.items()
+    ]
+    for code, condition in categories:
+        query = select(
+            FeedbackFact.week_key, FeedbackFact.batch_id, FeedbackFact.location_id,
+            literal(code, SmallInteger), FeedbackFact.sentiment_code, FeedbackFact.stage_code, *measures
+        )
+        if keys is not None:
+            query = query.where(FeedbackFact.week_key.in_(keys))
+        if condition is not None:
+            query = query.where(condition)
+        query = query.group_by(
+            FeedbackFact.week_key, FeedbackFact.batch_id, FeedbackFact.location_id,
+            FeedbackFact.sentiment_code, FeedbackFact.stage_code
+        )
+        db.execute(FeedbackCube.__table__.insert().from_select(CUBE_KEYS + CUBE_MEASURES, query))
+
+    counted = db.query(func.coalesce(func.sum(FeedbackCube.feedback_count), 0)).filter(
+        FeedbackCube.category_code == ALL_CATEGORIES,
+        *([FeedbackCube.week_key.in_(keys)] if keys is not None else [])
+    ).scalar()
+    db.commit()
+    return int(counted)
+
+
+class CubeAnalytics:
+    """Analytics backend with the same interface as ColumnarAnalytics, read from the feedback cube"""
+
+    def __init__(self, db: Session, scope: AnalyticsScope = ALL_FEEDBACK):
+        self.db = db
+        self.scope = scope
+
+    def _rows(self, keys: List[int], *dimensions, all_categories: bool = False) -> List[tuple]:
+        """Measure sums (CUBE_MEASURES order) grouped by `dimensions` over the scope's cells of `keys`"""
+        if not keys or self.scope.is_empty:
+            return []
+        query = self.db.query(
+            *dimensions, *(func.sum(getattr(FeedbackCube, measure)) for measure in CUBE_MEASURES)
+        ).filter(
+            FeedbackCube.week_key.in_(keys)
+        )
+        if all_categories:
+            query = query.filter(FeedbackCube.category_code == ALL_CATEGORIES)
+        query = self.scope.restrict(query, FeedbackCube.batch_id, FeedbackCube.location_id)
+        return query.group_by(*dimensions).all()
+
+    def _grouped_totals(self, keys: List[int], *dimensions) -> Dict[tuple, Dict[str, int]]:
+        """Volume, sentiment counts and summed measures per `dimensions` values over the weeks `keys`"""
+        groups = {}
+        for row in self._rows(keys, *dimensions, FeedbackCube.sentiment_code, all_categories=True):
+            group, sentiment_code = tuple(row[:len(dimensions)]), row[len(dimensions)]
+            values = dict(zip(CUBE_MEASURES, (int(value or 0) for value in row[len(dimensions) + 1:])))
+            totals = groups.setdefault(group, _empty_totals())
+            for measure, value in values.items():
+                totals[measure] += value
+            totals["volume"] += values["feedback_count"]
+            if sentiment_code in SENTIMENT_NAMES:
+                totals[SENTIMENT_NAMES[sentiment_code]] += values["feedback_count"]
+        return groups
+
+    def _totals(self, week_start: datetime) -> Dict[str, int]:
+        """Volume, sentiment counts and summed measures of one week"""
+        return self._grouped_totals([week_key(week_start)]).get((), _empty_totals())
+
+    def series(self, week_start: datetime, weeks_back: int = 8) -> List[Dict]:
+        """Week summaries for `weeks_back` weeks ending with `week_start` (newest first)"""
+        keys = week_keys_back(week_key(week_start), weeks_back)
+        weeks = {
+            key: {
+                "volume": 0,
+                "counts": {sentiment: 0 for sentiment in SENTIMENTS},
+                "categories": {category.value: {sentiment: 0 for sentiment in SENTIMENTS} for category in FeedbackCategory},
+                "trainer_mentions": 0,
+                "mentor_mentions": 0,
+            }
+            for key in keys
+        }
+        for key, category_code, sentiment_code, *measures in self._rows(
+            keys, FeedbackCube.week_key, FeedbackCube.category_code, FeedbackCube.sentiment_code
+        ):
+            values = dict(zip(CUBE_MEASURES, (int(value or 0) for value in measures)))
+            week = weeks[key]
+            sentiment = SENTIMENT_NAMES.get(sentiment_code)
+            if category_code == ALL_CATEGORIES:
+                week["volume"] += values["feedback_count"]
+                if sentiment:
+                    week["counts"][sentiment] += values["feedback_count"]
+                if sentiment_code == SentimentCode.POSITIVE:
+                    week["trainer_mentions"] += values["trainer_mention_count"]
+                    week["mentor_mentions"] += values["mentor_mention_count"]
+            elif sentiment and category_code in CATEGORY_NAMES:
+                week["categories"][CATEGORY_NAMES[category_code]][sentiment] += values["feedback_count"]
+
+        return [
+            week_summary(
+                key, weeks[key]["volume"], weeks[key]["counts"], weeks[key]["categories"],
+                weeks[key]["trainer_mentions"], weeks[key]["mentor_mentions"]
+            )
+            for key in keys
+        ]
+
+    def stage_sentiment(self, week_start: datetime) -> Dict[str, Dict[str, int]]:
+        """Sentiment counts (with "total") per trainee stage name of a week ("unknown" when unset)"""
+        stages = {}
+        for stage_code, sentiment_code, feedback_count, *_ in self._rows(
+            [week_key(week_start)], FeedbackCube.stage_code, FeedbackCube.sentiment_code, all_categories=True
+        ):
+            counts = stages.setdefault(
+                STAGE_NAMES.get(stage_code, "unknown"),
+                {"positive": 0, "neutral": 0, "negative": 0, "total": 0}
+            )
+            if sentiment_code in SENTIMENT_NAMES:
+                counts[SENTIMENT_NAMES[sentiment_code]] += int(feedback_count)
+                counts["total"] += int(feedback_count)
+        return stages
+
+    def sentiment_distribution(self, week_start: datetime) -> Dict[str, float]:
+        """Sentiment percentages of a week"""
+        totals = self._totals(week_start)
+        if totals["volume"] == 0:
+            return {"positive": 0, "neutral": 0, "negative": 0}
+        return {sentiment: totals[sentiment] / totals["volume"] * 100 for sentiment in SENTIMENTS}
+
+    def heat_index(self, week_start: datetime) -> float:
+        """Engagement heat index of a week (same weights as HeatIndexCalculator)"""
+        return _heat_index(self._totals(week_start))
+
+    def heat_index_series(self, week_start: datetime, weeks_back: int = 8) -> List[Dict]:
+        """Heat index and volume of `weeks_back` weeks ending with `week_start` (newest first), in one query"""
+        keys = week_keys_back(week_key(week_start), weeks_back)
+        groups = self._grouped_totals(keys, FeedbackCube.week_key)
+        series = []
+        for key in keys:
+            totals = groups.get((key,), _empty_totals())
+            series.append({
+                "week_key": key,
+                "week_start": week_start_from_key(key),
+                "volume": totals["volume"],
+                "heat_index": _heat_index(totals),
+            })
+        return series
+
+    def heat_index_matrix(self, week_start: datetime, weeks_back: int = 8) -> Dict[str, Dict[int, Dict]]:
+        """Heat index and volume per batch name and week key (weeks without feedback omitted), in one query"""
+        keys = week_keys_back(week_key(week_start), weeks_back)
+        groups = self._grouped_totals(keys, FeedbackCube.batch_id, FeedbackCube.week_key)
+        names = dict(self.db.query(AnalyticsBatch.id, AnalyticsBatch.name).filter(
+            AnalyticsBatch.id.in_({batch_id for batch_id, _ in groups})
+        )) if groups else {}
+        matrix = {}
+        for (batch_id, key), totals in groups.items():
+            if totals["volume"]:
+                matrix.setdefault(names[batch_id], {})[key] = {
+                    "volume": totals["volume"],
+                    "heat_index": _heat_index(totals),
+                }
+        return matrix
+
+    def category_breakdown(self, week_start: datetime) -> Dict[str, Dict[str, int]]:
+        """Sentiment counts per category of a week (categories without feedback omitted)"""
+        return self.series(week_start, 1)[0]["categories"]
+
+    def negative_percentage(self, week_start: datetime) -> Optional[float]:
+        """Share of negative feedback in a week (None when the week is empty)"""
+        totals = self._totals(week_start)
+        if totals["volume"] == 0:
+            return None
+        return totals["negative"] / totals["volume"] * 100
+
+    def flag_count(self, week_start: datetime, flag: KeywordFlag) -> int:
+        """Number of feedback in a week whose text matched a keyword flag"""
+        if flag not in FLAG_MEASURES:
+            raise ValueError(f"The feedback cube does not count {flag!r}")
+        return self._totals(week_start)[FLAG_MEASURES[flag]]
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt the feedback cube from {rebuild_cube(session)} feedback facts")
+    finally:
+        session.close()
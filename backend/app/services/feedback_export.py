@@ -0,0 +1,274 @@
+"""
+Streaming bulk export of scored feedback
+
+Exports feedback with its sentiment and categories as CSV, NDJSON or
+Parquet. Rows are read through a server-side cursor (`yield_per`) in
+chunks of EXPORT_CHUNK_ROWS; each chunk's categories are loaded with one
+query, encoded and handed to the response before the next chunk is read.
+Memory therefore stays at one chunk whatever the size of the export
+(Parquet writes one row group per chunk).
+
+Archived weeks in the range (see app/services/feedback_archive.py) are
+exported first, from their Parquet files, then the hot tables in id order.
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from collections import defaultdict
+from datetime import datetime
+import csv
+import io
+import json
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.feedback import Feedback, SentimentAnalysis, CategoryMapping
+from app.services.feedback_archive import archived_week_keys, read_archived_week, utc_naive
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency
+    pa = None
+    pq = None
+
+# Media type and file extension per export format
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+EXPORT_COLUMNS = [
+    "id", "trainee_id", "location", "training_batch", "week_key", "week_start_date",
+    "rating_score", "trainee_stage", "category_tags", "open_text", "created_at",
+    "sentiment_category", "emotional_tone", "confidence_score", "categories",
+]
+
+if pa is not None:
+    EXPORT_SCHEMA = pa.schema([
+        ("id", pa.int64()),
+        ("trainee_id", pa.string()),
+        ("location", pa.string()),
+        ("training_batch", pa.string()),
+        ("week_key", pa.int32()),
+        ("week_start_date", pa.timestamp("us")),
+        ("rating_score", pa.int16()),
+        ("trainee_stage", pa.string()),
+        ("category_tags", pa.string()),
+        ("open_text", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("sentiment_category", pa.string()),
+        ("emotional_tone", pa.string()),
+        ("confidence_score", pa.float64()),
+        ("categories", pa.list_(pa.string())),
+    ])
+
+
+def export_available(export_format: str) -> bool:
+    """Whether `export_format` is known and its encoder installed"""
+    return export_format in EXPORT_FORMATS and (export_format != "parquet" or pa is not None)
+
+
+def _value(value):
+    """Enums as their values, datetimes as naive UTC (as in the archive, whatever the database)"""
+    if isinstance(value, datetime):
+        return utc_naive(value)
+    return value.value if hasattr(value, "value") else value
+
+
+def _archived_row(feedback: Feedback) -> Dict:
+    analysis = feedback.sentiment_analysis
+    return {
+        "id": feedback.id,
+        "trainee_id": feedback.trainee_id,
+        "location": feedback.location,
+        "training_batch": feedback.training_batch,
+        "week_key": feedback.week_key,
+        "week_start_date": feedback.week_start_date,
+        "rating_score": feedback.rating_score,
+        "trainee_stage": _value(feedback.trainee_stage),
+        "category_tags": feedback.category_tags,
+        "open_text": feedback.open_text,
+        "created_at": feedback.created_at,
+        "sentiment_category": _value(analysis.sentiment_category) if analysis else None,
+        "emotional_tone": _value(analysis.emotional_tone) if analysis else None,
+        "confidence_score": analysis.confidence_score if analysis else None,
+        "categories": [_value(mapping.category) for mapping in feedback.category_mappings],
+    }
+
+
+def feedback_chunks(
+    db: Session,
+    week_from: Optional[int] = None,
+    week_to: Optional[int] = None,
+    batch: Optional[str] = None,
+    location: Optional[str] = None,
+    allowed_batches: Optional[List[str]] = None,
+    chunk_rows: Optional[int] = None
+) -> Iterator[List[Dict]]:
+    """Export rows (dicts with EXPORT_COLUMNS) of the feedback matching the filters, chunk by chunk"""
+    chunk_rows = chunk_rows or settings.EXPORT_CHUNK_ROWS
+
+    def matches(row: Dict) -> bool:
+        return (
+            (batch is None or row["training_batch"] == batch)
+            and (location is None or row["location"] == location)
+            and (allowed_batches is None or row["training_batch"] in allowed_batches)
+        )
+
+    def in_range(query, week_column):
+        if week_from is not None:
+            query = query.where(week_column >= week_from)
+        if week_to is not None:
+            query = query.where(week_column <= week_to)
+        return query
+
+    # Archived weeks first (their ids predate the hot rows)
+    for key in archived_week_keys():
+        if (week_from is not None and key < week_from) or (week_to is not None and key > week_to):
+            continue
+        # Rows still hot (an interrupted archive run) are exported from the tables
+        hot_ids = set(db.scalars(select(Feedback.id).where(Feedback.week_key == key)))
+        rows = [
+            _archived_row(feedback) for feedback in read_archived_week(key)
+            if feedback.id not in hot_ids
+        ]
+        rows = [row for row in rows if matches(row)]
+        for start in range(0, len(rows), chunk_rows):
+            yield rows[start:start + chunk_rows]
+
+    query = in_range(select(
+        Feedback.id,
+        Feedback.trainee_id,
+        Feedback.location,
+        Feedback.training_batch,
+        Feedback.week_key,
+        Feedback.week_start_date,
+        Feedback.rating_score,
+        Feedback.trainee_stage,
+        Feedback.category_tags,
+        Feedback.open_text,
+        Feedback.created_at,
+        SentimentAnalysis.sentiment_category,
+        SentimentAnalysis.emotional_tone,
+        SentimentAnalysis.confidence_score,
+    ).outerjoin(
+        SentimentAnalysis, SentimentAnalysis.feedback_id == Feedback.id
+    ), Feedback.week_key)
+    if batch:
+        query = query.where(Feedback.training_batch == batch)
+    if location:
+        query = query.where(Feedback.location == location)
+    if allowed_batches is not None:
+        query = query.where(Feedback.training_batch.in_(allowed_batches))
+
+    # Server-side cursor: rows arrive `chunk_rows` at a time
+    result = db.execute(query.order_by(Feedback.id).execution_options(yield_per=chunk_rows))
+    for partition in result.partitions():
+        categories = defaultdict(list)
+        ids = [row.id for row in partition]
+        for feedback_id, category in db.execute(in_range(select(
+            CategoryMapping.feedback_id, CategoryMapping.category
+        ).where(
+            CategoryMapping.feedback_id.in_(ids)
+        ), CategoryMapping.week_key).order_by(CategoryMapping.id)):
+            categories[feedback_id].append(category.value)
+
+        yield [{
+            **{column: _value(value) for column, value in row._mapping.items()},
+            "categories": categories[row.id],
+        } for row in partition]
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_csv(chunks: Iterable[List[Dict]]) -> Iterator[bytes]:
+    """CSV with a header row; categories are separated by ';'"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        for row in chunk:
+            writer.writerow([
+                ";".join(row["categories"]) if column == "categories" else _text(row[column])
+                for column in EXPORT_COLUMNS
+            ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # Header only: nothing matched
+
+
+def encode_ndjson(chunks: Iterable[List[Dict]]) -> Iterator[bytes]:
+    """One JSON object per line"""
+    for chunk in chunks:
+        yield "".join(
+            json.dumps({column: row[column] for column in EXPORT_COLUMNS}, default=_text) + "\n"
+            for row in chunk
+        ).encode()
+
+
+class StreamSink(io.RawIOBase):
+    """Write-only file collecting what a writer (Parquet, ZIP) produced since the last drain"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def encode_parquet(chunks: Iterable[List[Dict]]) -> Iterator[bytes]:
+    """Parquet, one row group per chunk (the footer comes last)"""
+    sink = StreamSink()
+    writer = pq.ParquetWriter(sink, EXPORT_SCHEMA, compression=settings.ARCHIVE_COMPRESSION)
+    try:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=EXPORT_SCHEMA))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+ENCODERS: Dict[str, Callable[[Iterable[List[Dict]]], Iterator[bytes]]] = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet,
+}
+
+
+def stream_export(session_factory: Callable[[], Session], export_format: str, **filters) -> Iterator[bytes]:
+    """
+    Encoded export of the feedback matching `filters` (see `feedback_chunks`)
+
+    The session lives as long as the stream: it is opened on the first chunk
+    and closed when the stream ends or the client goes away.
+    """
+    db = session_factory()
+    try:
+        yield from ENCODERS[export_format](feedback_chunks(db, **filters))
+    finally:
+        db.close()
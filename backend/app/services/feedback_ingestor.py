@@ -0,0 +1,238 @@
+"""
+Feedback ingest pipeline
+"""
+from typing import Dict, List
+from datetime import timedelta
+from sqlalchemy.orm import Session
+from app.models.feedback import (
+    Feedback, SentimentAnalysis, CategoryMapping, SentimentCategory, EmotionalTone, FeedbackCategory, TraineeStage
+)
+from app.models.analytics import (
+    AnalyticsBatch, AnalyticsLocation, FeedbackFact, KeywordFlag, SentimentCode,
+    SENTIMENT_CODES, TONE_CODES, STAGE_CODES, category_mask
+)
+from app.ml.sentiment_analyzer import sentiment_analyzer
+from app.ml.category_mapper import category_mapper
+from app.ml.insight_generator import InsightGenerator
+from app.services.heat_index_calculator import HeatIndexCalculator
+from app.services.analytics_backend import invalidate_weeks
+from app.services.feedback_cube import CubeDelta
+from app.services.keyword_index import KeywordDelta
+from app.services.representative_quotes import QuoteDelta
+from app.services.semantic_index import update_semantic_index
+from app.services.data_versions import bump_week_versions
+from app.utils.partitioning import missing_partitions, create_partitions, mark_partitions_created
+from app.utils.weeks import week_key, current_week_start
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keyword lists behind each KeywordFlag (matched as lowercase substrings, like the analyzers do)
+KEYWORD_FLAG_TERMS = {
+    KeywordFlag.ENGAGEMENT: HeatIndexCalculator.ENGAGEMENT_KEYWORDS,
+    KeywordFlag.ASSESSMENT_STRESS: InsightGenerator.STRESS_KEYWORDS,
+    KeywordFlag.APPRECIATION: InsightGenerator.APPRECIATION_KEYWORDS,
+    KeywordFlag.TRAINER_MENTION: ["trainer", "instructor"],
+    KeywordFlag.MENTOR_MENTION: ["mentor", "guide"],
+    KeywordFlag.TRAINER_RECOGNITION: InsightGenerator.TRAINER_KEYWORDS,
+    KeywordFlag.MENTOR_RECOGNITION: InsightGenerator.MENTOR_KEYWORDS,
+}
+
+
+def keyword_flags(text: str) -> int:
+    """Compute the KeywordFlag bitmask for a feedback text"""
+    text_lower = (text or "").lower()
+    flags = 0
+    for flag, keywords in KEYWORD_FLAG_TERMS.items():
+        if any(keyword in text_lower for keyword in keywords):
+            flags |= flag
+    return flags
+
+
+class FeedbackIngestor:
+    """Persist processed feedback records with sentiment, categories and analytics facts"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._dimension_ids = {}
+        self.week_keys = set()  # Weeks written since the last commit
+        self.new_partitions = set()  # Partitions created in the current transaction
+        self.cube = CubeDelta()  # Cube changes of the facts written since the last commit
+        self.keywords = KeywordDelta()  # Keyword count changes since the last commit
+        self.quotes = QuoteDelta()  # Quote candidates since the last commit
+        self.semantic_rows = []  # Texts to add to the semantic index after the commit
+
+    def prepare(self, records: List[Dict]) -> None:
+        """
+        Create storage partitions for the weeks of `records` before ingesting them
+
+        Only does anything for week-partitioned PostgreSQL tables. Partitions
+        made here are committed on their own, before this upload's rows lock
+        the tables.
+        """
+        self._ensure_partitions({
+            week_key(record.get("week_start_date") or current_week_start()) for record in records
+        })
+
+    def ingest(self, record: Dict) -> Feedback:
+        """
+        Score and store one record as produced by FileProcessor.process_file
+
+        Adds the Feedback row, its SentimentAnalysis, CategoryMappings and
+        FeedbackFact to the session. The caller commits through `commit()`.
+        """
+        # Determine week dates if not provided
+        week_start = record.get("week_start_date")
+        week_end = record.get("week_end_date")
+
+        if not week_start:
+            # Default to current week
+            week_start = current_week_start()
+        if not week_end:
+            week_end = week_start + timedelta(days=6)
+
+        # Trainee stage would need the trainee start date; it is left empty for now
+        feedback = Feedback(
+            trainee_id=record["trainee_id"],
+            location=record["location"],
+            training_batch=record["training_batch"],
+            week_start_date=week_start,
+            week_end_date=week_end,
+            week_key=week_key(week_start),
+            rating_score=record["rating_score"],
+            open_text=record["open_text"],
+            category_tags=record.get("category_tags")
+        )
+        self._ensure_partitions([feedback.week_key])
+        self.db.add(feedback)
+
+        # Perform sentiment analysis
+        sentiment_result = sentiment_analyzer.analyze(record["open_text"])
+        emotional_tone = sentiment_analyzer.detect_emotional_tone(
+            record["open_text"],
+            sentiment_result["sentiment"]
+        )
+
+        self.db.add(SentimentAnalysis(
+            feedback=feedback,
+            week_key=feedback.week_key,
+            sentiment_category=SentimentCategory(sentiment_result["sentiment"]),
+            emotional_tone=emotional_tone,
+            confidence_score=sentiment_result["confidence"],
+            raw_sentiment_scores=sentiment_result["scores"]
+        ))
+
+        # Map categories
+        for mapping in category_mapper.map_categories(record["open_text"], record.get("category_tags")):
+            self.db.add(CategoryMapping(
+                feedback=feedback,
+                week_key=feedback.week_key,
+                category=FeedbackCategory(mapping["category"]),
+                relevance_score=mapping["relevance_score"],
+                keywords_matched=mapping["keywords_matched"]
+            ))
+
+        self.db.flush()  # Assign feedback.id before writing the fact row
+        self.add_fact(feedback)
+        self.week_keys.add(feedback.week_key)
+
+        return feedback
+
+    def add_fact(self, feedback: Feedback) -> None:
+        """Add a feedback's analytics fact to the session, and its counts and quotes to the pending rollups"""
+        fact = self.build_fact(feedback)
+        self.db.add(fact)
+        self.cube.add(fact)
+        self.keywords.add(fact, feedback.category_mappings)
+        self.quotes.add(fact, feedback)
+        self.semantic_rows.append((fact.week_key, feedback.id, fact.batch_id, fact.location_id, feedback.open_text))
+        self.week_keys.add(fact.week_key)
+
+    def commit(self) -> None:
+        """Commit the ingested rows with their rollup changes, bump their weeks' data versions and drop cached analytics"""
+        self.cube.apply(self.db)
+        self.keywords.apply(self.db)
+        self.quotes.apply(self.db)
+        bump_week_versions(self.db, self.week_keys)
+        self.db.commit()
+        self.cube.clear()
+        self.keywords.clear()
+        self.quotes.clear()
+        mark_partitions_created(self.db.get_bind(), self.new_partitions)
+        invalidate_weeks(self.db, self.week_keys)
+        try:
+            update_semantic_index(self.db, self.semantic_rows)
+        except Exception:
+            # The rows are committed; `python -m app.services.semantic_index` catches the index up
+            logger.exception("Could not add feedback to the semantic index")
+        self.week_keys.clear()
+        self.new_partitions.clear()
+        self.semantic_rows.clear()
+
+    def build_fact(self, feedback: Feedback) -> FeedbackFact:
+        """Build the compact analytics row for a feedback with its sentiment and categories loaded"""
+        analysis = feedback.sentiment_analysis
+        sentiment_code = SentimentCode.UNKNOWN
+        tone_code = 0
+        if analysis:
+            sentiment_code = SENTIMENT_CODES[SentimentCategory(analysis.sentiment_category)]
+            if analysis.emotional_tone:
+                tone_code = TONE_CODES[EmotionalTone(analysis.emotional_tone)]
+
+        return FeedbackFact(
+            feedback_id=feedback.id,
+            week_key=feedback.week_key if feedback.week_key is not None else week_key(feedback.week_start_date),
+            batch_id=self._dimension_id(AnalyticsBatch, feedback.training_batch),
+            location_id=self._dimension_id(AnalyticsLocation, feedback.location),
+            sentiment_code=int(sentiment_code),
+            tone_code=tone_code,
+            stage_code=STAGE_CODES[TraineeStage(feedback.trainee_stage)] if feedback.trainee_stage else 0,
+            category_mask=category_mask(mapping.category for mapping in feedback.category_mappings),
+            keyword_flags=keyword_flags(feedback.open_text),
+            rating_score=feedback.rating_score
+        )
+
+    def _ensure_partitions(self, keys) -> None:
+        bind = self.db.get_bind()
+        periods = missing_partitions(bind, keys)
+        if not periods:
+            return
+        if self.db.in_transaction():
+            # A separate transaction would wait on this one's locks
+            create_partitions(self.db.connection(), periods)
+            self.new_partitions.update(periods)
+        else:
+            with bind.begin() as connection:
+                create_partitions(connection, periods)
+            mark_partitions_created(bind, periods)
+
+    def _dimension_id(self, model, name: str) -> int:
+        """Get (creating on first use) the integer id for a batch or location name"""
+        cache_key = (model.__tablename__, name)
+        if cache_key not in self._dimension_ids:
+            row = self.db.query(model).filter(model.name == name).first()
+            if row is None:
+                row = model(name=name)
+                self.db.add(row)
+                self.db.flush()
+            self._dimension_ids[cache_key] = row.id
+        return self._dimension_ids[cache_key]
+
+    def backfill_facts(self, batch_size: int = 1000) -> int:
+        """Write facts for feedback ingested before the fact table existed"""
+        written = 0
+        while True:
+            missing: List[Feedback] = self.db.query(Feedback).outerjoin(
+                FeedbackFact, FeedbackFact.feedback_id == Feedback.id
+            ).filter(
+                FeedbackFact.feedback_id.is_(None)
+            ).order_by(Feedback.id).limit(batch_size).all()
+            if not missing:
+                break
+            for feedback in missing:
+                self.add_fact(feedback)
+            self.commit()
+            written += len(missing)
+        if written:
+            logger.info(f"Backfilled {written} feedback facts")
+        return written
@@ -0,0 +1,216 @@
+"""
+Full-text search over feedback texts
+
+SQLite: `feedback_fts`, an external-content FTS5 table over
+feedback.open_text (porter stemming), kept in sync by triggers on
+`feedback`: every ingest, and every archive delete, updates it in the same
+transaction. Matches are ranked by bm25.
+
+PostgreSQL: `feedback.open_text_tsv`, a stored generated tsvector column
+with a GIN index, maintained by the database on insert. Matches are
+ranked by ts_rank_cd.
+
+Queries use web-search syntax on both: words are ANDed, `or` separates
+alternatives, "quoted phrases" match as phrases and -word excludes. A page
+is found from ids and scores alone; snippets are highlighted for the rows
+of the page only. Archived weeks are not searched (their feedback left the
+hot tables).
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import re
+from sqlalchemy import Float, cast, column, func, inspect, literal_column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.models.feedback import Feedback, SentimentAnalysis, SentimentCategory
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.utils.pagination import after
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "feedback_fts"
+TSVECTOR_COLUMN = "open_text_tsv"
+TS_CONFIG = "english"
+HIGHLIGHT_START, HIGHLIGHT_END = "<mark>", "</mark>"
+SNIPPET_WORDS = 24
+SEARCH_SORTS = ("relevance", "recent")
+
+_TERM = re.compile(r'(-?)"([^"]*)"?|(\S+)')
+
+
+def search_supported(engine: Engine) -> bool:
+    """Whether the database can hold the text index (PostgreSQL, or SQLite built with FTS5)"""
+    if engine.dialect.name == "postgresql":
+        return True
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            return bool(connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+    return False
+
+
+def create_search_index(engine: Engine) -> bool:
+    """Create the text index (and index existing feedback) if missing; returns whether it was created"""
+    feedback_table = Feedback.__tablename__
+    if engine.dialect.name == "postgresql":
+        if TSVECTOR_COLUMN in {item["name"] for item in inspect(engine).get_columns(feedback_table)}:
+            return False
+        with engine.begin() as connection:
+            # Added to the partitioned parent, the column and index cascade to every partition
+            connection.execute(text(
+                f"ALTER TABLE {feedback_table} ADD COLUMN {TSVECTOR_COLUMN} tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', coalesce(open_text, ''))) STORED"
+            ))
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{feedback_table}_{TSVECTOR_COLUMN} "
+                f"ON {feedback_table} USING gin ({TSVECTOR_COLUMN})"
+            ))
+        return True
+
+    if not search_supported(engine) or inspect(engine).has_table(SEARCH_TABLE):
+        return False
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            f"open_text, content='{feedback_table}', content_rowid='id', tokenize='porter unicode61')"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER {SEARCH_TABLE}_insert AFTER INSERT ON {feedback_table} BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}(rowid, open_text) VALUES (new.id, new.open_text); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER {SEARCH_TABLE}_delete AFTER DELETE ON {feedback_table} BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, open_text) VALUES ('delete', old.id, old.open_text); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER {SEARCH_TABLE}_update AFTER UPDATE OF open_text ON {feedback_table} BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, open_text) VALUES ('delete', old.id, old.open_text); "
+            f"INSERT INTO {SEARCH_TABLE}(rowid, open_text) VALUES (new.id, new.open_text); END"
+        ))
+        connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+def fts5_query(query: str) -> Optional[str]:
+    """FTS5 MATCH expression of a web-search style query (None when it has no searchable term)"""
+    groups = [([], [])]  # (terms, excluded terms) per `or` alternative
+    for match in _TERM.finditer(query):
+        negate, phrase, word = match.groups()
+        if word is not None:
+            if word.lower() == "or":
+                groups.append(([], []))
+                continue
+            negate, phrase = word.startswith("-"), word.lstrip("-")
+        phrase = phrase.strip()
+        if phrase:
+            groups[-1][1 if negate else 0].append('"' + phrase.replace('"', '""') + '"')
+
+    alternatives = [
+        "(" + " ".join(terms) + ")" + "".join(f" NOT {term}" for term in excluded)
+        for terms, excluded in groups if terms
+    ]
+    return " OR ".join(f"({alternative})" for alternative in alternatives) or None
+
+
+class _Match:
+    """Dialect-specific match condition, score and snippet of a search query"""
+
+    def __init__(self, db: Session, query: str):
+        self.postgresql = db.get_bind().dialect.name == "postgresql"
+        self.expression = fts5_query(query)
+        if self.postgresql:
+            self.tsquery = func.websearch_to_tsquery(TS_CONFIG, query)
+            tsvector = literal_column(f"{Feedback.__tablename__}.{TSVECTOR_COLUMN}")
+            self.condition = tsvector.op("@@")(self.tsquery)
+            self.score = cast(func.ts_rank_cd(tsvector, self.tsquery), Float)
+            self.source = None
+            self.id = Feedback.id
+        else:
+            self.source = table(SEARCH_TABLE, column("rowid"))
+            fts = literal_column(SEARCH_TABLE)
+            self.condition = fts.op("MATCH")(self.expression)
+            self.score = cast(-func.bm25(fts), Float)  # bm25 is lower for better matches
+            # Ordered and bounded by its own rowid, FTS5 walks matches newest first without sorting them
+            self.id = self.source.c.rowid
+
+    @property
+    def empty(self) -> bool:
+        """No term to look for (only excluded words): nothing matches, on either database"""
+        return self.expression is None
+
+    def select_from(self, query, join_feedback: bool = True):
+        """`query` restricted to the matches (joined to feedback unless only ids and scores are needed)"""
+        if self.source is None:
+            return query.where(self.condition)
+        query = query.select_from(self.source)
+        if join_feedback:
+            query = query.join(Feedback, Feedback.id == self.source.c.rowid)
+        return query.where(self.condition)
+
+    def snippet(self):
+        if self.postgresql:
+            return func.ts_headline(
+                TS_CONFIG, Feedback.open_text, self.tsquery,
+                f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, "
+                f"MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 3}, MaxFragments=2, FragmentDelimiter=\" … \""
+            )
+        return func.snippet(literal_column(SEARCH_TABLE), 0, HIGHLIGHT_START, HIGHLIGHT_END, "…", SNIPPET_WORDS)
+
+
+def search_feedback(
+    db: Session,
+    query: str,
+    scope: AnalyticsScope = ALL_FEEDBACK,
+    week_from: Optional[int] = None,
+    week_to: Optional[int] = None,
+    sentiment: Optional[SentimentCategory] = None,
+    sort: str = "relevance",
+    cursor: Optional[Sequence[Any]] = None,
+    limit: int = 20
+) -> List[Dict]:
+    """
+    Up to `limit + 1` feedback matching `query` and the filters, best match (or newest) first
+
+    Rows are dicts with id, trainee_id, location, training_batch,
+    week_start_date, rating_score, sentiment_category, score and snippet.
+    `cursor` is the sort key of the last row of the previous page: (score,
+    id) for "relevance", (id,) for "recent".
+    """
+    match = _Match(db, query)
+    if match.empty or scope.is_empty:
+        return []
+
+    criteria = scope.feedback_criteria()
+    if week_from is not None:
+        criteria.append(Feedback.week_key >= week_from)
+    if week_to is not None:
+        criteria.append(Feedback.week_key <= week_to)
+    sort_columns = [match.score, match.id] if sort == "relevance" else [match.id]
+    page = match.select_from(
+        select(match.id, match.score.label("score")), join_feedback=bool(criteria) or sentiment is not None
+    ).where(*criteria)
+    if sentiment is not None:
+        page = page.join(SentimentAnalysis, SentimentAnalysis.feedback_id == Feedback.id).where(
+            SentimentAnalysis.sentiment_category == sentiment
+        )
+    if cursor is not None:
+        page = page.where(after(sort_columns, cursor, descending=True))
+    scores = dict(db.execute(page.order_by(*(item.desc() for item in sort_columns)).limit(limit + 1)).all())
+    if not scores:
+        return []
+
+    # Snippets and details for the page's rows only
+    details = match.select_from(select(
+        Feedback.id,
+        Feedback.trainee_id,
+        Feedback.location,
+        Feedback.training_batch,
+        Feedback.week_start_date,
+        Feedback.rating_score,
+        SentimentAnalysis.sentiment_category,
+        match.snippet().label("snippet"),
+    )).outerjoin(
+        SentimentAnalysis, SentimentAnalysis.feedback_id == Feedback.id
+    ).where(match.id.in_(list(scores)))
+    rows = {row.id: row._mapping for row in db.execute(details)}
+    return [{**rows[feedback_id], "score": score} for feedback_id, score in scores.items() if feedback_id in rows]
+
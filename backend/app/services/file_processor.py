@@ -6,6 +6,7 @@ import os
 from typing import List, Dict, Optional
 from datetime import datetime
 from fastapi import UploadFile
+from app.core.executors import run_blocking
 import logging
 
 logger = logging.getLogger(__name__)
@@ -44,23 +45,29 @@ class FileProcessor:
                 "total_rows": int
             }
         """
+        content = await file.read()
+        
+        # Parsing and validation are CPU-bound: keep them off the event loop
+        return await run_blocking("ingest", self.process_content, file.filename, content)
+    
+    def process_content(self, filename: str, content: bytes) -> Dict:
+        """Process the raw contents of an uploaded file (same result as `process_file`)"""
         try:
             # Save file temporarily
-            file_path = os.path.join(self.upload_dir, file.filename)
+            file_path = os.path.join(self.upload_dir, filename)
             with open(file_path, "wb") as f:
-                content = await file.read()
                 f.write(content)
             
             # Determine file type and read
-            if file.filename.endswith('.csv'):
+            if filename.endswith('.csv'):
                 df = pd.read_csv(file_path)
-            elif file.filename.endswith(('.xlsx', '.xls')):
+            elif filename.endswith(('.xlsx', '.xls')):
                 df = pd.read_excel(file_path)
             else:
                 return {
                     "success": False,
                     "data": [],
-                    "errors": [f"Unsupported file type: {file.filename}"],
+                    "errors": [f"Unsupported file type: {filename}"],
                     "total_rows": 0
                 }
             
@@ -1,7 +1,7 @@
 """
 Engagement Heat Index Calculator
 """
-from typing import List
+from typing import List, Optional
 from app.models.feedback import Feedback, SentimentAnalysis, SentimentCategory
 import logging
 
@@ -23,22 +23,43 @@ class HeatIndexCalculator:
         - Average rating score (30%)
         - Participation volume (20%)
         - Engagement keywords (10%)
+
+        Scans the feedback texts; reports and dashboards apply `score` to the
+        components stored at ingest instead (see app/services/feedback_cube.py).
         """
         if not feedback_list:
             return 0.0
         
         total_count = len(feedback_list)
         
-        # 1. Sentiment Score (40%)
         positive_count = sum(1 for f in feedback_list 
                            if f.sentiment_analysis and 
                            f.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE)
+        
+        ratings = [f.rating_score for f in feedback_list if f.rating_score is not None]
+        avg_rating = sum(ratings) / len(ratings) if ratings else None
+        
+        # Count once per feedback
+        engagement_mentions = sum(
+            1 for f in feedback_list
+            if any(keyword in f.open_text.lower() for keyword in self.ENGAGEMENT_KEYWORDS)
+        )
+        
+        return self.score(total_count, positive_count, avg_rating, engagement_mentions)
+    
+    @staticmethod
+    def score(
+        total_count: int,
+        positive_count: int,
+        avg_rating: Optional[float],
+        engagement_mentions: int
+    ) -> float:
+        """Combine pre-aggregated week counts into the heat index"""
+        # 1. Sentiment Score (40%)
         sentiment_score = (positive_count / total_count) * 40 if total_count > 0 else 0
         
         # 2. Rating Score (30%)
-        ratings = [f.rating_score for f in feedback_list if f.rating_score is not None]
-        if ratings:
-            avg_rating = sum(ratings) / len(ratings)
+        if avg_rating is not None:
             rating_score = (avg_rating / 5.0) * 30
         else:
             rating_score = 15  # Default to middle if no ratings
@@ -48,21 +69,9 @@ class HeatIndexCalculator:
         volume_score = min((total_count / 50.0) * 20, 20) if total_count > 0 else 0
         
         # 4. Engagement Keywords Score (10%)
-        engagement_mentions = 0
-        for feedback in feedback_list:
-            text_lower = feedback.open_text.lower()
-            for keyword in self.ENGAGEMENT_KEYWORDS:
-                if keyword in text_lower:
-                    engagement_mentions += 1
-                    break  # Count once per feedback
-        
         keyword_score = min((engagement_mentions / total_count) * 10, 10) if total_count > 0 else 0
         
         # Total heat index
         heat_index = sentiment_score + rating_score + volume_score + keyword_score
         
         return min(max(heat_index, 0.0), 100.0)  # Clamp between 0-100
-
-
-
-
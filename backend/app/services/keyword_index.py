@@ -0,0 +1,168 @@
+"""
+Keyword frequency index
+
+`keyword_counts` holds how many feedback matched each category keyword,
+per week, batch, location, category and sentiment. The ingest pipeline
+updates it in the same transaction as the rows (`KeywordDelta`, applied
+with the feedback cube), so risk flags, action-item themes and keyword
+trends are top-k reads over a small table instead of walks over the
+category mappings of every feedback. `rebuild_keyword_counts` recomputes
+weeks from the stored mappings, archived weeks included (migration and
+`python -m app.services.keyword_index`).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.feedback import CategoryMapping, FeedbackCategory, SentimentCategory
+from app.models.analytics import FeedbackFact, KeywordCount, CATEGORY_CODES, SENTIMENT_CODES
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.services.feedback_archive import week_feedback
+from app.services.feedback_cube import CATEGORY_NAMES
+from app.utils.upserts import increment_rows
+from app.utils.weeks import week_key, week_keys_back
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_KEYS = ["week_key", "batch_id", "location_id", "category_code", "sentiment_code", "keyword"]
+KEYWORD_MEASURES = ["mention_count"]
+
+
+class KeywordDelta:
+    """Keyword count changes of the feedback written in one transaction"""
+
+    def __init__(self):
+        self.cells: Dict[tuple, List[int]] = {}
+
+    def add(self, fact: FeedbackFact, mappings: Iterable[CategoryMapping]) -> None:
+        """Count the keywords of a feedback's category mappings under its fact's dimensions"""
+        for mapping in mappings:
+            category_code = CATEGORY_CODES[FeedbackCategory(mapping.category)]
+            for keyword in mapping.keywords_matched or []:
+                cell = (
+                    fact.week_key, fact.batch_id, fact.location_id, category_code,
+                    int(fact.sentiment_code or 0), keyword
+                )
+                self.cells.setdefault(cell, [0])[0] += 1
+
+    def apply(self, db: Session) -> None:
+        """Add the changes to keyword_counts in the session's transaction (the caller commits)"""
+        increment_rows(db, KeywordCount, KEYWORD_KEYS, KEYWORD_MEASURES, self.cells)
+
+    def clear(self) -> None:
+        self.cells.clear()
+
+
+def rebuild_keyword_counts(db: Session, keys: Optional[Iterable[int]] = None) -> int:
+    """Recompute the keyword counts of the given weeks (all weeks with facts when None); returns weeks rebuilt"""
+    if keys is None:
+        keys = [key for (key,) in db.query(FeedbackFact.week_key).distinct()]
+    keys = sorted(set(keys))
+
+    for key in keys:
+        db.query(KeywordCount).filter(KeywordCount.week_key == key).delete(synchronize_session=False)
+        facts = {fact.feedback_id: fact for fact in db.query(FeedbackFact).filter(FeedbackFact.week_key == key)}
+        delta = KeywordDelta()
+        for feedback in week_feedback(db, key):
+            if feedback.id in facts:
+                delta.add(facts[feedback.id], feedback.category_mappings)
+        delta.apply(db)
+        db.commit()
+        db.expunge_all()
+    return len(keys)
+
+
+class KeywordIndex:
+    """Top-k keyword reads over keyword_counts for an AnalyticsScope"""
+
+    def __init__(self, db: Session, scope: AnalyticsScope = ALL_FEEDBACK):
+        self.db = db
+        self.scope = scope
+
+    def _query(
+        self,
+        keys: List[int],
+        *dimensions,
+        sentiment: Optional[SentimentCategory] = None,
+        category: Optional[FeedbackCategory] = None
+    ):
+        """(query of mention sums grouped by `dimensions`, the sum expression)"""
+        total = func.sum(KeywordCount.mention_count)
+        query = self.db.query(*dimensions, total).filter(KeywordCount.week_key.in_(keys))
+        if sentiment is not None:
+            query = query.filter(KeywordCount.sentiment_code == int(SENTIMENT_CODES[SentimentCategory(sentiment)]))
+        if category is not None:
+            query = query.filter(KeywordCount.category_code == CATEGORY_CODES[FeedbackCategory(category)])
+        query = self.scope.restrict(query, KeywordCount.batch_id, KeywordCount.location_id)
+        return query.group_by(*dimensions), total
+
+    def top(
+        self,
+        keys: List[int],
+        sentiment: Optional[SentimentCategory] = None,
+        category: Optional[FeedbackCategory] = None,
+        limit: Optional[int] = None,
+        min_count: Optional[int] = None
+    ) -> List[Tuple[str, int]]:
+        """(keyword, mentions) over the weeks `keys`, most mentioned first (ties by keyword)"""
+        if not keys or self.scope.is_empty:
+            return []
+        query, total = self._query(keys, KeywordCount.keyword, sentiment=sentiment, category=category)
+        if min_count is not None:
+            query = query.having(total >= min_count)
+        query = query.order_by(total.desc(), KeywordCount.keyword)
+        if limit is not None:
+            query = query.limit(limit)
+        return [(keyword, int(count)) for keyword, count in query]
+
+    def top_by_category(
+        self,
+        keys: List[int],
+        sentiment: Optional[SentimentCategory] = None,
+        limit: int = 5
+    ) -> Dict[str, List[Tuple[str, int]]]:
+        """The `limit` most mentioned (keyword, mentions) per category name over the weeks `keys`"""
+        if not keys or self.scope.is_empty:
+            return {}
+        query, total = self._query(keys, KeywordCount.category_code, KeywordCount.keyword, sentiment=sentiment)
+        themes = {}
+        for category_code, keyword, count in query.order_by(KeywordCount.category_code, total.desc(), KeywordCount.keyword):
+            keywords = themes.setdefault(CATEGORY_NAMES[category_code], [])
+            if len(keywords) < limit:
+                keywords.append((keyword, int(count)))
+        return themes
+
+    def trend(
+        self,
+        week_start: datetime,
+        weeks_back: int = 8,
+        sentiment: Optional[SentimentCategory] = None,
+        category: Optional[FeedbackCategory] = None,
+        limit: int = 10
+    ) -> List[Dict]:
+        """
+        The `limit` most mentioned keywords of `weeks_back` weeks ending with `week_start`
+
+        Returns (most mentioned first):
+            List of {"keyword": str, "total": int, "weeks": {week_key: mentions}}
+        """
+        keys = week_keys_back(week_key(week_start), weeks_back)
+        top = self.top(keys, sentiment, category, limit)
+        if not top:
+            return []
+        query, _ = self._query(keys, KeywordCount.keyword, KeywordCount.week_key, sentiment=sentiment, category=category)
+        weeks = {keyword: {} for keyword, _ in top}
+        for keyword, key, count in query.filter(KeywordCount.keyword.in_(list(weeks))):
+            weeks[keyword][key] = int(count)
+        return [{"keyword": keyword, "total": total, "weeks": weeks[keyword]} for keyword, total in top]
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt the keyword counts of {rebuild_keyword_counts(session)} weeks")
+    finally:
+        session.close()
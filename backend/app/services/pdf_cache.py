@@ -0,0 +1,142 @@
+"""
+Content-addressed cache of rendered report PDFs
+
+A report's PDF depends only on its stored fields and snapshot
+(app.services.report_snapshot), so `content_version` hashes exactly those
+(plus PDF_LAYOUT_VERSION). The rendering of report 12 at version v lives at
+UPLOAD_DIR/pdfs/report_12_<v>.pdf: repeat downloads are served straight
+from that file, and regenerating the report changes the version and so the
+file.
+
+Files are written under a temporary name and renamed into place, so a
+reader never sees a partial PDF. Hits refresh a file's modification time;
+after each render, older versions of the report and the least recently used
+files beyond PDF_CACHE_MAX_BYTES are deleted. Renders are queued and
+single-flight through app.services.pdf_jobs.
+"""
+from typing import List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.report import WeeklyReport
+from app.services.pdf_generator import PDFGenerator
+from app.services.report_snapshot import report_snapshot
+import logging
+
+logger = logging.getLogger(__name__)
+
+PDF_LAYOUT_VERSION = 1  # Bump when PDFGenerator's output changes for the same content
+
+# Report fields the PDF shows besides its snapshot
+PDF_FIELDS = [
+    "week_start_date", "week_end_date", "overall_sentiment_score", "sentiment_change", "heat_index",
+    "total_feedback_count", "positive_count", "neutral_count", "negative_count", "executive_summary",
+]
+
+
+def pdf_directory() -> Path:
+    return Path(settings.UPLOAD_DIR) / "pdfs"
+
+
+def content_version(report: WeeklyReport) -> str:
+    """Hash of everything the report's PDF renders (the report must have a snapshot)"""
+    snapshot = report_snapshot(report)
+    if snapshot is None:
+        raise ValueError(f"Report {report.id} has no snapshot")
+    content = [PDF_LAYOUT_VERSION, [getattr(report, field) for field in PDF_FIELDS], snapshot]
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+def pdf_filename(report: WeeklyReport) -> str:
+    """Download name of a report's PDF"""
+    return f"report_{report.id}_{report.week_start_date.strftime('%Y%m%d')}.pdf"
+
+
+def cached_pdf_path(report_id: int, version: str) -> Path:
+    return pdf_directory() / f"report_{report_id}_{version}.pdf"
+
+
+def cached_pdf(report_id: int, version: str) -> Optional[Path]:
+    """The cached PDF of a report version, if rendered (marked as just used)"""
+    path = cached_pdf_path(report_id, version)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def evict(keep: Path) -> int:
+    """Delete other versions of `keep`'s report, then the least recently used PDFs over the size bound"""
+    report_prefix = keep.name.rsplit("_", 1)[0] + "_"
+    files: List[Tuple[float, int, Path]] = []
+    removed = 0
+    for entry in os.scandir(keep.parent):
+        if not entry.name.endswith(".pdf") or entry.name == keep.name:
+            continue
+        try:
+            if entry.name.startswith(report_prefix):
+                os.remove(entry.path)
+                removed += 1
+                continue
+            stat = entry.stat()
+        except FileNotFoundError:  # Evicted by another worker meanwhile
+            continue
+        files.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+
+    total = sum(size for _, size, _ in files) + keep.stat().st_size
+    for _, size, path in sorted(files, key=lambda item: item[0]):
+        if total <= settings.PDF_CACHE_MAX_BYTES:
+            break
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
+
+
+def render_cached_pdf(db: Session, report_id: int) -> str:
+    """
+    Path of the report's current PDF, rendering it unless cached
+
+    Runs on the pdf executor: the version is read here, from the same
+    report row the PDF renders. Records the path as the report's pdf_path
+    (leaving updated_at unchanged).
+    """
+    report = db.get(WeeklyReport, report_id)
+    if report is None:
+        raise ValueError(f"Report {report_id} not found")
+    version = content_version(report)
+    path = cached_pdf(report_id, version)
+    if path is None:
+        path = _render(db, report, version)
+    if report.pdf_path != str(path):
+        # Cache bookkeeping, not a report change: updated_at (and so the report's validators) stays as is
+        db.query(WeeklyReport).filter(WeeklyReport.id == report_id).update(
+            {WeeklyReport.pdf_path: str(path), WeeklyReport.updated_at: WeeklyReport.updated_at},
+            synchronize_session=False
+        )
+        db.commit()
+    return str(path)
+
+
+def _render(db: Session, report: WeeklyReport, version: str) -> Path:
+    path = cached_pdf_path(report.id, version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        PDFGenerator(db).generate_pdf(report, str(temp_path))
+        os.replace(temp_path, path)  # Readers never see a half-written file
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    removed = evict(path)
+    if removed:
+        logger.info(f"PDF cache: evicted {removed} files after rendering report {report.id}")
+    return path
+
@@ -10,8 +10,8 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from datetime import datetime
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
-from app.models.feedback import Feedback, SentimentCategory
-from app.models.report import WeeklyReport, ActionItem
+from app.models.report import WeeklyReport
+from app.services.report_snapshot import report_snapshot
 import os
 import io
 import logging
@@ -24,6 +24,7 @@ class PDFGenerator:
     
     def __init__(self, db: Session):
         self.db = db
+        self.snapshot: Optional[Dict] = None  # Report snapshot being rendered
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
     
@@ -73,6 +74,11 @@ class PDFGenerator:
     def generate_pdf(self, report: WeeklyReport, output_path: str) -> str:
         """Generate complete PDF report"""
         try:
+            # Sections render from the stored snapshot alone (see ensure_report_snapshot)
+            self.snapshot = report_snapshot(report)
+            if self.snapshot is None:
+                raise ValueError(f"Report {report.id} has no snapshot")
+            
             # Create PDF document
             doc = SimpleDocTemplate(
                 output_path,
@@ -159,9 +165,10 @@ class PDFGenerator:
         elements.append(metrics_table)
         elements.append(Spacer(1, 0.5*inch))
         
-        # Generated date
+        # Generated date (of the snapshot, so the same content always renders the same PDF)
+        generated_at = datetime.fromisoformat(self.snapshot['generated_at'])
         generated_date = Paragraph(
-            f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}",
+            f"Generated on: {generated_at.strftime('%B %d, %Y at %I:%M %p')} UTC",
             self.styles['Normal']
         )
         elements.append(generated_date)
@@ -240,33 +247,15 @@ class PDFGenerator:
         elements.append(title)
         elements.append(Spacer(1, 0.2*inch))
         
-        # Get feedback for the week
-        feedback_list = self.db.query(Feedback).filter(
-            Feedback.week_start_date >= report.week_start_date,
-            Feedback.week_start_date <= report.week_end_date
-        ).all()
-        
-        # Group by category
-        category_data = {}
-        for feedback in feedback_list:
-            for mapping in feedback.category_mappings:
-                category = mapping.category.value.replace('_', ' ').title()
-                if category not in category_data:
-                    category_data[category] = {
-                        'positive': 0,
-                        'neutral': 0,
-                        'negative': 0,
-                        'total': 0
-                    }
-                
-                if feedback.sentiment_analysis:
-                    sentiment = feedback.sentiment_analysis.sentiment_category.value
-                    category_data[category][sentiment] += 1
-                    category_data[category]['total'] += 1
+        # Sentiment counts per category, most mentioned first
+        category_data = sorted(
+            self.snapshot['category_breakdown'].items(), key=lambda item: item[1]['total'], reverse=True
+        )
         
         # Create table for each category
-        for category, data in category_data.items():
+        for category, data in category_data:
             if data['total'] > 0:
+                category = category.replace('_', ' ').title()
                 cat_title = Paragraph(f"<b>{category}</b>", self.styles['CustomSubheading'])
                 elements.append(cat_title)
                 
@@ -301,10 +290,8 @@ class PDFGenerator:
         elements.append(title)
         elements.append(Spacer(1, 0.2*inch))
         
-        # Get action items
-        action_items = self.db.query(ActionItem).filter(
-            ActionItem.report_id == report.id
-        ).order_by(ActionItem.priority.desc()).all()
+        # Action items of the snapshot (the report's latest generation)
+        action_items = self.snapshot['action_items']
         
         if not action_items:
             no_items = Paragraph("No action items generated for this week.", self.styles['Normal'])
@@ -314,7 +301,7 @@ class PDFGenerator:
         # Group by priority
         priority_order = ['urgent', 'high', 'medium', 'low']
         for priority in priority_order:
-            priority_items = [item for item in action_items if item.priority.value == priority]
+            priority_items = [item for item in action_items if item['priority'] == priority]
             if priority_items:
                 priority_title = Paragraph(
                     f"<b>{priority.upper()} Priority</b>",
@@ -324,14 +311,14 @@ class PDFGenerator:
                 
                 for item in priority_items:
                     item_text = f"""
-                    <b>{item.title}</b><br/>
-                    Category: {item.category or 'General'}<br/>
-                    {item.description}
+                    <b>{item['title']}</b><br/>
+                    Category: {item.get('category') or 'General'}<br/>
+                    {item['description']}
                     """
-                    if item.assigned_to:
-                        item_text += f"<br/>Assigned to: {item.assigned_to}"
-                    if item.confidence_score:
-                        item_text += f"<br/>Confidence: {item.confidence_score*100:.0f}%"
+                    if item.get('assigned_to'):
+                        item_text += f"<br/>Assigned to: {item['assigned_to']}"
+                    if item.get('confidence_score'):
+                        item_text += f"<br/>Confidence: {item['confidence_score']*100:.0f}%"
                     
                     item_para = Paragraph(item_text, self.styles['Normal'])
                     elements.append(item_para)
@@ -378,87 +365,17 @@ class PDFGenerator:
     
     def _get_strengths_and_concerns_with_quotes(self, report: WeeklyReport) -> Dict:
         """Get top strengths and concerns with supporting quotes"""
-        feedback_list = self.db.query(Feedback).filter(
-            Feedback.week_start_date >= report.week_start_date,
-            Feedback.week_start_date <= report.week_end_date
-        ).all()
-        
-        # Analyze positive feedback for strengths
-        positive_feedback = [f for f in feedback_list 
-                           if f.sentiment_analysis and 
-                           f.sentiment_analysis.sentiment_category == SentimentCategory.POSITIVE]
-        
-        # Analyze negative feedback for concerns
-        negative_feedback = [f for f in feedback_list 
-                           if f.sentiment_analysis and 
-                           f.sentiment_analysis.sentiment_category == SentimentCategory.NEGATIVE]
-        
-        # Count category mentions in positive feedback
-        strength_categories = {}
-        for feedback in positive_feedback:
-            for mapping in feedback.category_mappings:
-                category = mapping.category.value.replace('_', ' ').title()
-                if category not in strength_categories:
-                    strength_categories[category] = {
-                        'count': 0,
-                        'quotes': []
-                    }
-                strength_categories[category]['count'] += 1
-                if len(strength_categories[category]['quotes']) < 2:
-                    # Extract a meaningful quote (first 150 chars)
-                    quote = feedback.open_text[:150] + "..." if len(feedback.open_text) > 150 else feedback.open_text
-                    strength_categories[category]['quotes'].append(quote)
-        
-        # Count category mentions in negative feedback
-        concern_categories = {}
-        for feedback in negative_feedback:
-            for mapping in feedback.category_mappings:
-                category = mapping.category.value.replace('_', ' ').title()
-                if category not in concern_categories:
-                    concern_categories[category] = {
-                        'count': 0,
-                        'quotes': []
-                    }
-                concern_categories[category]['count'] += 1
-                if len(concern_categories[category]['quotes']) < 2:
-                    quote = feedback.open_text[:150] + "..." if len(feedback.open_text) > 150 else feedback.open_text
-                    concern_categories[category]['quotes'].append(quote)
-        
-        # Get top 3 strengths
-        top_strengths = sorted(
-            strength_categories.items(),
-            key=lambda x: x[1]['count'],
-            reverse=True
-        )[:3]
-        strengths_list = [
-            {
-                'category': cat,
-                'description': f"{cat} received {data['count']} positive mentions",
-                'quote': data['quotes'][0] if data['quotes'] else None
-            }
-            for cat, data in top_strengths
-        ]
-        
-        # Get top 3 concerns
-        top_concerns = sorted(
-            concern_categories.items(),
-            key=lambda x: x[1]['count'],
-            reverse=True
-        )[:3]
-        concerns_list = [
-            {
-                'category': cat,
-                'description': f"{cat} received {data['count']} negative mentions",
-                'quote': data['quotes'][0] if data['quotes'] else None
-            }
-            for cat, data in top_concerns
-        ]
+        def with_quote(items: List[Dict]) -> List[Dict]:
+            return [
+                {
+                    'category': item['category'],
+                    'description': item['description'],
+                    'quote': item['quotes'][0] if item['quotes'] else None
+                }
+                for item in items
+            ]
         
         return {
-            'strengths': strengths_list,
-            'concerns': concerns_list
+            'strengths': with_quote(self.snapshot['strengths']),
+            'concerns': with_quote(self.snapshot['concerns'])
         }
-
-
-
-
@@ -0,0 +1,164 @@
+"""
+Background rendering of report PDFs
+
+`render_queue.submit(report)` queues the render of a report's current
+content and returns a RenderJob at once; the render runs on the pdf
+executor (app.core.executors), whose pool bounds how many PDFs render at a
+time. Jobs waiting for a worker are queued in submission order; at most
+PDF_QUEUE_SIZE jobs are queued or rendering, beyond that `submit` raises
+RenderQueueFull.
+
+A job's id is `<report id>-<content version>` (app.services.pdf_cache),
+so submitting a report whose content is already queued or rendering
+returns the same job: renders are single-flight. Already cached content
+gives a job that is ready from the start. Finished jobs are kept for
+status queries (the last PDF_JOBS_KEPT); the id of an evicted job still
+resolves while its PDF is cached.
+"""
+from typing import Dict, Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+import asyncio
+import re
+from app.core.config import settings
+from app.core.executors import run_with_session
+from app.models.report import WeeklyReport
+from app.services.pdf_cache import cached_pdf, content_version, render_cached_pdf
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RENDERING, READY, FAILED = "queued", "rendering", "ready", "failed"
+
+_JOB_ID = re.compile(r"^(\d+)-([0-9a-f]+)$")
+
+
+class RenderQueueFull(Exception):
+    """Too many PDF renders are queued or running"""
+
+
+class RenderJob:
+    """The render of one report version"""
+
+    def __init__(self, report_id: int, version: str):
+        self.id = f"{report_id}-{version}"
+        self.report_id = report_id
+        self.version = version
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.path: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (READY, FAILED)
+
+    def started(self) -> None:
+        self.status = RENDERING
+        self.started_at = datetime.now(timezone.utc)
+
+    def finished(self, path: Optional[str] = None, error: Optional[str] = None) -> None:
+        self.status = FAILED if error else READY
+        self.path, self.error = path, error
+        self.finished_at = datetime.now(timezone.utc)
+
+
+class RenderQueue:
+    """Render jobs of this process, by id"""
+
+    def __init__(self, max_pending: int, max_kept: int):
+        self.max_pending = max_pending
+        self.max_kept = max_kept
+        self.jobs: "OrderedDict[str, RenderJob]" = OrderedDict()
+
+    def _pending(self):
+        return [job for job in self.jobs.values() if not job.done]
+
+    def submit(self, report: WeeklyReport) -> RenderJob:
+        """Queue the render of the report's current content (the report must have a snapshot)"""
+        job = RenderJob(report.id, content_version(report))
+        existing = self.jobs.get(job.id)
+        if existing is not None and not existing.done and existing.task.get_loop() is asyncio.get_running_loop():
+            return existing
+        # Finished jobs are looked up again: a failed render is retried, an evicted PDF rendered again
+        self.jobs.pop(job.id, None)
+
+        path = cached_pdf(report.id, job.version)
+        if path is not None:
+            job.finished(path=str(path))
+        elif len(self._pending()) >= self.max_pending:
+            raise RenderQueueFull(f"{self.max_pending} PDF renders are already queued")
+        else:
+            job.task = asyncio.ensure_future(self._render(job))
+        self.jobs[job.id] = job
+        self._trim()
+        return job
+
+    async def _render(self, job: RenderJob) -> None:
+        try:
+            path = await run_with_session("pdf", render_cached_pdf, job.report_id, started=job.started)
+        except Exception as e:
+            logger.error(f"Rendering the PDF of report {job.report_id} failed: {e}")
+            job.finished(error=str(e))
+        else:
+            job.finished(path=path)
+
+    def _trim(self) -> None:
+        """Forget the oldest finished jobs beyond max_kept"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(len(finished) - self.max_kept, 0)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        """A job by id, including finished jobs no longer kept whose PDF is still cached"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        match = _JOB_ID.match(job_id)
+        if match is None:
+            return None
+        path = cached_pdf(int(match.group(1)), match.group(2))
+        if path is None:
+            return None
+        job = RenderJob(int(match.group(1)), match.group(2))
+        job.finished(path=str(path))
+        return job
+
+    def position(self, job: RenderJob) -> int:
+        """Queued jobs ahead of `job` (0 once it renders)"""
+        if job.status != QUEUED:
+            return 0
+        queued = [other for other in self.jobs.values() if other.status == QUEUED]
+        return queued.index(job) if job in queued else 0
+
+    async def wait(self, job: RenderJob) -> RenderJob:
+        """Wait for a job to finish (a caller that goes away does not cancel the render)"""
+        if not job.done:
+            await asyncio.shield(job.task)
+        return job
+
+    def describe(self, job: RenderJob) -> Dict:
+        """Status payload of a job"""
+        return {
+            "job_id": job.id,
+            "report_id": job.report_id,
+            "status": job.status,
+            "position": self.position(job),
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "queued": sum(job.status == QUEUED for job in self.jobs.values()),
+            "rendering": sum(job.status == RENDERING for job in self.jobs.values()),
+            "kept": len(self.jobs),
+        }
+
+
+render_queue = RenderQueue(settings.PDF_QUEUE_SIZE, settings.PDF_JOBS_KEPT)
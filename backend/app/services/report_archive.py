@@ -0,0 +1,111 @@
+"""
+Streamed ZIP archive of weekly reports
+
+`stream_report_archive` renders the PDFs of a range of reports through the
+render queue (app.services.pdf_jobs): they render in parallel on the pdf
+executor's worker processes, cached PDFs are reused, and each PDF is added
+to the archive as soon as it is ready (completion order, not week order).
+Every week also gets its report as JSON (fields and snapshot), and
+manifest.json, written last, lists each week's files or render error.
+
+Memory stays bounded whatever the range: only RENDERS_IN_FLIGHT renders
+are submitted at a time, and PDFs are copied into the archive in
+CHUNK_BYTES pieces, each handed to the response before the next is read.
+PDFs are stored as they are (they are compressed already); the JSON
+documents are deflated in a worker thread, off the event loop.
+"""
+from typing import AsyncIterator, Dict, List, Optional
+from collections import deque
+import asyncio
+import json
+import time
+import zipfile
+from app.core.config import settings
+from app.services.feedback_export import StreamSink
+from app.services.pdf_jobs import READY, RenderJob, RenderQueueFull, render_queue
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1024 * 1024
+RENDERS_IN_FLIGHT = 2 * settings.EXECUTOR_PDF_WORKERS  # Keeps every worker busy while finished PDFs are copied
+QUEUE_RETRY_SECONDS = 1.0  # Wait before submitting again when the render queue is full
+
+
+class ArchiveEntry:
+    """One report of the archive: the report to render and its JSON document"""
+
+    def __init__(self, report, document: Dict):
+        self.report = report
+        self.week_key = report.week_key
+        self.document = document
+
+
+async def _copy_pdf(archive: zipfile.ZipFile, sink: StreamSink, name: str, path: str) -> AsyncIterator[bytes]:
+    """Add a PDF to the archive chunk by chunk (stored, not deflated), yielding what each chunk added"""
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    with open(path, "rb") as pdf, archive.open(info, "w") as member:
+        while True:
+            chunk = await asyncio.to_thread(pdf.read, CHUNK_BYTES)
+            if not chunk:
+                break
+            await asyncio.to_thread(member.write, chunk)
+            yield sink.drain()
+
+
+async def stream_report_archive(entries: List[ArchiveEntry]) -> AsyncIterator[bytes]:
+    """ZIP archive of the entries' PDFs and JSON documents, streamed as each PDF finishes"""
+    sink = StreamSink()
+    pending = deque(entries)
+    running: Dict[asyncio.Future, ArchiveEntry] = {}
+    manifest = []
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            while pending or running:
+                while pending and len(running) < RENDERS_IN_FLIGHT:
+                    try:
+                        job = render_queue.submit(pending[0].report)
+                    except RenderQueueFull:
+                        if running:
+                            break  # Retried once one of ours finishes
+                        await asyncio.sleep(QUEUE_RETRY_SECONDS)
+                        continue
+                    running[asyncio.ensure_future(render_queue.wait(job))] = pending.popleft()
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    entry = running.pop(future)
+                    job: RenderJob = future.result()
+                    pdf_name: Optional[str] = f"week_{entry.week_key}.pdf"
+                    error = job.error
+                    if job.status == READY:
+                        try:
+                            async for data in _copy_pdf(archive, sink, pdf_name, job.path):
+                                yield data
+                        except FileNotFoundError:  # Evicted from the PDF cache meanwhile
+                            error = "PDF was evicted from the cache before it was archived"
+                    if error:
+                        logger.error(f"Archive: no PDF for week {entry.week_key}: {error}")
+                        pdf_name = None
+
+                    json_name = f"week_{entry.week_key}.json"
+                    await asyncio.to_thread(
+                        archive.writestr, json_name, json.dumps(entry.document, indent=2, default=str)
+                    )
+                    manifest.append({
+                        "week_key": entry.week_key,
+                        "report_id": entry.report.id,
+                        "pdf": pdf_name,
+                        "json": json_name,
+                        "error": error,
+                    })
+                    yield sink.drain()
+
+            manifest.sort(key=lambda item: item["week_key"])
+            await asyncio.to_thread(archive.writestr, "manifest.json", json.dumps({"reports": manifest}, indent=2))
+        yield sink.drain()
+    finally:
+        # The client went away: stop waiting (renders already running finish into the cache)
+        for future in running:
+            future.cancel()
@@ -0,0 +1,137 @@
+"""
+Weekly report snapshots
+
+`generate_weekly_report` computes every section of a week's report once
+and stores it as a JSON snapshot in WeeklyReport.report_data: overview
+counts, category breakdown, strengths and concerns with their quotes,
+action items, risk flags and the rest of the insights payload. The report
+endpoint, the PDF and unscoped insights render from the snapshot instead of
+recomputing it.
+
+A snapshot records the data version (app.services.data_versions) of each
+week it read. Once an ingest bumps one of them, the snapshot is stale: it
+is still served, flagged as such, until the report is generated again.
+Snapshots written with another SNAPSHOT_VERSION are treated as missing.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from app.models.report import WeeklyReport
+from app.ml.insight_generator import InsightGenerator
+from app.services.analytics_backend import get_metrics_backend
+from app.services.data_versions import get_week_versions
+from app.utils.weeks import week_key, week_keys_back
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1  # Bump when the snapshot layout changes
+SNAPSHOT_WEEKS = 4  # Weeks a snapshot reads, newest first (praise momentum looks back 4)
+
+# Sections of the insights payload (app.api.v1.endpoints.analysis.build_insights)
+INSIGHT_SECTIONS = [
+    "action_items", "risk_flags", "assessment_stress", "executive_summary",
+    "appreciation_tracker", "unresolved_loops", "praise_momentum",
+]
+
+
+def snapshot_weeks(key: int) -> List[int]:
+    """Week keys a report snapshot of week `key` depends on"""
+    return week_keys_back(key, SNAPSHOT_WEEKS)
+
+
+def build_report_snapshot(db: Session, week_start: datetime) -> Dict:
+    """Compute every section of the report of a week (for all feedback)"""
+    key = week_key(week_start)
+    # Versions are read first: an ingest racing the computation leaves the snapshot stale, never wrongly current
+    versions = get_week_versions(db, snapshot_weeks(key))
+
+    week_end = week_start + timedelta(days=6)
+    previous_week_start = week_start - timedelta(days=7)
+
+    analytics = get_metrics_backend(db)
+    current_week, previous_week = analytics.series(week_start, 2)
+
+    total = current_week["volume"]
+    positive = current_week["positive"]
+    overall_sentiment = (positive / total * 100) if total > 0 else 0
+
+    prev_total = previous_week["volume"]
+    prev_sentiment = (previous_week["positive"] / prev_total * 100) if prev_total > 0 else 0
+    sentiment_change = overall_sentiment - prev_sentiment if prev_total > 0 else None
+
+    generator = InsightGenerator(db)
+    strengths_concerns = generator.generate_top_strengths_and_concerns(week_start, week_end)
+    executive_summary = generator.generate_executive_summary(
+        week_start, week_end, overall_sentiment, sentiment_change,
+        strengths_concerns["strengths"], strengths_concerns["concerns"]
+    )
+
+    return {
+        "snapshot_version": SNAPSHOT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "week_key": key,
+        "data_versions": {str(week): version for week, (version, _) in versions.items()},
+        "overview": {
+            "total_feedback_count": total,
+            "positive_count": positive,
+            "neutral_count": current_week["neutral"],
+            "negative_count": current_week["negative"],
+            "overall_sentiment_score": overall_sentiment,
+            "sentiment_change": sentiment_change,
+            "heat_index": analytics.heat_index(week_start),
+        },
+        "category_breakdown": {
+            category: dict(counts) for category, counts in current_week["categories"].items()
+        },
+        "strengths": strengths_concerns["strengths"],
+        "concerns": strengths_concerns["concerns"],
+        "executive_summary": executive_summary,
+        "action_items": generator.generate_action_items(week_start, week_end, previous_week_start),
+        "risk_flags": generator.generate_risk_flags(week_start, week_end),
+        "assessment_stress": generator.detect_assessment_stress(week_start, week_end),
+        "appreciation_tracker": generator.generate_appreciation_tracker(week_start, week_end),
+        "unresolved_loops": generator.detect_unresolved_feedback_loops(week_start, week_end),
+        "praise_momentum": generator.track_praise_momentum(week_start, week_end),
+    }
+
+
+def report_snapshot(report: WeeklyReport) -> Optional[Dict]:
+    """The report's stored snapshot, or None if it has none in the current layout"""
+    data = report.report_data
+    if isinstance(data, dict) and data.get("snapshot_version") == SNAPSHOT_VERSION:
+        return data
+    return None
+
+
+def stale_reports(db: Session, reports: Iterable[WeeklyReport]) -> Set[int]:
+    """Ids of the reports whose snapshot is missing or older than their weeks' data"""
+    reports = list(reports)
+    snapshots = {report.id: report_snapshot(report) for report in reports}
+    versions = get_week_versions(db, {
+        int(week) for snapshot in snapshots.values() if snapshot for week in snapshot["data_versions"]
+    })
+    return {
+        report_id for report_id, snapshot in snapshots.items()
+        if snapshot is None or any(
+            versions[int(week)][0] != version for week, version in snapshot["data_versions"].items()
+        )
+    }
+
+
+def ensure_report_snapshot(db: Session, report_id: int) -> bool:
+    """Store a snapshot for a report generated before snapshots; returns whether one was added"""
+    report = db.get(WeeklyReport, report_id)
+    if report is None or report_snapshot(report) is not None:
+        return False
+    report.report_data = build_report_snapshot(db, report.week_start_date)
+    db.commit()
+    return True
+
+
+def current_week_snapshot(db: Session, week_start: datetime) -> Optional[Dict]:
+    """The up-to-date snapshot of a week's report, if it has one"""
+    report = db.query(WeeklyReport).filter(WeeklyReport.week_key == week_key(week_start)).first()
+    if report is None or report.id in stale_reports(db, [report]):
+        return None
+    return report_snapshot(report)
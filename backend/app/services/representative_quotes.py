@@ -0,0 +1,210 @@
+"""
+Representative feedback quotes
+
+`representative_quotes` keeps the QUOTES_PER_CELL best quotes (distinct
+texts) of each week, batch, location, sentiment and topic. A topic is a
+feedback category, or one of the appreciation tracker's recognition topics
+for positive feedback with appreciation words. A quote's score is the
+sentiment confidence times the category relevance (the confidence alone
+for recognition topics). The score does not depend on the cell, so the
+best quotes of any batch / location slice are the best of its cells' rows.
+
+The ingest pipeline adds its feedback's candidates in the same transaction
+as the rows (`QuoteDelta`, applied with the feedback cube) and prunes the
+touched cells back to their best quotes. Strengths, concerns, the
+appreciation tracker and the PDF read the stored quotes instead of
+rescanning the week's feedback. `rebuild_quotes` recomputes weeks from the
+stored feedback, archived weeks included (migration and `python -m
+app.services.representative_quotes`).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from app.models.feedback import Feedback, SentimentCategory
+from app.models.analytics import (
+    AnalyticsBatch, AnalyticsLocation, FeedbackFact, KeywordFlag, RepresentativeQuote, SENTIMENT_CODES
+)
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.services.feedback_archive import week_feedback
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUOTE_LENGTH = 200  # Characters kept before "..."
+QUOTES_PER_CELL = 5
+
+# Recognition topics (positive feedback with InsightGenerator.APPRECIATION_KEYWORDS)
+APPRECIATION = "appreciation"
+TRAINER_RECOGNITION = "trainer_recognition"  # ... that also names a trainer
+MENTOR_RECOGNITION = "mentor_recognition"  # ... that also names a mentor
+
+QUOTE_KEYS = ["week_key", "batch_id", "location_id", "sentiment_code", "topic"]
+DELETE_CHUNK = 500
+
+
+def quote_text(text: Optional[str]) -> str:
+    """A feedback text as quoted in insights and reports"""
+    text = text or ""
+    return text[:QUOTE_LENGTH] + "..." if len(text) > QUOTE_LENGTH else text
+
+
+def _ranked(quotes: Iterable[Tuple[float, int, str]], limit: int) -> List[Tuple[float, int, str]]:
+    """The `limit` best (score, feedback id, text) with distinct texts, best first (ties: oldest feedback)"""
+    ranked, texts = [], set()
+    for quote in sorted(quotes, key=lambda quote: (-quote[0], quote[1])):
+        if quote[2] not in texts:
+            texts.add(quote[2])
+            ranked.append(quote)
+            if len(ranked) == limit:
+                break
+    return ranked
+
+
+class QuoteDelta:
+    """Quote candidates of the feedback written in one transaction"""
+
+    def __init__(self):
+        self.cells: Dict[tuple, List[Tuple[float, int, str]]] = {}
+
+    def add(self, fact: FeedbackFact, feedback: Feedback) -> None:
+        """Add a feedback's quote under its fact's dimensions, once per category and recognition topic"""
+        analysis = feedback.sentiment_analysis
+        if analysis is None or not feedback.open_text:
+            return
+        confidence = analysis.confidence_score or 0.0
+        text = quote_text(feedback.open_text)
+        cell = (fact.week_key, fact.batch_id, fact.location_id, int(fact.sentiment_code))
+
+        topics = [
+            (mapping.category.value, confidence * (mapping.relevance_score or 0.0))
+            for mapping in feedback.category_mappings
+        ]
+        flags = fact.keyword_flags or 0
+        if analysis.sentiment_category == SentimentCategory.POSITIVE and flags & KeywordFlag.APPRECIATION:
+            topics.append((APPRECIATION, confidence))
+            if flags & KeywordFlag.TRAINER_RECOGNITION:
+                topics.append((TRAINER_RECOGNITION, confidence))
+            if flags & KeywordFlag.MENTOR_RECOGNITION:
+                topics.append((MENTOR_RECOGNITION, confidence))
+        for topic, score in topics:
+            self.cells.setdefault((*cell, topic), []).append((score, feedback.id, text))
+
+    def apply(self, db: Session) -> None:
+        """Add the candidates and prune the touched cells to their best quotes (the caller commits)"""
+        if not self.cells:
+            return
+        db.execute(RepresentativeQuote.__table__.insert(), [
+            {**dict(zip(QUOTE_KEYS, cell)), "feedback_id": feedback_id, "score": score, "text": text}
+            for cell in sorted(self.cells)
+            for score, feedback_id, text in _ranked(self.cells[cell], QUOTES_PER_CELL)
+        ])
+
+        # Stored and new quotes of the touched cells, keeping the best of each
+        columns = [getattr(RepresentativeQuote, column) for column in QUOTE_KEYS]
+        stored: Dict[tuple, List[Tuple[float, int, str]]] = {}
+        for *cell, feedback_id, score, text in db.query(
+            *columns, RepresentativeQuote.feedback_id, RepresentativeQuote.score, RepresentativeQuote.text
+        ).filter(
+            RepresentativeQuote.week_key.in_(sorted({cell[0] for cell in self.cells}))
+        ):
+            if tuple(cell) in self.cells:
+                stored.setdefault(tuple(cell), []).append((score, feedback_id, text))
+        dropped = []
+        for cell, quotes in stored.items():
+            kept = {quote[1] for quote in _ranked(quotes, QUOTES_PER_CELL)}
+            dropped.extend((*cell, feedback_id) for _, feedback_id, _ in quotes if feedback_id not in kept)
+        key = tuple_(*columns, RepresentativeQuote.feedback_id)
+        for start in range(0, len(dropped), DELETE_CHUNK):
+            db.query(RepresentativeQuote).filter(
+                key.in_(dropped[start:start + DELETE_CHUNK])
+            ).delete(synchronize_session=False)
+
+    def clear(self) -> None:
+        self.cells.clear()
+
+
+def rebuild_quotes(db: Session, keys: Optional[Iterable[int]] = None) -> int:
+    """Recompute the quotes of the given weeks (all weeks with facts when None); returns weeks rebuilt"""
+    if keys is None:
+        keys = [key for (key,) in db.query(FeedbackFact.week_key).distinct()]
+    keys = sorted(set(keys))
+
+    for key in keys:
+        db.query(RepresentativeQuote).filter(RepresentativeQuote.week_key == key).delete(synchronize_session=False)
+        facts = {fact.feedback_id: fact for fact in db.query(FeedbackFact).filter(FeedbackFact.week_key == key)}
+        delta = QuoteDelta()
+        for feedback in week_feedback(db, key):
+            if feedback.id in facts:
+                delta.add(facts[feedback.id], feedback)
+        delta.apply(db)
+        db.commit()
+        db.expunge_all()
+    return len(keys)
+
+
+class QuoteIndex:
+    """Best stored quotes for an AnalyticsScope"""
+
+    def __init__(self, db: Session, scope: AnalyticsScope = ALL_FEEDBACK):
+        self.db = db
+        self.scope = scope
+
+    def quotes(
+        self,
+        keys: List[int],
+        sentiment: SentimentCategory,
+        topics: Iterable[str],
+        limit: int = 2
+    ) -> Dict[str, List[Dict]]:
+        """
+        The `limit` best quotes per topic over the weeks `keys`
+
+        Returns topic -> list of {"text", "location", "batch"}, best first;
+        topics without quotes are left out.
+        """
+        topics = sorted(set(topics))
+        if not keys or not topics or self.scope.is_empty:
+            return {}
+        query = self.db.query(
+            RepresentativeQuote.topic,
+            RepresentativeQuote.feedback_id,
+            RepresentativeQuote.score,
+            RepresentativeQuote.text,
+            AnalyticsBatch.name,
+            AnalyticsLocation.name,
+        ).join(
+            AnalyticsBatch, AnalyticsBatch.id == RepresentativeQuote.batch_id
+        ).join(
+            AnalyticsLocation, AnalyticsLocation.id == RepresentativeQuote.location_id
+        ).filter(
+            RepresentativeQuote.week_key.in_(keys),
+            RepresentativeQuote.sentiment_code == int(SENTIMENT_CODES[SentimentCategory(sentiment)]),
+            RepresentativeQuote.topic.in_(topics)
+        )
+        if self.scope.batches is not None:
+            query = query.filter(AnalyticsBatch.name.in_(sorted(self.scope.batches)))
+        if self.scope.locations is not None:
+            query = query.filter(AnalyticsLocation.name.in_(sorted(self.scope.locations)))
+
+        candidates: Dict[str, List[Tuple[float, int, str]]] = {}
+        places = {}
+        for topic, feedback_id, score, text, batch, location in query:
+            candidates.setdefault(topic, []).append((score, feedback_id, text))
+            places[feedback_id] = (batch, location)
+        return {
+            topic: [
+                {"text": text, "location": places[feedback_id][1], "batch": places[feedback_id][0]}
+                for _, feedback_id, text in _ranked(quotes, limit)
+            ]
+            for topic, quotes in candidates.items()
+        }
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt the quotes of {rebuild_quotes(session)} weeks")
+    finally:
+        session.close()
@@ -0,0 +1,190 @@
+"""
+Response cache and HTTP validators for the analysis endpoints
+
+Responses are identified by endpoint, week, query parameters, the caller's
+access scope and the data versions of every week the response is computed
+from. That identity is both the ETag and the cache key, so an ingest (which
+bumps the versions of the weeks it writes) changes exactly the dependent
+responses; stale entries age out of the LRU or expire in Redis.
+
+Two tiers: an in-process LRU, and an optional shared tier (Redis when
+RESPONSE_CACHE_REDIS is set). Any object with `get(key)` and
+`set(key, value, ex=seconds)` can serve as the shared tier, e.g.
+`DictRemoteTier` in tests.
+"""
+from typing import Callable, Dict, Optional
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+import inspect
+import json
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.models.user import User
+from app.services.analytics_scope import allowed_batches
+from app.services.data_versions import get_week_versions, use_replica_for_weeks
+from app.utils.weeks import week_key, week_keys_back, parse_week_start
+from app.utils.http_cache import make_etag, latest, is_not_modified, set_validators, not_modified
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:  # Optional dependency
+    redis = None
+
+
+class LRUTier:
+    """Bounded, thread-safe in-process LRU of serialized responses"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DictRemoteTier:
+    """Dict-backed stand-in for the Redis tier (tests and single-process development)"""
+
+    def __init__(self):
+        self.store: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        return self.store.get(key)
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        self.store[key] = value
+
+
+class ResponseCache:
+    """Two-tier cache: local LRU first, then the shared tier (hits are copied to the LRU)"""
+
+    def __init__(self, local: LRUTier, remote=None):
+        self.local = local
+        self.remote = remote
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is None and self.remote is not None:
+            try:
+                value = self.remote.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache shared tier unavailable: {e}")
+                return None
+            if value is not None:
+                if isinstance(value, bytes):
+                    value = value.decode()
+                self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.local.set(key, value)
+        if self.remote is not None:
+            try:
+                self.remote.set(key, value, ex=settings.RESPONSE_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Response cache shared tier unavailable: {e}")
+
+    def clear(self) -> None:
+        self.local.clear()
+
+
+def _remote_tier_from_settings():
+    if not settings.RESPONSE_CACHE_REDIS:
+        return None
+    if redis is None:
+        logger.warning("RESPONSE_CACHE_REDIS is set but redis is not installed, using the local cache only")
+        return None
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+response_cache = ResponseCache(LRUTier(settings.RESPONSE_CACHE_SIZE), _remote_tier_from_settings())
+
+
+def access_scope(user: User) -> str:
+    """Cache scope of a user: batch owners only share entries with the same batch access"""
+    batches = allowed_batches(user)
+    if batches is not None:
+        return "batches:" + ",".join(batches)
+    return "all"
+
+
+def versioned_response(endpoint: str, weeks_covered: Callable[[Dict], int] = lambda params: 1):
+    """
+    Serve an analysis endpoint with HTTP validators and the response cache
+
+    The endpoint must take `week_start`, `current_user` and `db` (an AsyncSession).
+    `weeks_covered(params)` gives how many weeks, ending with `week_start`,
+    the response reads. Their data versions (one small query) determine the
+    ETag, Last-Modified and cache key; an If-None-Match / If-Modified-Since
+    hit returns 304 before any feedback is read. A response that has to be
+    computed reads from the analytics replica when it has caught up with
+    those versions.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request: Request, response: Response, **kwargs):
+            db = kwargs["db"]
+            key = week_key(parse_week_start(kwargs.get("week_start")))
+            params = {
+                name: value for name, value in kwargs.items()
+                if name not in ("db", "current_user", "week_start")
+            }
+            versions = await db.run_sync(get_week_versions, week_keys_back(key, weeks_covered(params)))
+            etag = make_etag(
+                endpoint, access_scope(kwargs["current_user"]), key, params,
+                sorted((week, version) for week, (version, _) in versions.items())
+            )
+            last_modified = latest(updated_at for _, updated_at in versions.values())
+
+            if is_not_modified(request, etag, last_modified):
+                return not_modified(etag, last_modified)
+            set_validators(response, etag, last_modified)
+
+            if not settings.RESPONSE_CACHE_ENABLED:
+                await use_replica_for_weeks(db, versions, versions)
+                return await func(**kwargs)
+
+            # The ETag already identifies endpoint, scope, week, params and data versions
+            cache_key = f"analysis:{endpoint}:{etag}"
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+
+            await use_replica_for_weeks(db, versions, versions)
+            result = jsonable_encoder(await func(**kwargs))
+            response_cache.set(cache_key, json.dumps(result))
+            return result
+
+        # Let FastAPI inject the request and response alongside the endpoint's own parameters
+        signature = inspect.signature(func)
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter("response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ])
+        return wrapper
+    return decorator
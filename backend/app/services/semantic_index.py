@@ -0,0 +1,416 @@
+"""
+Semantic similarity index over feedback texts
+
+Offline and network-free latent semantic analysis. Texts are hashed into
+word and bigram features (HashingVectorizer), weighted by idf and projected
+to SEMANTIC_DIMENSIONS dimensions by a TruncatedSVD fitted on a sample of
+the stored feedback. The projection learns which words occur in similar
+contexts, so paraphrases land close together without sharing words.
+
+Vectors are unit length float32 rows of one memory-mapped file per week
+(`<model>/<week_key>.vec`), each row holding the feedback id and its batch
+and location dimension ids next to the vector. A search reads only the
+segments of its week range and scores them in blocks with one matrix
+product per block (cosine similarity of unit vectors), keeping a running
+top-k per query.
+
+The ingest pipeline appends feedback as it commits; the index is built
+automatically once SEMANTIC_MIN_FEEDBACK feedback exist, and at startup
+for databases that already have feedback. `python -m
+app.services.semantic_index` refits the projection on the current data and
+re-embeds every week, archived weeks included; feedback committed while it
+runs may be left out until the next rebuild.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from pathlib import Path
+from threading import Lock
+import os
+import shutil
+import uuid
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.feedback import Feedback
+from app.models.analytics import AnalyticsBatch, AnalyticsLocation, FeedbackFact
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.services.feedback_archive import is_archived, read_archived_week
+import logging
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"  # Id of the model in use
+PROJECTION_FILE = "projection.npy"  # idf-weighted SVD components, hash features x dimensions
+SEGMENT_SUFFIX = ".vec"
+EMBED_CHUNK = 5000  # Texts hashed and projected at a time
+
+# (week_key, feedback id, batch id, location id, text) of a feedback to index
+IndexRow = Tuple[int, int, int, int, str]
+
+
+class SemanticIndexUnavailable(RuntimeError):
+    """No model has been fitted yet"""
+
+
+def segment_dtype(dimensions: int) -> np.dtype:
+    """One index row: the feedback and its dimension ids, then the unit vector"""
+    return np.dtype([
+        ("id", "<i8"),
+        ("batch_id", "<i4"),
+        ("location_id", "<i4"),
+        ("vector", "<f4", (dimensions,)),
+    ])
+
+
+def _hasher() -> HashingVectorizer:
+    return HashingVectorizer(
+        n_features=settings.SEMANTIC_HASH_FEATURES,
+        ngram_range=(1, 2),
+        stop_words="english",
+        alternate_sign=False,
+        binary=True,
+        norm=None,
+    )
+
+
+def fit_projection(texts: List[str]) -> np.ndarray:
+    """
+    Fit the hash features -> semantic dimensions projection on `texts`
+
+    Returns the SVD components scaled by the features' idf, transposed
+    (hash features x dimensions), so that embedding is one sparse product.
+    """
+    counts = _hasher().transform(texts)
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+    weighted = normalize(counts.multiply(idf).tocsr())
+    dimensions = max(1, min(settings.SEMANTIC_DIMENSIONS, len(texts) - 1))
+    svd = TruncatedSVD(n_components=dimensions, random_state=0).fit(weighted)
+    return np.ascontiguousarray((svd.components_ * idf).T, dtype=np.float32)
+
+
+class SemanticIndex:
+    """The fitted projection and the per-week vector segments under one directory"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._model: Optional[Tuple[str, np.ndarray]] = None  # (model id, projection)
+        self._lock = Lock()  # Serializes appends within the process
+
+    @property
+    def directory(self) -> Path:
+        return Path(self._directory or settings.SEMANTIC_INDEX_DIR)
+
+    def model_id(self) -> Optional[str]:
+        path = self.directory / CURRENT_FILE
+        return path.read_text().strip() if path.exists() else None
+
+    @property
+    def available(self) -> bool:
+        return self.model_id() is not None
+
+    def _projection(self) -> Tuple[str, np.ndarray]:
+        model_id = self.model_id()
+        if model_id is None:
+            raise SemanticIndexUnavailable(
+                "The semantic index has not been built yet (python -m app.services.semantic_index)"
+            )
+        model = self._model
+        if model is None or model[0] != model_id:
+            model = (model_id, np.load(self.directory / model_id / PROJECTION_FILE))
+            self._model = model
+        return model
+
+    def embed(self, texts: Sequence[str], projection: Optional[np.ndarray] = None) -> np.ndarray:
+        """Unit vectors (float32, one row per text; zero for texts without known words)"""
+        if projection is None:
+            _, projection = self._projection()
+        vectors = [
+            _hasher().transform(texts[start:start + EMBED_CHUNK]) @ projection
+            for start in range(0, len(texts), EMBED_CHUNK)
+        ]
+        if not vectors:
+            return np.zeros((0, projection.shape[1]), dtype=np.float32)
+        return normalize(np.vstack(vectors)).astype(np.float32, copy=False)
+
+    def _segment_path(self, model_id: str, key: int) -> Path:
+        return self.directory / model_id / f"{key}{SEGMENT_SUFFIX}"
+
+    def _records(self, rows: Sequence[IndexRow], projection: np.ndarray) -> np.ndarray:
+        vectors = self.embed([row[4] or "" for row in rows], projection)
+        records = np.zeros(len(rows), dtype=segment_dtype(vectors.shape[1]))
+        records["id"] = [row[1] for row in rows]
+        records["batch_id"] = [row[2] for row in rows]
+        records["location_id"] = [row[3] for row in rows]
+        records["vector"] = vectors
+        return records
+
+    def append(self, rows: Iterable[IndexRow]) -> int:
+        """Embed `rows` and append them to their weeks' segments; returns rows written"""
+        by_week: Dict[int, List[IndexRow]] = {}
+        for row in rows:
+            by_week.setdefault(row[0], []).append(row)
+        if not by_week:
+            return 0
+        model_id, projection = self._projection()
+        with self._lock:
+            for key, week_rows in by_week.items():
+                # One write per week: the rows of a segment stay whole
+                with open(self._segment_path(model_id, key), "ab") as segment:
+                    segment.write(self._records(week_rows, projection).tobytes())
+        return sum(len(week_rows) for week_rows in by_week.values())
+
+    def _segment(self, model_id: str, key: int, dimensions: int) -> Optional[np.ndarray]:
+        """Memory-mapped rows of a week's segment (None when the week has none)"""
+        path = self._segment_path(model_id, key)
+        dtype = segment_dtype(dimensions)
+        rows = path.stat().st_size // dtype.itemsize if path.exists() else 0
+        if not rows:
+            return None
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def week_keys(self) -> List[int]:
+        """Weeks with a segment for the current model"""
+        model_id = self.model_id()
+        if model_id is None:
+            return []
+        return sorted(int(path.stem) for path in (self.directory / model_id).glob(f"*{SEGMENT_SUFFIX}"))
+
+    def vector(self, key: int, feedback_id: int) -> Optional[np.ndarray]:
+        """The stored vector of a feedback of week `key`"""
+        model_id, projection = self._projection()
+        segment = self._segment(model_id, key, projection.shape[1])
+        if segment is None:
+            return None
+        found = np.flatnonzero(segment["id"] == feedback_id)
+        return np.array(segment["vector"][found[0]]) if len(found) else None
+
+    def most_similar(
+        self,
+        vectors: np.ndarray,
+        keys: Iterable[int],
+        k: int = 10,
+        batch_ids: Optional[Iterable[int]] = None,
+        location_ids: Optional[Iterable[int]] = None,
+        exclude: Iterable[int] = ()
+    ) -> List[List[Tuple[int, int, float]]]:
+        """
+        The `k` rows of the weeks `keys` most similar to each of `vectors`
+
+        Rows can be limited to batch / location dimension ids (None: all).
+        Returns per query vector a list of (feedback id, week_key, cosine
+        similarity), most similar first.
+        """
+        model_id, projection = self._projection()
+        queries = normalize(np.atleast_2d(vectors).astype(np.float32)).T  # dimensions x queries
+        batch_ids = np.fromiter(batch_ids, dtype=np.int32) if batch_ids is not None else None
+        location_ids = np.fromiter(location_ids, dtype=np.int32) if location_ids is not None else None
+        exclude = np.fromiter(exclude, dtype=np.int64)
+
+        # Running top-k candidates, one column per query
+        best_scores = np.empty((0, queries.shape[1]), dtype=np.float32)
+        best_ids = np.empty((0, queries.shape[1]), dtype=np.int64)
+        best_keys = np.empty((0, queries.shape[1]), dtype=np.int64)
+        for key in keys:
+            segment = self._segment(model_id, key, projection.shape[1])
+            if segment is None:
+                continue
+            for start in range(0, len(segment), settings.SEMANTIC_BLOCK_ROWS):
+                block = segment[start:start + settings.SEMANTIC_BLOCK_ROWS]
+                keep = np.ones(len(block), dtype=bool)
+                if batch_ids is not None:
+                    keep &= np.isin(block["batch_id"], batch_ids)
+                if location_ids is not None:
+                    keep &= np.isin(block["location_id"], location_ids)
+                if len(exclude):
+                    keep &= ~np.isin(block["id"], exclude)
+                if not keep.any():
+                    continue
+                if not keep.all():
+                    block = block[keep]
+                scores = block["vector"] @ queries  # block rows x queries
+                if len(block) > k:
+                    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+                    scores = np.take_along_axis(scores, top, axis=0)
+                    ids = block["id"][top]
+                else:
+                    ids = np.repeat(block["id"][:, None], queries.shape[1], axis=1)
+                best_scores = np.vstack([best_scores, scores])
+                best_ids = np.vstack([best_ids, ids])
+                best_keys = np.vstack([best_keys, np.full(ids.shape, key, dtype=np.int64)])
+                if len(best_scores) > k:
+                    top = np.argpartition(-best_scores, k - 1, axis=0)[:k]
+                    best_scores = np.take_along_axis(best_scores, top, axis=0)
+                    best_ids = np.take_along_axis(best_ids, top, axis=0)
+                    best_keys = np.take_along_axis(best_keys, top, axis=0)
+
+        results = []
+        for column in range(queries.shape[1]):
+            hits, seen = [], set()
+            for row in np.lexsort((best_ids[:, column], -best_scores[:, column])):
+                hit_id = int(best_ids[row, column])
+                if hit_id not in seen:  # A feedback appended twice counts once
+                    seen.add(hit_id)
+                    hits.append((hit_id, int(best_keys[row, column]), float(best_scores[row, column])))
+            results.append(hits)
+        return results
+
+    def write_segment(self, model_id: str, projection: np.ndarray, key: int, rows: Sequence[IndexRow]) -> None:
+        """Write a week's segment of a model that is being built"""
+        self._records(rows, projection).tofile(self._segment_path(model_id, key))
+
+    def install(self, model_id: str) -> None:
+        """Switch readers and writers to a fully built model and remove the others"""
+        current = self.directory / CURRENT_FILE
+        temp_path = current.with_suffix(".tmp")
+        temp_path.write_text(model_id)
+        os.replace(temp_path, current)  # Readers never see a half-written id
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name != model_id:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def _week_rows(db: Session, key: int) -> List[IndexRow]:
+    """Index rows of a week's feedback with facts, hot and archived"""
+    facts = dict(
+        (feedback_id, (batch_id, location_id)) for feedback_id, batch_id, location_id in db.query(
+            FeedbackFact.feedback_id, FeedbackFact.batch_id, FeedbackFact.location_id
+        ).filter(FeedbackFact.week_key == key)
+    )
+    texts = dict(db.query(Feedback.id, Feedback.open_text).filter(Feedback.week_key == key))
+    if is_archived(key):
+        for feedback in read_archived_week(key):
+            texts.setdefault(feedback.id, feedback.open_text)
+    return [
+        (key, feedback_id, *facts[feedback_id], texts[feedback_id])
+        for feedback_id in sorted(texts) if feedback_id in facts
+    ]
+
+
+def build_semantic_index(db: Session, index: Optional[SemanticIndex] = None) -> int:
+    """Fit a new projection on a sample of the stored feedback and embed every week; returns rows indexed"""
+    index = index or semantic_index
+    sample = [text for (text,) in db.query(Feedback.open_text).order_by(func.random()).limit(
+        settings.SEMANTIC_FIT_SAMPLE
+    )]
+    if len(sample) < 2:
+        return 0
+
+    model_id = uuid.uuid4().hex[:12]
+    model_directory = index.directory / model_id
+    model_directory.mkdir(parents=True, exist_ok=True)
+    projection = fit_projection(sample)
+    np.save(model_directory / PROJECTION_FILE, projection)
+
+    written = 0
+    for (key,) in db.query(FeedbackFact.week_key).distinct().order_by(FeedbackFact.week_key):
+        rows = _week_rows(db, key)
+        if rows:
+            index.write_segment(model_id, projection, key, rows)
+            written += len(rows)
+    index.install(model_id)
+    logger.info(f"Built semantic index {model_id}: {written} feedback, {projection.shape[1]} dimensions")
+    return written
+
+
+def ensure_semantic_index(db: Session, index: Optional[SemanticIndex] = None) -> int:
+    """Build the index if there is none and the database holds SEMANTIC_MIN_FEEDBACK feedback; returns rows indexed"""
+    index = index or semantic_index
+    if not settings.SEMANTIC_INDEX_ENABLED or index.available:
+        return 0
+    if db.query(func.count(FeedbackFact.feedback_id)).scalar() < settings.SEMANTIC_MIN_FEEDBACK:
+        return 0
+    return build_semantic_index(db, index)
+
+
+def update_semantic_index(db: Session, rows: Sequence[IndexRow], index: Optional[SemanticIndex] = None) -> int:
+    """Add committed feedback to the index, or build it once there is enough (called by the ingest pipeline)"""
+    index = index or semantic_index
+    if not settings.SEMANTIC_INDEX_ENABLED or not rows:
+        return 0
+    if index.available:
+        return index.append(rows)
+    return ensure_semantic_index(db, index)
+
+
+def _dimension_ids(db: Session, model, names: Optional[Iterable[str]]) -> Optional[List[int]]:
+    if names is None:
+        return None
+    return [row_id for (row_id,) in db.query(model.id).filter(model.name.in_(sorted(names)))]
+
+
+def similar_feedback(
+    db: Session,
+    text: Optional[str] = None,
+    feedback_id: Optional[int] = None,
+    scope: AnalyticsScope = ALL_FEEDBACK,
+    week_from: Optional[int] = None,
+    week_to: Optional[int] = None,
+    limit: int = 10,
+    index: Optional[SemanticIndex] = None
+) -> List[Dict]:
+    """
+    Feedback most similar to `text`, or to the stored feedback `feedback_id`, most similar first
+
+    Rows are dicts with id, trainee_id, location, training_batch,
+    week_start_date, rating_score, open_text and score (cosine similarity).
+    Raises LookupError when `feedback_id` is not indexed and
+    SemanticIndexUnavailable when there is no index.
+    """
+    index = index or semantic_index
+    if feedback_id is not None:
+        key = db.query(FeedbackFact.week_key).filter(FeedbackFact.feedback_id == feedback_id).scalar()
+        vector = index.vector(key, feedback_id) if key is not None else None
+        if vector is None:
+            raise LookupError(f"Feedback {feedback_id} is not in the semantic index")
+    else:
+        vector = index.embed([text or ""])[0]
+    if scope.is_empty or not vector.any():
+        return []
+
+    keys = [
+        key for key in index.week_keys()
+        if (week_from is None or key >= week_from) and (week_to is None or key <= week_to)
+    ]
+    hits = index.most_similar(
+        vector, keys, limit,
+        batch_ids=_dimension_ids(db, AnalyticsBatch, scope.batches),
+        location_ids=_dimension_ids(db, AnalyticsLocation, scope.locations),
+        exclude=[feedback_id] if feedback_id is not None else ()
+    )[0]
+
+    # Details from the hot tables, or the archive for weeks that left them
+    ids = [hit_id for hit_id, _, _ in hits]
+    details = {
+        row.id: row._mapping for row in db.query(
+            Feedback.id, Feedback.trainee_id, Feedback.location, Feedback.training_batch,
+            Feedback.week_start_date, Feedback.rating_score, Feedback.open_text
+        ).filter(Feedback.id.in_(ids))
+    }
+    for key in {key for hit_id, key, _ in hits if hit_id not in details}:
+        if is_archived(key):
+            for feedback in read_archived_week(key):
+                if feedback.id in ids and feedback.id not in details:
+                    details[feedback.id] = {
+                        name: getattr(feedback, name) for name in (
+                            "id", "trainee_id", "location", "training_batch", "week_start_date", "rating_score",
+                            "open_text"
+                        )
+                    }
+    return [{**details[hit_id], "score": score} for hit_id, _, score in hits if hit_id in details]
+
+
+semantic_index = SemanticIndex()
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Indexed {build_semantic_index(session)} feedback in {settings.SEMANTIC_INDEX_DIR}")
+    finally:
+        session.close()
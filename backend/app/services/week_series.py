@@ -0,0 +1,48 @@
+"""
+Multi-week aggregation engine
+"""
+from typing import List, Dict
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.services.analytics_backend import get_analytics_backend
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WeekSeriesEngine:
+    """
+    Build a week-by-metric series for a range of weeks.
+
+    Weeks are aggregated by the configured analytics backend (feedback cube,
+    columnar week frames or DuckDB); either way all requested weeks are read
+    in one pass, so the cost does not grow with the number of weeks. A
+    batch / location scope restricts the series to that slice.
+    """
+
+    def __init__(self, db: Session, scope: AnalyticsScope = ALL_FEEDBACK):
+        self.db = db
+        self.scope = scope
+
+    def get_series(self, week_start: datetime, weeks_back: int = 8) -> List[Dict]:
+        """
+        Get per-week metrics for `weeks_back` weeks ending with `week_start`
+
+        Returns (newest week first):
+            List of {
+                "week_key": int,
+                "week_start": datetime,
+                "week_end": datetime,
+                "volume": int,
+                "positive": int, "neutral": int, "negative": int,
+                "categories": {category: {"positive", "neutral", "negative", "total"}},
+                "trainer_mentions": int,  # positive feedback mentioning trainers
+                "mentor_mentions": int    # positive feedback mentioning mentors
+            }
+        """
+        return get_analytics_backend(self.db, self.scope).series(week_start, weeks_back)
+
+    def get_week(self, week_start: datetime) -> Dict:
+        """Get metrics for the single week containing `week_start`"""
+        return self.get_series(week_start, 1)[0]
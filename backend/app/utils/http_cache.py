@@ -0,0 +1,70 @@
+"""
+HTTP conditional request helpers (ETag / Last-Modified)
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+import hashlib
+import json
+from fastapi import Request, Response, status
+
+# Authenticated dashboard data: browsers may keep it but must revalidate every time
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from any JSON-serializable parts"""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def latest(timestamps: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    """Most recent timestamp (naive values are UTC, as stored by SQLite)"""
+    aware = [
+        value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        for value in timestamps if value is not None
+    ]
+    return max(aware) if aware else None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Whether the request's validators show the client already has this representation"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime]) -> None:
+    """Attach ETag / Last-Modified to a response"""
+    response.headers.update(validator_headers(etag, last_modified))
+
+
+def not_modified(etag: str, last_modified: Optional[datetime]) -> Response:
+    """Empty 304 response carrying the current validators"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
@@ -4,6 +4,7 @@ Database initialization script
 from app.core.database import Base, engine, SessionLocal
 from app.models.user import User, UserRole
 from app.core.security import get_password_hash
+from app.utils.migrations import run_migrations
 
 
 def init_db():
@@ -11,9 +12,12 @@ def init_db():
     # Create all tables
     Base.metadata.create_all(bind=engine)
     
-    # Create default admin user if it doesn't exist
     db = SessionLocal()
     try:
+        # Bring existing tables up to date (new columns, indexes, backfills)
+        run_migrations(engine, db)
+        
+        # Create default admin user if it doesn't exist
         admin_user = db.query(User).filter(User.email == "admin@example.com").first()
         if not admin_user:
             admin_user = User(
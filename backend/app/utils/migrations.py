@@ -0,0 +1,191 @@
+"""
+Lightweight schema migrations
+
+`Base.metadata.create_all` creates missing tables but never alters existing
+ones. Each migration here brings an existing database up to date (missing
+columns, indexes and backfills). All migrations are idempotent and run on
+every startup from `init_db`.
+"""
+from typing import Dict
+from datetime import date
+from sqlalchemy import Date, cast, func, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.models.feedback import Feedback, SentimentAnalysis, CategoryMapping
+from app.models.report import WeeklyReport
+from app.models.analytics import FeedbackFact, FeedbackCube, KeywordCount, RepresentativeQuote
+from app.services.feedback_ingestor import FeedbackIngestor
+from app.services.feedback_cube import rebuild_cube
+from app.services.keyword_index import rebuild_keyword_counts
+from app.services.representative_quotes import rebuild_quotes
+from app.services.feedback_search import create_search_index
+from app.services.semantic_index import ensure_semantic_index
+from app.utils.partitioning import partition_feedback_tables, create_upcoming_partitions
+from app.utils.weeks import week_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def add_missing_columns(engine: Engine, table_name: str, columns: Dict[str, str]) -> None:
+    """Add columns (name -> SQL type) that an existing table does not have yet"""
+    existing = {column["name"] for column in inspect(engine).get_columns(table_name)}
+    with engine.begin() as conn:
+        for name, sql_type in columns.items():
+            if name not in existing:
+                logger.info(f"Adding column {table_name}.{name}")
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {sql_type}"))
+
+
+def create_missing_indexes(engine: Engine, model) -> None:
+    """Create any index declared on the model that the database does not have yet"""
+    for index in model.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def stored_date(db: Session, column):
+    """
+    SQL calendar date of a stored datetime, as ingest saw it
+
+    Ingest keys weeks on the wall-clock date it was given. PostgreSQL keeps
+    that date in the session time zone, so the key comes from
+    `week_start_date::date` rather than from the aware datetime the driver
+    returns (which may sit on the other side of midnight in UTC).
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def backfill_week_keys(db: Session, model) -> int:
+    """Fill week_key from week_start_date for rows written before the column existed"""
+    updated = 0
+    while True:
+        rows = db.query(model.id, stored_date(db, model.week_start_date)).filter(
+            model.week_key.is_(None)
+        ).limit(BACKFILL_BATCH_SIZE).all()
+        if not rows:
+            break
+        db.bulk_update_mappings(model, [
+            {"id": row_id, "week_key": week_key(date.fromisoformat(str(week_start)))}
+            for row_id, week_start in rows
+        ])
+        db.commit()
+        updated += len(rows)
+    if updated:
+        logger.info(f"Backfilled week_key for {updated} {model.__tablename__} rows")
+    return updated
+
+
+def migrate_week_keys(engine: Engine, db: Session) -> None:
+    """Add and backfill the integer ISO week key on feedback and weekly reports"""
+    for model in (Feedback, WeeklyReport):
+        add_missing_columns(engine, model.__tablename__, {"week_key": "INTEGER"})
+        create_missing_indexes(engine, model)
+        backfill_week_keys(db, model)
+
+
+def migrate_child_week_keys(engine: Engine, db: Session) -> None:
+    """Copy each feedback's week_key onto its sentiment analysis and category mappings"""
+    for model in (SentimentAnalysis, CategoryMapping):
+        add_missing_columns(engine, model.__tablename__, {"week_key": "INTEGER"})
+        updated = db.execute(update(model).where(model.week_key.is_(None)).values(
+            week_key=select(Feedback.week_key).where(Feedback.id == model.feedback_id).scalar_subquery()
+        ).execution_options(synchronize_session=False)).rowcount
+        db.commit()
+        if updated:
+            logger.info(f"Backfilled week_key for {updated} {model.__tablename__} rows")
+
+
+def migrate_feedback_partitions(engine: Engine, db: Session) -> None:
+    """Partition the feedback tables by week on PostgreSQL (FEEDBACK_PARTITIONING) and create upcoming partitions"""
+    partition_feedback_tables(engine)
+    create_upcoming_partitions(engine)
+
+
+def migrate_category_mapping_index(engine: Engine, db: Session) -> None:
+    """Index category_mappings.feedback_id (used by every per-feedback category load)"""
+    create_missing_indexes(engine, CategoryMapping)
+
+
+def migrate_feedback_facts_foreign_key(engine: Engine, db: Session) -> None:
+    """Drop the feedback_facts -> feedback foreign key (facts are kept when feedback is archived)"""
+    if engine.dialect.name == "sqlite":
+        return  # Foreign keys are not enforced on the application's SQLite connections
+    table_name = FeedbackFact.__tablename__
+    for foreign_key in inspect(engine).get_foreign_keys(table_name):
+        if foreign_key["referred_table"] == "feedback" and foreign_key.get("name"):
+            with engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT "{foreign_key["name"]}"'))
+            logger.info(f"Dropped foreign key {foreign_key['name']} from {table_name}")
+
+
+def migrate_feedback_cube(engine: Engine, db: Session) -> None:
+    """Build the feedback cube from the facts written before it existed (new facts update it at ingest)"""
+    if db.query(FeedbackCube).first() is None and db.query(FeedbackFact).first() is not None:
+        logger.info(f"Built the feedback cube from {rebuild_cube(db)} feedback facts")
+
+
+def migrate_keyword_counts(engine: Engine, db: Session) -> None:
+    """Count the keywords of feedback ingested before keyword_counts existed (new feedback updates it at ingest)"""
+    if db.query(KeywordCount).first() is None and db.query(FeedbackFact).first() is not None:
+        logger.info(f"Counted keywords of {rebuild_keyword_counts(db)} weeks")
+
+
+def migrate_representative_quotes(engine: Engine, db: Session) -> None:
+    """Pick the quotes of feedback ingested before representative_quotes existed (new feedback updates it at ingest)"""
+    if db.query(RepresentativeQuote).first() is None and db.query(FeedbackFact).first() is not None:
+        logger.info(f"Picked representative quotes of {rebuild_quotes(db)} weeks")
+
+
+def migrate_feedback_search(engine: Engine, db: Session) -> None:
+    """Create the full-text index over feedback texts (after partitioning, which recreates the feedback table)"""
+    if create_search_index(engine):
+        logger.info("Created the feedback full-text index")
+
+
+def migrate_semantic_index(engine: Engine, db: Session) -> None:
+    """Build the semantic similarity index over feedback ingested before it existed (new feedback is appended at ingest)"""
+    indexed = ensure_semantic_index(db)
+    if indexed:
+        logger.info(f"Built the semantic index from {indexed} feedback")
+
+
+def migrate_feedback_facts(engine: Engine, db: Session) -> None:
+    """Write analytics facts for feedback ingested before the fact table existed"""
+    FeedbackIngestor(db).backfill_facts(BACKFILL_BATCH_SIZE)
+
+
+MIGRATIONS = [
+    migrate_week_keys,
+    migrate_child_week_keys,
+    migrate_feedback_cube,  # Before the facts backfill, which updates the cube and keyword counts
+    migrate_keyword_counts,
+    migrate_representative_quotes,
+    migrate_feedback_facts,
+    migrate_category_mapping_index,
+    migrate_feedback_partitions,
+    migrate_feedback_facts_foreign_key,
+    migrate_feedback_search,
+    migrate_semantic_index,  # After the facts backfill: index rows carry the facts' batch and location ids
+]
+
+
+def run_migrations(engine: Engine, db: Session) -> None:
+    """Run every migration in order"""
+    for migration in MIGRATIONS:
+        migration(engine, db)
+        # End the session's transaction: its locks would block migrations using their own connections
+        db.commit()
+
+
+if __name__ == "__main__":
+    from app.core.database import engine, SessionLocal
+
+    session = SessionLocal()
+    try:
+        run_migrations(engine, session)
+    finally:
+        session.close()
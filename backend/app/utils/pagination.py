@@ -0,0 +1,80 @@
+"""
+Keyset (cursor) pagination helpers
+
+A page ends with the sort key of its last row, returned to the client as
+an opaque cursor in the X-Next-Cursor header. The next page filters
+strictly after that key instead of skipping rows with OFFSET, so every
+page is an index range scan of `limit` rows, however deep it is.
+"""
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from datetime import datetime
+import base64
+import json
+import operator
+from fastapi import Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500  # Largest `limit` a list endpoint serves in one page
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for a sort key (ints, strings and datetimes)"""
+    payload = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def _cursor_value(value: Any, expected: type) -> Any:
+    """A decoded cursor value as the type of its sort column (ValueError if it is not one)"""
+    if expected is datetime:
+        if isinstance(value, dict) and isinstance(value.get("dt"), str):
+            return datetime.fromisoformat(value["dt"])
+    elif expected is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif isinstance(value, expected) and not isinstance(value, bool):
+        return value
+    raise ValueError("Invalid cursor")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    Sort key of a cursor made by `encode_cursor` (ValueError if malformed)
+
+    `types` are the sort columns' types (int, float, str or datetime); a
+    value of another type is rejected rather than compared against the column.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("Invalid cursor")
+        return [_cursor_value(value, expected) for value, expected in zip(payload, types)]
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after(columns: Sequence, values: Sequence[Any], descending: bool = False):
+    """Rows strictly after `values` in (`columns`) order"""
+    compare = operator.lt if descending else operator.gt
+    return or_(*(
+        and_(*(column == value for column, value in zip(columns[:position], values)),
+             compare(columns[position], values[position]))
+        for position in range(len(columns))
+    ))
+
+
+def paginate(rows: Sequence, limit: int, key: Callable[[Any], Tuple]) -> Tuple[List, Optional[str]]:
+    """
+    Split `limit + 1` fetched rows into the page and the cursor of the next page
+
+    Fetching one extra row tells whether a next page exists without a count.
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    return page, encode_cursor(key(page[-1]))
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
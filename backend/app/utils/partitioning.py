@@ -0,0 +1,352 @@
+"""
+Week-partitioned feedback storage (PostgreSQL)
+
+With FEEDBACK_PARTITIONING on a PostgreSQL database, `feedback`,
+`sentiment_analysis`, `category_mappings` and `feedback_facts` are
+declaratively range-partitioned on week_key (ISO week YYYYWW), one
+partition per week or per month (FEEDBACK_PARTITION_PERIOD). Queries
+filtered by week only touch that week's partitions and indexes, and
+retention drops whole partitions instead of deleting rows.
+
+Partitioned tables need the partition key in every primary key, unique
+constraint and foreign key, so each table's key becomes (id, week_key)
+and the child tables reference feedback by (feedback_id, week_key).
+`feedback_facts` has no foreign key to feedback: facts stay in the
+database after their feedback is archived (app/services/feedback_archive.py).
+
+Layout:
+    feedback_m202410, sentiment_analysis_m202410, ...  month partitions
+    feedback_w202441, sentiment_analysis_w202441, ...  week partitions
+
+A month partition holds the weeks whose Monday falls in that month.
+Partitions are created by the ingest pipeline when a new period arrives
+(`FeedbackIngestor.prepare`) and ahead of time at startup. Existing
+unpartitioned tables are converted by the `migrate_feedback_partitions`
+migration. SQLite and other databases keep the plain tables.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from datetime import datetime, timedelta
+from threading import Lock
+import logging
+import re
+from sqlalchemy import Enum, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, with_loader_criteria
+from app.core.config import settings
+from app.models.feedback import Feedback, SentimentAnalysis, CategoryMapping
+from app.models.analytics import FeedbackFact, FeedbackCube, KeywordCount, RepresentativeQuote
+from app.services.data_versions import bump_week_versions
+from app.utils.weeks import week_key, week_start_from_key, shift_week_key, current_week_start
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables in dependency order (referenced before referencing), with
+# the constraints that replace their single-column keys
+PARTITIONED_TABLES = [
+    (Feedback.__table__, [
+        "PRIMARY KEY (id, week_key)",
+    ]),
+    (SentimentAnalysis.__table__, [
+        "PRIMARY KEY (id, week_key)",
+        "UNIQUE (feedback_id, week_key)",
+        "FOREIGN KEY (feedback_id, week_key) REFERENCES feedback (id, week_key)",
+    ]),
+    (CategoryMapping.__table__, [
+        "PRIMARY KEY (id, week_key)",
+        "FOREIGN KEY (feedback_id, week_key) REFERENCES feedback (id, week_key)",
+    ]),
+    (FeedbackFact.__table__, [
+        "PRIMARY KEY (feedback_id, week_key)",
+        "FOREIGN KEY (batch_id) REFERENCES dim_batches (id)",
+        "FOREIGN KEY (location_id) REFERENCES dim_locations (id)",
+    ]),
+]
+
+# Per-week rollups of the partitioned rows, deleted with the weeks they count
+ROLLUP_TABLES = [FeedbackCube.__table__, KeywordCount.__table__, RepresentativeQuote.__table__]
+
+PARTITION_PERIODS = ("week", "month")
+
+# Serializes partition creation across connections (IF NOT EXISTS alone races)
+PARTITION_LOCK_KEY = 202400001
+
+# Period (suffix, lower week key, upper week key), upper bound exclusive
+Period = Tuple[str, int, int]
+
+# Partitions known to exist, per database
+_known_partitions: Set[Tuple[str, str]] = set()
+_known_partitions_lock = Lock()
+
+_BOUNDS = re.compile(r"FROM \((\d+)\) TO \((\d+)\)")
+
+
+def partitioning_enabled(bind: Union[Engine, Connection]) -> bool:
+    return settings.FEEDBACK_PARTITIONING and bind.dialect.name == "postgresql"
+
+
+def _first_week_key_on_or_after(day: datetime) -> int:
+    return week_key(day + timedelta(days=(7 - day.weekday()) % 7))
+
+
+def partition_period(key: int) -> Period:
+    """Partition suffix and [lower, upper) week key bounds of the period containing week `key`"""
+    if settings.FEEDBACK_PARTITION_PERIOD not in PARTITION_PERIODS:
+        raise ValueError(f"FEEDBACK_PARTITION_PERIOD must be one of {', '.join(PARTITION_PERIODS)}")
+    if settings.FEEDBACK_PARTITION_PERIOD == "week":
+        # No week key lies strictly between a week and key + 1
+        return f"w{key}", key, key + 1
+    month_start = week_start_from_key(key).replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    return (
+        f"m{month_start:%Y%m}",
+        _first_week_key_on_or_after(month_start),
+        _first_week_key_on_or_after(next_month),
+    )
+
+
+def _next_period_key(key: int) -> int:
+    """First week key of the period after the one containing week `key`"""
+    if settings.FEEDBACK_PARTITION_PERIOD == "week":
+        return shift_week_key(key, 1)
+    return partition_period(key)[2]
+
+
+def same_week_loads(key: int) -> tuple:
+    """
+    Query options limiting sentiment and category loads to week `key`
+
+    Their loads otherwise filter on feedback_id alone and probe every
+    partition; with the week_key criterion they touch only the week's.
+    """
+    return (
+        with_loader_criteria(SentimentAnalysis, SentimentAnalysis.week_key == key),
+        with_loader_criteria(CategoryMapping, CategoryMapping.week_key == key),
+    )
+
+
+def _database_id(bind: Union[Engine, Connection]) -> str:
+    return bind.engine.url.render_as_string(hide_password=True)
+
+
+def missing_partitions(bind: Union[Engine, Connection], keys: Iterable[int]) -> List[Period]:
+    """Periods of `keys` without partitions known to this process ([] unless partitioning is enabled)"""
+    if not partitioning_enabled(bind):
+        return []
+    database = _database_id(bind)
+    periods = {partition_period(key) for key in keys if key is not None}
+    with _known_partitions_lock:
+        return sorted(period for period in periods if (database, period[0]) not in _known_partitions)
+
+
+def mark_partitions_created(bind: Union[Engine, Connection], periods: Iterable[Period]) -> None:
+    """Record committed partitions so later ingests skip them"""
+    database = _database_id(bind)
+    with _known_partitions_lock:
+        _known_partitions.update((database, suffix) for suffix, _, _ in periods)
+
+
+def create_partitions(connection: Connection, periods: Iterable[Period]) -> None:
+    """
+    Create every partitioned table's partition for `periods` in the connection's transaction
+
+    Takes an ACCESS EXCLUSIVE lock on each parent until the transaction ends
+    (existing partitions are skipped without it).
+    """
+    periods = list(periods)
+    if not periods:
+        return
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    for table, _ in PARTITIONED_TABLES:
+        for suffix, lower, upper in periods:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table.name}_{suffix} PARTITION OF {table.name} "
+                f"FOR VALUES FROM ({lower}) TO ({upper})"
+            ))
+
+
+def ensure_partitions(engine: Engine, keys: Iterable[int]) -> None:
+    """Create (and commit) the partitions for week `keys` that do not exist yet"""
+    periods = missing_partitions(engine, keys)
+    if periods:
+        with engine.begin() as connection:
+            create_partitions(connection, periods)
+        mark_partitions_created(engine, periods)
+
+
+def create_upcoming_partitions(engine: Engine) -> None:
+    """Create partitions from the current period through FEEDBACK_PARTITIONS_AHEAD periods ahead"""
+    if not partitioning_enabled(engine):
+        return
+    key = week_key(current_week_start())
+    keys = [key]
+    for _ in range(max(settings.FEEDBACK_PARTITIONS_AHEAD, 0)):
+        key = _next_period_key(key)
+        keys.append(key)
+    ensure_partitions(engine, keys)
+    # Later ingests into existing periods need no DDL at all
+    with engine.connect() as connection:
+        mark_partitions_created(engine, [
+            (name[len(Feedback.__tablename__) + 1:], lower, upper)
+            for name, lower, upper in partition_bounds(connection, Feedback.__tablename__)
+        ])
+
+
+def partition_bounds(connection: Connection, table_name: str) -> List[Tuple[str, int, int]]:
+    """(partition name, lower, upper) of each partition of `table_name`, oldest first"""
+    rows = connection.execute(text(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+        "FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"
+    ), {"table": table_name})
+    bounds = []
+    for name, expression in rows:
+        match = _BOUNDS.search(expression or "")
+        if match:
+            bounds.append((name, int(match.group(1)), int(match.group(2))))
+    return sorted(bounds, key=lambda bound: bound[1])
+
+
+def is_partitioned(connection: Connection, table_name: str) -> Optional[bool]:
+    """Whether `table_name` is a partitioned table (None if it does not exist)"""
+    kind = connection.execute(text(
+        "SELECT relkind FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p') "
+        "AND pg_table_is_visible(oid)"
+    ), {"table": table_name}).scalar()
+    return None if kind is None else kind == "p"
+
+
+def _column_sql(table, column, dialect) -> str:
+    parts = [column.name, column.type.compile(dialect=dialect)]
+    if column.name == "week_key" or not column.nullable:
+        parts.append("NOT NULL")  # The partition key can never be NULL
+    if column is table.autoincrement_column:
+        parts.append(f"DEFAULT nextval('{table.name}_{column.name}_seq')")
+    elif column.server_default is not None:
+        parts.append(f"DEFAULT {column.server_default.arg.compile(dialect=dialect)}")
+    return " ".join(parts)
+
+
+def create_partitioned_table(connection: Connection, table, constraints: List[str]) -> None:
+    """Create `table` as a week_key range-partitioned table (its indexes are created separately)"""
+    dialect = connection.dialect
+    for column in table.columns:
+        if isinstance(column.type, Enum):
+            column.type.create(bind=connection, checkfirst=True)
+
+    sequence = None
+    if table.autoincrement_column is not None:
+        # Reuses the SERIAL sequence of a converted table, keeping its ids
+        sequence = f"{table.name}_{table.autoincrement_column.name}_seq"
+        connection.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {sequence}"))
+
+    definitions = [_column_sql(table, column, dialect) for column in table.columns] + constraints
+    connection.execute(text(
+        f"CREATE TABLE {table.name} (\n    " + ",\n    ".join(definitions) + "\n) PARTITION BY RANGE (week_key)"
+    ))
+    if sequence:
+        connection.execute(text(
+            f"ALTER SEQUENCE {sequence} OWNED BY {table.name}.{table.autoincrement_column.name}"
+        ))
+
+
+def _rename_indexes(connection: Connection, table_name: str, suffix: str) -> None:
+    """Rename a table's indexes (and the constraints behind them) out of the way"""
+    for (index_name,) in connection.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table AND schemaname = current_schema()"
+    ), {"table": table_name}):
+        connection.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:63 - len(suffix)]}{suffix}"'))
+
+
+def convert_to_partitioned(engine: Engine) -> None:
+    """
+    Rebuild the plain feedback tables as partitioned tables, in one transaction
+
+    Rows are copied into partitions for every period present, keeping their
+    ids and sequences; the old tables are dropped once the copy succeeds.
+    Writers and readers of these tables wait until it finishes.
+    """
+    suffix = "_unpartitioned"
+    with engine.begin() as connection:
+        names = [table.name for table, _ in PARTITIONED_TABLES]
+        connection.execute(text(f"LOCK TABLE {', '.join(names)} IN ACCESS EXCLUSIVE MODE"))
+        for name in names:
+            connection.execute(text(f"ALTER TABLE {name} RENAME TO {name}{suffix}"))
+            _rename_indexes(connection, f"{name}{suffix}", suffix)
+
+        for table, constraints in PARTITIONED_TABLES:
+            create_partitioned_table(connection, table, constraints)
+
+        keys = connection.execute(text(
+            f"SELECT DISTINCT week_key FROM {Feedback.__tablename__}{suffix} WHERE week_key IS NOT NULL"
+        )).scalars().all()
+        create_partitions(connection, sorted({partition_period(key) for key in keys}))
+
+        for table, _ in PARTITIONED_TABLES:
+            columns = ", ".join(column.name for column in table.columns)
+            copied = connection.execute(text(
+                f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}{suffix}"
+            )).rowcount
+            logger.info(f"Copied {copied} rows into partitioned {table.name}")
+
+        for table, _ in reversed(PARTITIONED_TABLES):
+            connection.execute(text(f"DROP TABLE {table.name}{suffix}"))
+        for table, _ in PARTITIONED_TABLES:
+            for index in table.indexes:
+                index.create(bind=connection)
+            connection.execute(text(f"ANALYZE {table.name}"))
+
+
+def partition_feedback_tables(engine: Engine) -> None:
+    """Convert the plain feedback tables (as created by `create_all`, empty or not) to partitioned tables"""
+    if not partitioning_enabled(engine):
+        return
+    with engine.connect() as connection:
+        layout = {table.name: is_partitioned(connection, table.name) for table, _ in PARTITIONED_TABLES}
+
+    if all(layout.values()):
+        return
+    if any(partitioned is not False for partitioned in layout.values()):
+        raise RuntimeError(f"Cannot partition a mix of partitioned, plain and missing tables: {layout}")
+    logger.info("Converting feedback tables to week-partitioned tables")
+    convert_to_partitioned(engine)
+
+
+def drop_partitions_before(db: Session, before_key: int) -> Dict[str, List[int]]:
+    """
+    Retention: drop every partition whose weeks all precede `before_key`
+
+    Runs in `db`'s transaction: the rollups of the dropped weeks (ROLLUP_TABLES)
+    are deleted and their data versions bumped along with the partitions;
+    the caller commits, then invalidates the weeks (`invalidate_weeks`).
+    Returns the dropped partition names with the week keys they cover.
+    """
+    connection = db.connection()
+    if not partitioning_enabled(connection):
+        return {}
+    dropped: Dict[str, List[int]] = {}
+    expired = [
+        (name[len(Feedback.__tablename__) + 1:], lower, upper)
+        for name, lower, upper in partition_bounds(connection, Feedback.__tablename__)
+        if upper <= before_key
+    ]
+    for suffix, lower, upper in expired:
+        # Every week the bounds cover, held rows or not: a reader may have cached any of them
+        keys, key = [], lower
+        while key < upper:
+            keys.append(key)
+            key = shift_week_key(key, 1)
+        # Referencing tables first: a referenced partition detaches only once nothing points at it
+        for table, _ in reversed(PARTITIONED_TABLES):
+            connection.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {table.name}_{suffix}"))
+            connection.execute(text(f"DROP TABLE {table.name}_{suffix}"))
+        for table in ROLLUP_TABLES:
+            connection.execute(
+                text(f"DELETE FROM {table.name} WHERE week_key >= :lower AND week_key < :upper"),
+                {"lower": lower, "upper": upper}
+            )
+        dropped[f"{Feedback.__tablename__}_{suffix}"] = keys
+        bump_week_versions(db, keys)
+        logger.info(f"Dropped partition {suffix} and its rollups (week keys {lower} to {upper}, exclusive)")
+    return dropped
@@ -0,0 +1,44 @@
+"""
+Atomic counter upserts (INSERT ... ON CONFLICT DO UPDATE)
+"""
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+
+
+def increment_rows(
+    db: Session,
+    model,
+    key_columns: List[str],
+    measure_columns: List[str],
+    cells: Dict[tuple, List[int]],
+    values: Optional[Dict[str, object]] = None
+) -> None:
+    """
+    Add `cells` (key values -> measure increments) to a counter table with atomic upserts (the caller commits)
+
+    `values` are other columns written as given, on insert and on update.
+    """
+    if not cells:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"{model.__tablename__} needs INSERT ... ON CONFLICT, which {dialect} lacks")
+
+    values = values or {}
+    statement = insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={
+            **{column: getattr(model, column) + statement.excluded[column] for column in measure_columns},
+            **{column: statement.excluded[column] for column in values},
+        }
+    )
+    # Cells in key order: concurrent uploads lock shared cells in the same order and cannot deadlock
+    db.execute(statement, [
+        {**dict(zip(key_columns, cell)), **dict(zip(measure_columns, cells[cell])), **values}
+        for cell in sorted(cells)
+    ])
@@ -0,0 +1,67 @@
+"""
+Week normalization helpers
+
+Every week is identified by an integer ISO week key (YYYYWW, e.g. 202441).
+Week boundaries are always the ISO Monday 00:00 of the wall-clock date,
+regardless of how the date was supplied or which timezone it carries.
+"""
+from datetime import datetime, date, timedelta
+from typing import List, Optional, Union
+
+
+def week_key(value: Union[datetime, date]) -> int:
+    """Get the ISO week key (YYYYWW) for a date or datetime"""
+    iso_year, iso_week, _ = value.isocalendar()
+    return iso_year * 100 + iso_week
+
+
+def week_start_from_key(key: int) -> datetime:
+    """Get the Monday 00:00 (naive) that starts the week identified by `key`"""
+    return datetime.fromisocalendar(key // 100, key % 100, 1)
+
+
+def normalize_week_start(value: Union[datetime, date]) -> datetime:
+    """Get the Monday 00:00 (naive) of the ISO week containing `value`"""
+    return week_start_from_key(week_key(value))
+
+
+def current_week_start() -> datetime:
+    """Get the Monday 00:00 of the current week"""
+    return normalize_week_start(datetime.now())
+
+
+def shift_week_key(key: int, weeks: int) -> int:
+    """Move a week key forward (positive) or backward (negative) by whole weeks"""
+    return week_key(week_start_from_key(key) + timedelta(weeks=weeks))
+
+
+def week_keys_back(key: int, weeks_back: int) -> List[int]:
+    """Get `weeks_back` week keys ending with `key`, newest first"""
+    start = week_start_from_key(key)
+    return [week_key(start - timedelta(weeks=i)) for i in range(max(weeks_back, 0))]
+
+
+def parse_week_start(value: Optional[str], strict: bool = False) -> datetime:
+    """
+    Parse a week_start query value into the normalized week start
+
+    Accepts ISO datetimes (with or without a trailing Z) and YYYY-MM-DD.
+    Missing values default to the current week. Unparseable values also
+    default to the current week unless `strict` is set, in which case a
+    ValueError is raised.
+    """
+    if not value:
+        return current_week_start()
+
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            if strict:
+                raise ValueError("Invalid week_start format. Use ISO format or YYYY-MM-DD")
+            return current_week_start()
+
+    # Use the wall-clock date so "2024-10-07T00:00:00+05:30" stays in the week of Oct 07
+    return normalize_week_start(parsed.replace(tzinfo=None))
@@ -0,0 +1,3 @@
+"""
+Performance benchmarks (run from backend/, e.g. `python -m benchmarks.dashboard`)
+"""
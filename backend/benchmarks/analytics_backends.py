@@ -0,0 +1,131 @@
+"""
+Analytics backend benchmark: ORM rows vs columnar frames vs DuckDB
+
+Times the aggregations behind the trend (8-week series), heatmap (one
+week) and lifecycle endpoints on synthetic databases of increasing size.
+The "orm" column is the row-by-row path the endpoints used before the
+fact table: load Feedback objects with their sentiment and categories and
+count in Python.
+
+Usage (from backend/):
+    python -m benchmarks.analytics_backends --rows 10000 100000 1000000
+"""
+from typing import Callable, Dict, List
+from pathlib import Path
+import argparse
+import tempfile
+from sqlalchemy.orm import Session, sessionmaker, selectinload
+from app.core.config import settings
+from app.models.feedback import Feedback
+from app.services import duckdb_analytics
+from app.services.columnar_analytics import ColumnarAnalytics, week_frame_cache
+from app.utils.weeks import week_keys_back, week_start_from_key
+from benchmarks.common import create_database, populate, time_call, print_table, median_ms
+
+
+def orm_week(db: Session, key: int) -> Dict:
+    """Per-row aggregation of one week, as the endpoints did before the fact table"""
+    feedback_list = db.query(Feedback).options(
+        selectinload(Feedback.sentiment_analysis),
+        selectinload(Feedback.category_mappings)
+    ).filter(Feedback.week_key == key).all()
+
+    counts = {"positive": 0, "neutral": 0, "negative": 0}
+    categories = {}
+    for feedback in feedback_list:
+        if not feedback.sentiment_analysis:
+            continue
+        sentiment = feedback.sentiment_analysis.sentiment_category.value
+        counts[sentiment] += 1
+        for mapping in feedback.category_mappings:
+            category = categories.setdefault(mapping.category.value, {"positive": 0, "neutral": 0, "negative": 0})
+            category[sentiment] += 1
+    return {"volume": len(feedback_list), "counts": counts, "categories": categories}
+
+
+def orm_lifecycle(db: Session, key: int) -> Dict:
+    stages = {}
+    for feedback in db.query(Feedback).options(
+        selectinload(Feedback.sentiment_analysis)
+    ).filter(Feedback.week_key == key).all():
+        stage = feedback.trainee_stage.value if feedback.trainee_stage else "unknown"
+        if feedback.sentiment_analysis:
+            counts = stages.setdefault(stage, {"positive": 0, "neutral": 0, "negative": 0})
+            counts[feedback.sentiment_analysis.sentiment_category.value] += 1
+    return stages
+
+
+def run(rows: int, weeks: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database(Path(directory) / "bench.db")
+        newest_key = populate(engine, rows, weeks)
+        week_start = week_start_from_key(newest_key)
+        db = sessionmaker(bind=engine)()
+
+        backends: Dict[str, Dict[str, Callable[[], object]]] = {
+            "orm": {
+                "series (8 weeks)": lambda: [orm_week(db, key) for key in week_keys_back(newest_key, 8)],
+                "heatmap (1 week)": lambda: orm_week(db, newest_key),
+                "lifecycle (1 week)": lambda: orm_lifecycle(db, newest_key),
+            },
+        }
+
+        columnar = ColumnarAnalytics(db)
+        for label, setup in (("columnar cold", week_frame_cache.clear), ("columnar warm", None)):
+            backends[label] = {
+                "series (8 weeks)": (setup, lambda: columnar.series(week_start, 8)),
+                "heatmap (1 week)": (setup, lambda: columnar.series(week_start, 1)),
+                "lifecycle (1 week)": (setup, lambda: columnar.stage_sentiment(week_start)),
+            }
+
+        if duckdb_analytics.duckdb_available():
+            settings.ANALYTICS_SNAPSHOT_DIR = str(Path(directory) / "snapshots")
+            exported = time_call(lambda: duckdb_analytics.refresh_snapshots(db), 1)
+            print(f"Exported Parquet snapshots of {weeks} weeks in {median_ms(exported)} ms")
+
+            for source in ("sqlite", "parquet"):
+                settings.ANALYTICS_DUCKDB_SOURCE = source
+                duck = duckdb_analytics.DuckDBAnalytics(db)
+                try:
+                    duck.series(week_start, 1)
+                except Exception as e:  # e.g. the sqlite extension cannot be installed offline
+                    print(f"Skipping duckdb ({source}): {e}")
+                    continue
+                backends[f"duckdb {source}"] = {
+                    "series (8 weeks)": lambda duck=duck: duck.series(week_start, 8),
+                    "heatmap (1 week)": lambda duck=duck: duck.series(week_start, 1),
+                    "lifecycle (1 week)": lambda duck=duck: duck.stage_sentiment(week_start),
+                }
+        else:
+            print("duckdb is not installed; skipping the DuckDB backend")
+
+        operations = list(backends["orm"])
+        results: List[List] = []
+        for label, calls in backends.items():
+            row = [label]
+            for operation in operations:
+                call = calls[operation]
+                setup = None
+                if isinstance(call, tuple):
+                    setup, call = call
+                row.append(median_ms(time_call(call, repeat, setup=setup)))
+            results.append(row)
+
+        print_table(f"{rows:,} rows over {weeks} weeks (median of {repeat}, ms)", ["backend", *operations], results)
+        db.close()
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.weeks, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
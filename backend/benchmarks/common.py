@@ -0,0 +1,235 @@
+"""
+Shared helpers for the benchmarks: synthetic data, an authenticated client and timing
+"""
+from typing import Callable, Dict, List, Optional
+from datetime import timedelta
+from pathlib import Path
+import csv
+import random
+import statistics
+import time
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.core.database import Base, get_db, async_database_url, SessionLocal, ReadSessionLocal
+from app.main import app
+from app.api.v1.endpoints.auth import get_current_user
+from app.models.user import User, UserRole
+from app.models.feedback import (
+    Feedback, SentimentAnalysis, CategoryMapping, SentimentCategory, EmotionalTone, FeedbackCategory
+)
+from app.models.analytics import (
+    AnalyticsBatch, AnalyticsLocation, FeedbackFact, KeywordCount, SENTIMENT_CODES, TONE_CODES, CATEGORY_CODES,
+    category_mask
+)
+from app.ml.sentiment_analyzer import sentiment_analyzer
+from app.ml.category_mapper import category_mapper
+from app.services.columnar_analytics import week_frame_cache
+from app.services.feedback_cube import rebuild_cube
+from app.services.feedback_ingestor import keyword_flags
+from app.utils.weeks import current_week_start, week_key
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+INSERT_CHUNK = 20000
+LOCATIONS = ["Bangalore", "Chennai", "Hyderabad", "Pune"]
+
+
+def sample_texts() -> List[str]:
+    """Feedback texts from the sample CSVs shipped with the repository"""
+    texts = []
+    for path in sorted(REPO_ROOT.glob("sample_l1_feedback*.csv")):
+        with open(path, newline="", encoding="utf-8") as handle:
+            texts.extend(row["open_text"] for row in csv.DictReader(handle))
+    return texts
+
+
+def score_texts(texts: List[str]) -> List[Dict]:
+    """Run the real sentiment and category pipeline once per distinct text"""
+    scored = []
+    for text in texts:
+        sentiment = sentiment_analyzer.analyze(text)
+        tone = sentiment_analyzer.detect_emotional_tone(text, sentiment["sentiment"])
+        scored.append({
+            "text": text,
+            "sentiment": SentimentCategory(sentiment["sentiment"]),
+            "tone": EmotionalTone(tone) if tone else None,
+            "confidence": sentiment["confidence"],
+            "scores": sentiment["scores"],
+            "categories": category_mapper.map_categories(text),
+            "flags": keyword_flags(text),
+        })
+    return scored
+
+
+def create_database(path: Path) -> Engine:
+    """Create an empty SQLite database with the application schema"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def populate(engine: Engine, rows: int, weeks: int = 52, batches: int = 12, seed: int = 7) -> int:
+    """
+    Bulk-insert `rows` synthetic feedback spread over the `weeks` weeks ending
+    with the current week, with sentiment, categories, analytics facts, the
+    feedback cube and keyword counts.
+
+    Returns the week key of the newest week.
+    """
+    rng = random.Random(seed)
+    scored = score_texts(sample_texts())
+    newest = current_week_start()
+    week_starts = [newest - timedelta(weeks=offset) for offset in range(weeks)]
+    batch_names = [f"L1-BENCH-{index:02d}" for index in range(batches)]
+
+    with engine.begin() as conn:
+        conn.execute(AnalyticsBatch.__table__.insert(), [
+            {"id": index + 1, "name": name} for index, name in enumerate(batch_names)
+        ])
+        conn.execute(AnalyticsLocation.__table__.insert(), [
+            {"id": index + 1, "name": name} for index, name in enumerate(LOCATIONS)
+        ])
+
+    feedback_id = 0
+    mapping_id = 0
+    keyword_counts = {}
+    while feedback_id < rows:
+        feedback_rows, sentiment_rows, mapping_rows, fact_rows = [], [], [], []
+        for _ in range(min(INSERT_CHUNK, rows - feedback_id)):
+            feedback_id += 1
+            item = rng.choice(scored)
+            week_start = rng.choice(week_starts)
+            batch = rng.randrange(batches)
+            location = rng.randrange(len(LOCATIONS))
+            rating = rng.randint(1, 5)
+
+            feedback_rows.append({
+                "id": feedback_id,
+                "trainee_id": f"B{feedback_id:07d}",
+                "location": LOCATIONS[location],
+                "training_batch": batch_names[batch],
+                "week_start_date": week_start,
+                "week_end_date": week_start + timedelta(days=6),
+                "week_key": week_key(week_start),
+                "rating_score": rating,
+                "open_text": item["text"],
+            })
+            sentiment_rows.append({
+                "id": feedback_id,
+                "feedback_id": feedback_id,
+                "week_key": week_key(week_start),
+                "sentiment_category": item["sentiment"],
+                "emotional_tone": item["tone"],
+                "confidence_score": item["confidence"],
+                "raw_sentiment_scores": item["scores"],
+            })
+            for mapping in item["categories"]:
+                mapping_id += 1
+                mapping_rows.append({
+                    "id": mapping_id,
+                    "feedback_id": feedback_id,
+                    "week_key": week_key(week_start),
+                    "category": FeedbackCategory(mapping["category"]),
+                    "relevance_score": mapping["relevance_score"],
+                    "keywords_matched": mapping["keywords_matched"],
+                })
+                for keyword in mapping["keywords_matched"]:
+                    cell = (
+                        week_key(week_start), batch + 1, location + 1,
+                        CATEGORY_CODES[FeedbackCategory(mapping["category"])], int(SENTIMENT_CODES[item["sentiment"]]),
+                        keyword
+                    )
+                    keyword_counts[cell] = keyword_counts.get(cell, 0) + 1
+            fact_rows.append({
+                "feedback_id": feedback_id,
+                "week_key": week_key(week_start),
+                "batch_id": batch + 1,
+                "location_id": location + 1,
+                "sentiment_code": int(SENTIMENT_CODES[item["sentiment"]]),
+                "tone_code": TONE_CODES[item["tone"]] if item["tone"] else 0,
+                "stage_code": 0,
+                "category_mask": category_mask(mapping["category"] for mapping in item["categories"]),
+                "keyword_flags": item["flags"],
+                "rating_score": rating,
+            })
+
+        with engine.begin() as conn:
+            conn.execute(Feedback.__table__.insert(), feedback_rows)
+            conn.execute(SentimentAnalysis.__table__.insert(), sentiment_rows)
+            if mapping_rows:
+                conn.execute(CategoryMapping.__table__.insert(), mapping_rows)
+            conn.execute(FeedbackFact.__table__.insert(), fact_rows)
+
+    with engine.begin() as conn:
+        conn.execute(KeywordCount.__table__.insert(), [
+            {
+                "week_key": cell[0], "batch_id": cell[1], "location_id": cell[2], "category_code": cell[3],
+                "sentiment_code": cell[4], "keyword": cell[5], "mention_count": count,
+            }
+            for cell, count in keyword_counts.items()
+        ])
+    with Session(engine) as db:
+        rebuild_cube(db)
+
+    return week_key(newest)
+
+
+def use_database(engine: Engine) -> None:
+    """Point the API (request sessions and executor sessions) at `engine`'s database, authenticated as an admin"""
+    SessionLocal.configure(bind=engine)
+    ReadSessionLocal.configure(bind=engine)
+    session_factory = async_sessionmaker(
+        create_async_engine(async_database_url(engine.url.render_as_string(hide_password=False))),
+        autoflush=False, expire_on_commit=False
+    )
+
+    async def get_benchmark_db():
+        async with session_factory() as db:
+            yield db
+
+    admin = User(id=0, email="bench@example.com", full_name="Benchmark", role=UserRole.ADMIN, is_active=True)
+    app.dependency_overrides[get_db] = get_benchmark_db
+    app.dependency_overrides[get_current_user] = lambda: admin
+    week_frame_cache.clear()
+
+
+def benchmark_client(engine: Engine) -> TestClient:
+    """API client bound to `engine`, authenticated as an admin (startup hooks are skipped)"""
+    use_database(engine)
+    return TestClient(app)
+
+
+def time_call(call: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """Run `call` `repeat` times and return the durations in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        call()
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def print_table(title: str, header: List[str], rows: List[List]) -> None:
+    """Print a fixed-width results table"""
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    print(f"\n{title}")
+    print("  ".join(str(value).ljust(width) for value, width in zip(header, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)))
+
+
+def median_ms(durations: List[float]) -> str:
+    return f"{statistics.median(durations):.1f}"
+
+
+def percentile(values: List[float], fraction: float) -> str:
+    """Percentile (0-1) of durations in milliseconds, formatted like median_ms"""
+    if len(values) < 2:
+        return f"{values[0]:.1f}" if values else "-"
+    cut_points = statistics.quantiles(values, n=100, method="inclusive")
+    return f"{cut_points[int(fraction * 100) - 1]:.1f}"
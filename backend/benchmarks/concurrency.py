@@ -0,0 +1,108 @@
+"""
+Mixed-load concurrency benchmark
+
+Drives the API from a single event loop, as one uvicorn worker would, with
+heavy clients (insights, which is not served from the response cache here)
+and light clients (report list, sync status) running side by side. Light
+request latency and event loop lag (sampled every 10 ms) while heavy
+requests are in flight show how long the loop is held by work that should
+not block it.
+
+Usage (from backend/):
+    python -m benchmarks.concurrency --rows 100000 --heavy 0 2 8 --light 4
+"""
+from typing import Dict, List
+from pathlib import Path
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+import httpx
+from app.core.config import settings
+from app.core.loop_lag import LoopLagMonitor
+from app.main import app
+from app.utils.weeks import week_keys_back, week_start_from_key
+from benchmarks.common import create_database, populate, use_database, print_table, percentile
+
+HEAVY_PATHS = ["/api/v1/analysis/insights"]
+LIGHT_PATHS = ["/api/v1/reports/weekly", "/api/v1/sync/status"]
+
+
+async def client_loop(client: httpx.AsyncClient, paths: List[str], weeks: List[str],
+                      deadline: float, latencies: List[float], seed: int) -> None:
+    """Issue requests back to back until `deadline`, recording latencies in milliseconds"""
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(rng.choice(paths), params={"week_start": rng.choice(weeks)})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def mixed_load(heavy: int, light: int, duration: float, weeks: List[str]) -> Dict:
+    latencies: Dict[str, List[float]] = {"heavy": [], "light": []}
+    monitor = LoopLagMonitor(interval_ms=10, window=100000)
+    monitor.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(client_loop(client, HEAVY_PATHS, weeks, deadline, latencies["heavy"], seed) for seed in range(heavy)),
+            *(client_loop(client, LIGHT_PATHS, weeks, deadline, latencies["light"], seed) for seed in range(light)),
+        )
+    await monitor.stop()
+    return {**latencies, "lag": monitor.stats()}
+
+
+def run(rows: int, weeks: int, heavy_levels: List[int], light: int, duration: float) -> None:
+    # Every heavy request computes its response
+    settings.RESPONSE_CACHE_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database(Path(directory) / "bench.db")
+        newest_key = populate(engine, rows, weeks)
+        use_database(engine)
+        week_params = [
+            week_start_from_key(key).date().isoformat() for key in week_keys_back(newest_key, min(weeks, 8))
+        ]
+
+        results = []
+        for heavy in heavy_levels:
+            latencies = asyncio.run(mixed_load(heavy, light, duration, week_params))
+            lag = latencies["lag"]
+            results.append([
+                heavy,
+                f"{len(latencies['heavy']) / duration:.1f}",
+                f"{len(latencies['light']) / duration:.1f}",
+                percentile(latencies["light"], 0.5),
+                percentile(latencies["light"], 0.95),
+                f"{max(latencies['light'], default=0):.1f}",
+                lag.get("p99_ms", "-"),
+                lag.get("max_ms", "-"),
+            ])
+
+        print_table(
+            f"{rows:,} rows, {light} light clients, {duration:.0f}s per run",
+            ["heavy clients", "heavy req/s", "light req/s", "light p50 ms", "light p95 ms", "light max ms",
+             "loop lag p99 ms", "loop lag max ms"],
+            results
+        )
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--heavy", type=int, nargs="+", default=[0, 2, 8])
+    parser.add_argument("--light", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.weeks, args.heavy, args.light, args.duration)
+
+
+if __name__ == "__main__":
+    main()
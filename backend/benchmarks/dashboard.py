@@ -0,0 +1,86 @@
+"""
+Dashboard endpoint latency benchmark
+
+Builds a synthetic SQLite database per size and times every dashboard
+read endpoint for the newest week with each analytics backend
+(ANALYTICS_BACKEND, pinned per run), cold (week frame cache cleared before
+each call) and warm (frames already cached). The response cache is off
+while timing, so every call reaches the backend.
+
+Usage (from backend/):
+    python -m benchmarks.dashboard --rows 10000 1000000 --backends cube columnar
+"""
+from typing import List
+from pathlib import Path
+import argparse
+import tempfile
+import time
+from app.core.config import settings
+from app.services.analytics_backend import ANALYTICS_BACKENDS
+from app.services.columnar_analytics import week_frame_cache
+from app.services.response_cache import response_cache
+from app.utils.weeks import week_start_from_key
+from benchmarks.common import create_database, populate, benchmark_client, time_call, print_table, median_ms
+
+ENDPOINTS = [
+    ("GET", "/api/v1/analysis/trends"),
+    ("GET", "/api/v1/analysis/insights"),
+    ("GET", "/api/v1/analysis/category-trends"),
+    ("GET", "/api/v1/analysis/8-week-trends"),
+    ("GET", "/api/v1/analysis/category-heatmap"),
+    ("GET", "/api/v1/analysis/lifecycle"),
+]
+
+
+def clear_caches() -> None:
+    week_frame_cache.clear()
+    response_cache.clear()
+
+
+def run(rows: int, weeks: int, repeat: int, backends: List[str]) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database(Path(directory) / "bench.db")
+        started = time.perf_counter()
+        newest_key = populate(engine, rows, weeks)
+        print(f"\nLoaded {rows:,} feedback rows over {weeks} weeks in {time.perf_counter() - started:.1f}s")
+
+        client = benchmark_client(engine)
+        params = {"week_start": week_start_from_key(newest_key).date().isoformat()}
+
+        results = []
+        configured = settings.ANALYTICS_BACKEND, settings.RESPONSE_CACHE_ENABLED
+        settings.RESPONSE_CACHE_ENABLED = False
+        try:
+            for backend in backends:
+                settings.ANALYTICS_BACKEND = backend
+                clear_caches()
+                for method, path in ENDPOINTS:
+                    def call():
+                        response = client.request(method, path, params=params)
+                        response.raise_for_status()
+
+                    cold = time_call(call, repeat, setup=clear_caches)
+                    warm = time_call(call, repeat)
+                    results.append([backend, f"{method} {path}", median_ms(cold), median_ms(warm)])
+        finally:
+            settings.ANALYTICS_BACKEND, settings.RESPONSE_CACHE_ENABLED = configured
+            clear_caches()
+
+        print_table(f"{rows:,} rows (median of {repeat}, ms)", ["backend", "endpoint", "cold", "warm"], results)
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", choices=ANALYTICS_BACKENDS, default=["cube", "columnar"])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.weeks, args.repeat, args.backends)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Plain vs week-partitioned feedback tables on PostgreSQL
+
+Loads the same synthetic data into plain tables and into week-partitioned
+tables (app.utils.partitioning), then times cold hot-week analytics (the
+8-week series from feedback_facts), loading one week's feedback with its
+sentiment and categories, and retention of the oldest period (DELETE
+versus dropping partitions).
+
+Needs a PostgreSQL server. Use a scratch database: the application tables
+in it are dropped and recreated for each layout.
+
+Usage (from backend/):
+    python -m benchmarks.partitioning --url postgresql://postgres@localhost/feedback_bench --rows 1000000
+"""
+import argparse
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.core.database import Base, create_sync_engine
+from app.models.feedback import Feedback
+from app.services.columnar_analytics import ColumnarAnalytics, WeekFrameCache
+from app.utils.partitioning import (
+    PARTITIONED_TABLES, partition_feedback_tables, ensure_partitions, partition_period, drop_partitions_before,
+    same_week_loads
+)
+from app.utils.weeks import current_week_start, week_key, week_keys_back, week_start_from_key
+from benchmarks.common import populate, print_table, time_call, median_ms
+
+LAYOUTS = {"plain": False, "partitioned": True}
+
+
+def delete_before(db: Session, before_key: int) -> None:
+    for table, _ in reversed(PARTITIONED_TABLES):
+        db.execute(text(f"DELETE FROM {table.name} WHERE week_key < :key"), {"key": before_key})
+
+
+def run(url: str, rows: int, weeks: int, repeat: int) -> None:
+    results = []
+    for layout, partitioned in LAYOUTS.items():
+        settings.FEEDBACK_PARTITIONING = partitioned
+        engine = create_sync_engine(url)
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        partition_feedback_tables(engine)
+
+        newest_key = week_key(current_week_start())  # populate() ends with the current week
+        keys = week_keys_back(newest_key, weeks)
+        ensure_partitions(engine, keys)
+        started = time.perf_counter()
+        populate(engine, rows, weeks)
+        load_seconds = time.perf_counter() - started
+        with engine.begin() as connection:
+            for table, _ in PARTITIONED_TABLES:
+                connection.execute(text(f"ANALYZE {table.name}"))
+
+        week_start = week_start_from_key(newest_key)
+        with Session(bind=engine) as db:
+            series = time_call(lambda: ColumnarAnalytics(db, WeekFrameCache(8)).series(week_start, 8), repeat)
+            one_week = time_call(lambda: db.query(Feedback).options(
+                selectinload(Feedback.sentiment_analysis), selectinload(Feedback.category_mappings),
+                *same_week_loads(newest_key)
+            ).filter(Feedback.week_key == newest_key).all(), repeat, setup=db.expunge_all)
+
+            # Drop the oldest whole period in both layouts
+            cutoff = partition_period(keys[-1])[2]
+            started = time.perf_counter()
+            if partitioned:
+                drop_partitions_before(db, cutoff)
+            else:
+                delete_before(db, cutoff)
+            db.commit()
+            retention_ms = (time.perf_counter() - started) * 1000
+
+        results.append([
+            layout,
+            f"{rows / load_seconds:.0f}",
+            median_ms(series),
+            median_ms(one_week),
+            f"{retention_ms:.1f}",
+        ])
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+    print_table(
+        f"{rows:,} rows over {weeks} weeks, {settings.FEEDBACK_PARTITION_PERIOD} partitions, median of {repeat}",
+        ["layout", "load rows/s", "8-week series ms (cold)", "1 week + sentiment/categories ms",
+         "drop oldest period ms"],
+        results
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True, help="PostgreSQL URL of a scratch database")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(args.url, rows, args.weeks, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
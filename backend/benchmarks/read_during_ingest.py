@@ -0,0 +1,168 @@
+"""
+Read-during-ingest benchmark for the SQLite connection profile
+
+Ingests records through the real pipeline (FeedbackIngestor, committing
+once per upload-sized transaction) on a writer engine in a separate process,
+as a second worker would, while reader threads repeatedly load the last 8
+weeks of analytics facts (cold, as after an ingest invalidates the frame
+cache) on a reader engine. Compares SQLite's
+defaults (rollback journal, synchronous=FULL) with the tuned profile from
+app.core.database (WAL, synchronous=NORMAL, page cache, mmap, busy timeout,
+query-only readers).
+
+Usage (from backend/):
+    python -m benchmarks.read_during_ingest --rows 100000 --ingest 5000 --upload-size 1000
+"""
+from typing import Dict, List
+from pathlib import Path
+import argparse
+import multiprocessing
+import random
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.core.database import create_sync_engine
+from app.services.columnar_analytics import ColumnarAnalytics, WeekFrameCache
+from app.services.feedback_ingestor import FeedbackIngestor
+from app.utils.weeks import week_keys_back, week_start_from_key
+from benchmarks.common import LOCATIONS, create_database, populate, sample_texts, print_table, percentile
+
+
+def default_engines(url: str) -> Dict[str, Engine]:
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return {"writer": engine, "reader": engine}
+
+
+def tuned_engines(url: str) -> Dict[str, Engine]:
+    return {"writer": create_sync_engine(url), "reader": create_sync_engine(url, read_only=True)}
+
+
+PROFILES = {
+    "sqlite defaults": default_engines,
+    "tuned (WAL + pragmas)": tuned_engines,
+}
+
+
+def ingest(profile: str, url: str, records: List[Dict], upload_size: int, result: "multiprocessing.Queue") -> None:
+    """Writer process: ingest `records` in upload-sized transactions, report elapsed seconds and failed uploads"""
+    engine = PROFILES[profile](url)["writer"]
+    started = time.perf_counter()
+    failed = 0
+    db = Session(bind=engine, autoflush=False)
+    try:
+        for offset in range(0, len(records), upload_size):
+            ingestor = FeedbackIngestor(db)
+            try:
+                for record in records[offset:offset + upload_size]:
+                    ingestor.ingest(record)
+                ingestor.commit()
+            except OperationalError:  # "database is locked": the upload is lost
+                db.rollback()
+                failed += 1
+    finally:
+        db.close()
+        engine.dispose()
+    result.put((time.perf_counter() - started, failed))
+
+
+def read_loop(engine: Engine, week_start, done: threading.Event, latencies: List[float], errors: List[str]) -> None:
+    while not done.is_set():
+        db = Session(bind=engine)
+        started = time.perf_counter()
+        try:
+            ColumnarAnalytics(db, WeekFrameCache(8)).series(week_start, 8)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except OperationalError as e:
+            errors.append(str(e.orig))
+        finally:
+            db.close()
+
+
+def make_records(count: int, newest_key: int, seed: int = 11) -> List[Dict]:
+    rng = random.Random(seed)
+    texts = sample_texts()
+    week_starts = [week_start_from_key(key) for key in week_keys_back(newest_key, 2)]
+    return [{
+        "trainee_id": f"I{index:07d}",
+        "location": rng.choice(LOCATIONS),
+        "training_batch": f"L1-BENCH-{rng.randrange(12):02d}",
+        "rating_score": rng.randint(1, 5),
+        "open_text": rng.choice(texts),
+        "category_tags": None,
+        "week_start_date": rng.choice(week_starts),
+        "week_end_date": None,
+    } for index in range(count)]
+
+
+def run(rows: int, ingest_rows: int, upload_size: int, readers: int) -> None:
+    results = []
+    for profile, make_engines in PROFILES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "bench.db"
+            setup_engine = create_database(path)
+            newest_key = populate(setup_engine, rows)
+            setup_engine.dispose()
+
+            url = f"sqlite:///{path}"
+            reader = make_engines(url)["reader"]
+            records = make_records(ingest_rows, newest_key)
+            week_start = week_start_from_key(newest_key)
+
+            context = multiprocessing.get_context("spawn")
+            ingest_result = context.Queue()
+            writer = context.Process(target=ingest, args=(profile, url, records, upload_size, ingest_result))
+            writer.start()
+
+            done = threading.Event()
+            latencies: List[float] = []
+            errors: List[str] = []
+            reader_threads = [
+                threading.Thread(target=read_loop, args=(reader, week_start, done, latencies, errors))
+                for _ in range(readers)
+            ]
+            for thread in reader_threads:
+                thread.start()
+            ingest_seconds, failed_uploads = ingest_result.get()
+            writer.join()
+            done.set()
+            for thread in reader_threads:
+                thread.join()
+
+            results.append([
+                profile,
+                f"{ingest_rows / ingest_seconds:.0f}",
+                len(latencies),
+                percentile(latencies, 0.5),
+                percentile(latencies, 0.95),
+                f"{max(latencies, default=0):.1f}",
+                len(errors),
+                failed_uploads,
+            ])
+            reader.dispose()
+
+    print_table(
+        f"{rows:,} rows, ingesting {ingest_rows:,} in uploads of {upload_size:,}, {readers} readers",
+        ["profile", "ingest rows/s", "reads", "read p50 ms", "read p95 ms", "read max ms", "read errors",
+         "failed uploads"],
+        results
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--ingest", type=int, default=5000)
+    parser.add_argument("--upload-size", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=2)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.ingest, args.upload_size, args.readers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Full-text search benchmark: text index vs LIKE scans
+
+Loads synthetic feedback, builds the search index (FTS5 on SQLite, a GIN
+tsvector index on PostgreSQL; app.services.feedback_search) and times
+search_feedback for missing, rare and common words, an `or` query, a
+phrase, a filtered query, a deep page and newest-first sorting. The "like"
+column is the scan the index replaces: the newest page of `open_text LIKE
+'%word%'`, unranked, which is quick for common words and reads the whole
+table when few rows match. Relevance ranking scores every match, so its
+cost grows with how common the words are.
+
+Usage (from backend/):
+    python -m benchmarks.search --rows 1000000
+    python -m benchmarks.search --url postgresql://postgres@localhost/feedback_bench --rows 1000000
+"""
+from typing import Optional
+from pathlib import Path
+import argparse
+import tempfile
+import time
+from sqlalchemy import or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.database import Base, create_sync_engine
+from app.models.feedback import Feedback
+from app.services.analytics_scope import AnalyticsScope, ALL_FEEDBACK
+from app.services.feedback_search import create_search_index, search_feedback
+from app.utils.weeks import current_week_start, shift_week_key, week_key
+from benchmarks.common import create_database, populate, print_table, time_call, median_ms
+
+PAGE_SIZE = 20
+DEEP_PAGES = 10
+
+
+def like_page(db: Session, words, week_from: Optional[int] = None, batch: Optional[str] = None) -> list:
+    """One page of feedback containing any of `words`, by scanning the texts"""
+    query = select(Feedback.id).where(or_(*(Feedback.open_text.ilike(f"%{word}%") for word in words)))
+    if week_from is not None:
+        query = query.where(Feedback.week_key >= week_from)
+    if batch is not None:
+        query = query.where(Feedback.training_batch == batch)
+    return db.execute(query.order_by(Feedback.id.desc()).limit(PAGE_SIZE + 1)).all()
+
+
+def deep_page(db: Session, query: str) -> list:
+    """Page DEEP_PAGES of `query`, following the cursors"""
+    cursor = None
+    for _ in range(DEEP_PAGES):
+        rows = search_feedback(db, query, cursor=cursor, limit=PAGE_SIZE)
+        if len(rows) <= PAGE_SIZE:
+            return rows
+        cursor = (rows[PAGE_SIZE - 1]["score"], rows[PAGE_SIZE - 1]["id"])
+    return rows
+
+
+def run(engine: Engine, rows: int, weeks: int, repeat: int) -> None:
+    started = time.perf_counter()
+    populate(engine, rows, weeks)
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    create_search_index(engine)
+    index_seconds = time.perf_counter() - started
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text(f"ANALYZE {Feedback.__tablename__}"))
+
+    recent_from = shift_week_key(week_key(current_week_start()), -3)  # populate() ends with the current week
+    batch = "L1-BENCH-03"
+    cases = [
+        ("no match", "kubernetes", {}, ["kubernetes"], {}),
+        ("rare word", "java", {}, ["java"], {}),
+        ("common word", "trainer", {}, ["trainer"], {}),
+        ("or", "network or hardware", {}, ["network", "hardware"], {}),
+        ("phrase", '"technical issues"', {}, ["technical issues"], {}),
+        ("4 weeks, 1 batch", "mentor", {"week_from": recent_from, "scope": AnalyticsScope([batch])},
+         ["mentor"], {"week_from": recent_from, "batch": batch}),
+        ("newest first", "trainer", {"sort": "recent"}, ["trainer"], {}),
+    ]
+
+    results = []
+    with Session(bind=engine) as db:
+        for label, query, options, words, like_options in cases:
+            options.setdefault("scope", ALL_FEEDBACK)
+            matches = len(search_feedback(db, query, limit=PAGE_SIZE, **options))
+            indexed = time_call(lambda: search_feedback(db, query, limit=PAGE_SIZE, **options), repeat)
+            scanned = time_call(lambda: like_page(db, words, **like_options), repeat)
+            results.append([label, query, min(matches, PAGE_SIZE), median_ms(indexed), median_ms(scanned)])
+        deep = time_call(lambda: deep_page(db, "trainer"), repeat)
+        results.append([f"page {DEEP_PAGES}", "trainer", PAGE_SIZE, median_ms(deep), "-"])
+
+    print_table(
+        f"{rows:,} rows over {weeks} weeks on {engine.dialect.name}: loaded at {rows / load_seconds:.0f} rows/s, "
+        f"index built in {index_seconds:.1f}s, median of {repeat}",
+        ["query", "text", "rows", "index ms", "like ms"],
+        results
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="PostgreSQL URL of a scratch database (default: a temporary SQLite file)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        if args.url:
+            engine = create_sync_engine(args.url)
+            Base.metadata.drop_all(bind=engine)
+            Base.metadata.create_all(bind=engine)
+            run(engine, rows, args.weeks, args.repeat)
+            Base.metadata.drop_all(bind=engine)
+            engine.dispose()
+            continue
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_database(Path(directory) / "bench.db")
+            run(engine, rows, args.weeks, args.repeat)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Shared fixtures: the API over a scratch SQLite database holding the sample feedback
+"""
+from pathlib import Path
+import os
+import tempfile
+
+# Settings are read when app is first imported: point every path at a scratch directory before that
+DATA_DIR = tempfile.mkdtemp(prefix="feedback-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DATA_DIR}/feedback.db",
+    "UPLOAD_DIR": f"{DATA_DIR}/uploads",
+    "ARCHIVE_DIR": f"{DATA_DIR}/archive",
+    "SEMANTIC_INDEX_DIR": f"{DATA_DIR}/semantic_index",
+    "ANALYTICS_SNAPSHOT_DIR": f"{DATA_DIR}/analytics_snapshots",
+    "EXECUTOR_PDF_PROCESSES": "false",
+    "RESPONSE_CACHE_REDIS": "false",
+})
+os.environ.pop("ANALYTICS_DATABASE_URL", None)
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.database import SessionLocal
+from app.models.analytics import FeedbackFact
+
+SAMPLE_DIR = Path(__file__).resolve().parents[2]
+SAMPLE_FILES = ["sample_l1_feedback_8weeks.csv", "sample_l1_feedback_week2.csv", "sample_l1_feedback.csv"]
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/v1/auth/login", data={"username": "admin@example.com", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def ingested(client, auth_headers):
+    """Week keys of the sample feedback, uploaded once per session (one ingest per file)"""
+    for name in SAMPLE_FILES:
+        with open(SAMPLE_DIR / name, "rb") as file:
+            response = client.post(
+                "/api/v1/feedback/upload", files={"file": (name, file, "text/csv")}, headers=auth_headers
+            )
+        assert response.status_code == 200, response.text
+    db = SessionLocal()
+    try:
+        return sorted(key for (key,) in db.query(FeedbackFact.week_key).distinct())
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,41 @@
+"""
+Cached week frames are keyed on the week's data version
+"""
+from app.models.analytics import FeedbackFact
+from app.services.columnar_analytics import ColumnarAnalytics, WeekFrameCache
+from app.services.data_versions import bump_week_versions
+from app.utils.weeks import week_start_from_key
+
+STRAY_FEEDBACK_ID = 10 ** 9
+
+
+def test_frames_are_reused_until_the_week_version_changes(ingested, db):
+    analytics = ColumnarAnalytics(db, WeekFrameCache(8))
+    key = ingested[-1]
+    frame = analytics.frames([key])[key]
+    assert analytics.frames([key])[key] is frame
+
+    bump_week_versions(db, [key])
+    db.commit()
+    assert analytics.frames([key])[key] is not frame
+
+
+def test_a_write_from_another_process_is_seen(ingested, db):
+    analytics = ColumnarAnalytics(db, WeekFrameCache(8))
+    key = ingested[-1]
+    volume = analytics.series(week_start_from_key(key), 1)[0]["volume"]
+
+    # What another process's ingest leaves behind: a new fact and a bumped version, no in-process invalidation
+    template = db.query(FeedbackFact).filter(FeedbackFact.week_key == key).first()
+    db.add(FeedbackFact(
+        feedback_id=STRAY_FEEDBACK_ID, week_key=key, batch_id=template.batch_id, location_id=template.location_id,
+        sentiment_code=template.sentiment_code, category_mask=0, keyword_flags=0
+    ))
+    bump_week_versions(db, [key])
+    db.commit()
+    try:
+        assert analytics.series(week_start_from_key(key), 1)[0]["volume"] == volume + 1
+    finally:
+        db.query(FeedbackFact).filter(FeedbackFact.feedback_id == STRAY_FEEDBACK_ID).delete()
+        bump_week_versions(db, [key])
+        db.commit()
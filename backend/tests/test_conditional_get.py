@@ -0,0 +1,50 @@
+"""
+ETags of analysis and report responses follow the data versions of the weeks they read
+"""
+from app.services.data_versions import bump_week_versions
+from app.utils.weeks import week_start_from_key
+
+
+def test_analysis_etag_changes_with_the_week_version(client, auth_headers, ingested, db):
+    url = "/api/v1/analysis/trends"
+    params = {"week_start": week_start_from_key(ingested[-1]).date().isoformat()}
+
+    first = client.get(url, params=params, headers=auth_headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    cached = client.get(url, params=params, headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+    bump_week_versions(db, [ingested[-1]])
+    db.commit()
+    changed = client.get(url, params=params, headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json() == first.json()
+
+
+def test_analysis_etag_ignores_weeks_the_response_does_not_read(client, auth_headers, ingested, db):
+    url = "/api/v1/analysis/trends"  # Reads the week and the one before
+    params = {"week_start": week_start_from_key(ingested[-1]).date().isoformat()}
+    etag = client.get(url, params=params, headers=auth_headers).headers["ETag"]
+
+    bump_week_versions(db, [ingested[0]])
+    db.commit()
+    assert client.get(url, params=params, headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+
+def test_report_list_etag_changes_with_the_week_version(client, auth_headers, ingested, db):
+    generated = client.post(
+        "/api/v1/reports/weekly/generate",
+        params={"week_start": week_start_from_key(ingested[-1]).isoformat()}, headers=auth_headers
+    )
+    assert generated.status_code == 200
+    url = "/api/v1/reports/weekly"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+    assert client.get(url, headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+    bump_week_versions(db, [ingested[-1]])
+    db.commit()
+    assert client.get(url, headers={**auth_headers, "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,52 @@
+"""
+Workload slots stay taken until the work ends, whatever happens to the caller
+"""
+import asyncio
+import threading
+from app.core.executors import Workload
+
+
+def test_a_cancelled_caller_keeps_its_slot_until_the_work_ends():
+    release = threading.Event()
+
+    async def scenario():
+        workload = Workload("test", 1)
+        caller = asyncio.ensure_future(workload.run(release.wait))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.sleep(0.05)
+        assert workload.active == 1  # Still running on the pool
+
+        second = asyncio.ensure_future(workload.run(lambda: "second"))
+        await asyncio.sleep(0.05)
+        assert not second.done() and workload.waiting == 1
+
+        release.set()
+        assert await asyncio.wait_for(second, 5) == "second"
+        assert workload.stats()["active"] == 0 and workload.completed == 2
+        workload.shutdown()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()  # A failed assertion must not leave the worker blocked
+
+
+def test_a_failed_call_releases_its_slot():
+    async def scenario():
+        workload = Workload("test", 1)
+        try:
+            await workload.run(int, "not a number")
+        except ValueError:
+            pass
+        assert await asyncio.wait_for(workload.run(lambda: "next"), 5) == "next"
+        workload.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_runtime_health_requires_an_admin(client, auth_headers):
+    assert client.get("/health/runtime").status_code == 401
+    response = client.get("/health/runtime", headers=auth_headers)
+    assert response.status_code == 200
+    assert set(response.json()) == {"event_loop_lag", "executors", "pdf_jobs"}
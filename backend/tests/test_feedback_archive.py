@@ -0,0 +1,38 @@
+"""
+Parquet archive of a week's feedback round-trips every stored field
+"""
+from datetime import date
+import pytest
+from app.models.feedback import Feedback
+from app.services.feedback_archive import (
+    _archive_record, archive_week, is_archived, read_archived_week, week_feedback
+)
+from app.utils.weeks import week_key
+
+pytest.importorskip("pyarrow")
+
+ARCHIVED_WEEK = week_key(date(2024, 11, 18))  # sample_l1_feedback_week2.csv
+
+
+def test_archived_week_round_trips(ingested, db):
+    assert ARCHIVED_WEEK in ingested
+    hot = [_archive_record(item) for item in week_feedback(db, ARCHIVED_WEEK)]
+    db.expunge_all()
+
+    assert archive_week(db, ARCHIVED_WEEK) == len(hot)
+    assert is_archived(ARCHIVED_WEEK)
+    assert db.query(Feedback).filter(Feedback.week_key == ARCHIVED_WEEK).count() == 0
+
+    archived = read_archived_week(ARCHIVED_WEEK)
+    assert [_archive_record(item) for item in archived] == hot
+    assert all(item.sentiment_analysis is not None and item.category_mappings for item in archived)
+    # Readers of the week see the archived copy
+    assert [_archive_record(item) for item in week_feedback(db, ARCHIVED_WEEK)] == hot
+
+
+def test_archiving_an_archived_week_moves_nothing(ingested, db):
+    archive_week(db, ARCHIVED_WEEK)
+    before = len(read_archived_week(ARCHIVED_WEEK))
+
+    assert archive_week(db, ARCHIVED_WEEK) == 0
+    assert len(read_archived_week(ARCHIVED_WEEK)) == before
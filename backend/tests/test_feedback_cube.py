@@ -0,0 +1,59 @@
+"""
+The feedback cube maintained at ingest equals brute-force counts over the raw rows
+"""
+from collections import defaultdict
+from app.models.analytics import (
+    AnalyticsBatch, AnalyticsLocation, FeedbackCube, ALL_CATEGORIES, CATEGORY_CODES, SENTIMENT_CODES, STAGE_CODES
+)
+from app.services.feedback_archive import week_feedback
+from app.services.feedback_cube import CubeAnalytics, rebuild_cube
+from app.utils.weeks import week_start_from_key
+
+
+def brute_force_cube(db, keys):
+    """(week, batch, location, category, sentiment, stage) -> [feedback, rating sum, rated feedback]"""
+    cells = defaultdict(lambda: [0, 0, 0])
+    for key in keys:
+        for feedback in week_feedback(db, key):
+            sentiment = int(SENTIMENT_CODES[feedback.sentiment_analysis.sentiment_category])
+            stage = STAGE_CODES[feedback.trainee_stage] if feedback.trainee_stage else 0
+            codes = {ALL_CATEGORIES} | {CATEGORY_CODES[mapping.category] for mapping in feedback.category_mappings}
+            for code in codes:
+                counts = cells[(key, feedback.training_batch, feedback.location, code, sentiment, stage)]
+                counts[0] += 1
+                counts[1] += feedback.rating_score or 0
+                counts[2] += 1 if feedback.rating_score else 0
+    return dict(cells)
+
+
+def stored_cube(db, keys):
+    rows = db.query(
+        FeedbackCube.week_key, AnalyticsBatch.name, AnalyticsLocation.name, FeedbackCube.category_code,
+        FeedbackCube.sentiment_code, FeedbackCube.stage_code,
+        FeedbackCube.feedback_count, FeedbackCube.rating_sum, FeedbackCube.rating_count
+    ).join(AnalyticsBatch, AnalyticsBatch.id == FeedbackCube.batch_id).join(
+        AnalyticsLocation, AnalyticsLocation.id == FeedbackCube.location_id
+    ).filter(FeedbackCube.week_key.in_(keys))
+    return {tuple(row[:6]): list(row[6:]) for row in rows if row.feedback_count}
+
+
+def test_cube_matches_the_raw_rows(ingested, db):
+    assert stored_cube(db, ingested) == brute_force_cube(db, ingested)
+
+
+def test_cube_series_matches_the_raw_rows(ingested, db):
+    series = CubeAnalytics(db).series(week_start_from_key(ingested[-1]), len(ingested) + 2)
+    assert {week["week_key"] for week in series if week["volume"]} == set(ingested)
+    for week in series:
+        feedback = week_feedback(db, week["week_key"])
+        assert week["volume"] == len(feedback)
+        for sentiment in ("positive", "neutral", "negative"):
+            assert week[sentiment] == sum(
+                item.sentiment_analysis.sentiment_category.value == sentiment for item in feedback
+            )
+
+
+def test_rebuilt_cube_equals_the_incremental_one(ingested, db):
+    incremental = stored_cube(db, ingested)
+    rebuild_cube(db, ingested)
+    assert stored_cube(db, ingested) == incremental
@@ -0,0 +1,56 @@
+"""
+The SQLite full-text index follows inserts, updates and deletes of feedback
+"""
+from datetime import datetime
+import pytest
+from sqlalchemy import text
+from app.core.database import engine
+from app.models.feedback import Feedback
+from app.services.feedback_search import SEARCH_TABLE, search_feedback, search_supported
+from app.utils.weeks import week_key
+
+pytestmark = pytest.mark.skipif(
+    engine.dialect.name != "sqlite" or not search_supported(engine), reason="needs SQLite with FTS5"
+)
+
+
+def matching_ids(db, query):
+    return [row["id"] for row in search_feedback(db, query, limit=50)]
+
+
+def assert_index_in_sync(db):
+    # Raises if the index differs from feedback.open_text
+    db.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('integrity-check', 1)"))
+
+
+def test_index_follows_feedback_writes(ingested, db):
+    week_start = datetime(2024, 11, 25)
+    feedback = Feedback(
+        trainee_id="T900", location="Pune", training_batch="L1-2024-FTS", week_start_date=week_start,
+        week_end_date=datetime(2024, 12, 1), week_key=week_key(week_start),
+        open_text="The kaleidoscopic onboarding portal kept timing out",
+    )
+    db.add(feedback)
+    db.commit()
+    assert matching_ids(db, "kaleidoscopic") == [feedback.id]
+    assert feedback.id in matching_ids(db, "portals")  # Porter stemming
+    assert_index_in_sync(db)
+
+    feedback.open_text = "The labyrinthine onboarding portal kept timing out"
+    db.commit()
+    assert matching_ids(db, "kaleidoscopic") == []
+    assert matching_ids(db, "labyrinthine") == [feedback.id]
+
+    db.delete(feedback)
+    db.commit()
+    assert matching_ids(db, "labyrinthine") == []
+    assert_index_in_sync(db)
+
+
+def test_ingested_feedback_is_searchable(client, auth_headers, ingested, db):
+    expected = sorted(
+        id for (id,) in db.query(Feedback.id).filter(Feedback.open_text.ilike("%laptop%"))
+    )
+    assert expected
+    assert sorted(matching_ids(db, "laptop")) == expected
+    assert_index_in_sync(db)
@@ -0,0 +1,57 @@
+"""
+Keyword counts maintained at ingest equal brute-force counts over the category mappings
+"""
+from collections import Counter
+from app.models.analytics import AnalyticsBatch, AnalyticsLocation, KeywordCount, CATEGORY_CODES, SENTIMENT_CODES
+from app.models.feedback import SentimentCategory
+from app.services.feedback_archive import week_feedback
+from app.services.keyword_index import KeywordIndex, rebuild_keyword_counts
+from app.utils.weeks import week_start_from_key
+
+
+def brute_force_counts(db, keys):
+    """(week, batch, location, category, sentiment, keyword) -> feedback whose mapping matched it"""
+    counts = Counter()
+    for key in keys:
+        for feedback in week_feedback(db, key):
+            sentiment = int(SENTIMENT_CODES[feedback.sentiment_analysis.sentiment_category])
+            for mapping in feedback.category_mappings:
+                for keyword in mapping.keywords_matched or []:
+                    counts[(
+                        key, feedback.training_batch, feedback.location,
+                        CATEGORY_CODES[mapping.category], sentiment, keyword
+                    )] += 1
+    return dict(counts)
+
+
+def stored_counts(db, keys):
+    rows = db.query(
+        KeywordCount.week_key, AnalyticsBatch.name, AnalyticsLocation.name, KeywordCount.category_code,
+        KeywordCount.sentiment_code, KeywordCount.keyword, KeywordCount.mention_count
+    ).join(AnalyticsBatch, AnalyticsBatch.id == KeywordCount.batch_id).join(
+        AnalyticsLocation, AnalyticsLocation.id == KeywordCount.location_id
+    ).filter(KeywordCount.week_key.in_(keys))
+    return {tuple(row[:6]): row.mention_count for row in rows if row.mention_count}
+
+
+def test_keyword_counts_match_the_raw_rows(ingested, db):
+    assert stored_counts(db, ingested) == brute_force_counts(db, ingested)
+
+
+def test_top_keywords_match_the_raw_rows(ingested, db):
+    expected = Counter()
+    for (_, _, _, _, sentiment, keyword), count in brute_force_counts(db, ingested).items():
+        if sentiment == SENTIMENT_CODES[SentimentCategory.NEGATIVE]:
+            expected[keyword] += count
+
+    top = KeywordIndex(db).trend(
+        week_start_from_key(ingested[-1]), len(ingested), SentimentCategory.NEGATIVE, None, len(expected)
+    )
+    assert expected
+    assert {item["keyword"]: item["total"] for item in top} == dict(expected)
+
+
+def test_rebuilt_counts_equal_the_incremental_ones(ingested, db):
+    incremental = stored_counts(db, ingested)
+    rebuild_keyword_counts(db, ingested)
+    assert stored_counts(db, ingested) == incremental
@@ -0,0 +1,68 @@
+"""
+Keyset pagination returns every row exactly once and rejects malformed cursors
+"""
+import pytest
+from app.models.feedback import Feedback
+from app.models.report import WeeklyReport
+from app.utils.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor
+from app.utils.weeks import week_start_from_key
+
+
+def collect_pages(client, url, headers, params):
+    rows, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200, response.text
+        rows.extend(response.json())
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return rows, pages
+
+
+def test_feedback_pages_cover_every_row_once(client, auth_headers, ingested, db):
+    rows, pages = collect_pages(client, "/api/v1/feedback/", auth_headers, {"limit": 7})
+    ids = [row["id"] for row in rows]
+
+    assert pages > 1
+    assert ids == sorted(id for (id,) in db.query(Feedback.id))
+
+
+def test_report_pages_cover_every_report_once(client, auth_headers, ingested, db):
+    for key in ingested:
+        client.post(
+            "/api/v1/reports/weekly/generate",
+            params={"week_start": week_start_from_key(key).isoformat()}, headers=auth_headers
+        )
+    rows, pages = collect_pages(client, "/api/v1/reports/weekly", auth_headers, {"limit": 2})
+    ids = [row["id"] for row in rows]
+
+    assert pages > 1
+    assert ids == [
+        id for (id,) in db.query(WeeklyReport.id).order_by(
+            WeeklyReport.week_start_date.desc(), WeeklyReport.id.desc()
+        )
+    ]
+
+
+@pytest.mark.parametrize("url, cursor", [
+    ("/api/v1/feedback/", "not a cursor"),
+    ("/api/v1/feedback/", encode_cursor(["1"])),  # String for an integer id
+    ("/api/v1/feedback/", encode_cursor([1, 2])),  # Wrong length
+    ("/api/v1/feedback/", encode_cursor([True])),
+    ("/api/v1/reports/weekly", encode_cursor(["2024-11-25T00:00:00", 1])),  # Datetime not in {"dt": ...} form
+    ("/api/v1/reports/weekly", encode_cursor([{"dt": "yesterday"}, 1])),
+    ("/api/v1/feedback/search", encode_cursor(["0.5", 1])),  # String relevance
+])
+def test_malformed_cursors_are_rejected(client, auth_headers, ingested, url, cursor):
+    params = {"cursor": cursor, **({"q": "trainer"} if url.endswith("search") else {})}
+    assert client.get(url, params=params, headers=auth_headers).status_code == 400
+
+
+@pytest.mark.parametrize("url", ["/api/v1/feedback/", "/api/v1/reports/weekly"])
+def test_skip_and_limit_are_checked(client, auth_headers, ingested, url):
+    cursor = client.get(url, params={"limit": 1}, headers=auth_headers).headers[NEXT_CURSOR_HEADER]
+    assert client.get(url, params={"cursor": cursor, "skip": 1}, headers=auth_headers).status_code == 400
+    assert client.get(url, params={"cursor": cursor, "skip": 0}, headers=auth_headers).status_code == 200
+    for limit in (0, -1, MAX_PAGE_SIZE + 1):
+        assert client.get(url, params={"limit": limit}, headers=auth_headers).status_code == 422
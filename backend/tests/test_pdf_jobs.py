@@ -0,0 +1,79 @@
+"""
+PDF renders are single-flight per report version and served from the cache afterwards
+"""
+import asyncio
+import pytest
+from app.models.report import WeeklyReport
+from app.services import pdf_cache
+from app.services.pdf_jobs import READY, RenderQueue
+from app.utils.weeks import week_start_from_key
+
+
+@pytest.fixture
+def report_id(client, auth_headers, ingested):
+    response = client.post(
+        "/api/v1/reports/weekly/generate",
+        params={"week_start": week_start_from_key(ingested[-1]).isoformat()}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    report_id = response.json()["id"]
+    # Let the pre-render queued by generate finish, then empty the cache
+    assert client.get(f"/api/v1/reports/export/pdf/{report_id}", headers=auth_headers).status_code == 200
+    for path in pdf_cache.pdf_directory().glob("*.pdf"):
+        path.unlink()
+    return report_id
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Report ids rendered (cache misses) while the test runs"""
+    rendered = []
+    render = pdf_cache._render
+
+    def counting_render(db, report, version):
+        rendered.append(report.id)
+        return render(db, report, version)
+
+    monkeypatch.setattr(pdf_cache, "_render", counting_render)
+    return rendered
+
+
+def test_concurrent_requests_render_once(report_id, renders, db):
+    report = db.get(WeeklyReport, report_id)
+    updated_at = report.updated_at
+
+    async def request_twice():
+        queue = RenderQueue(max_pending=8, max_kept=8)
+        first, second = queue.submit(report), queue.submit(report)
+        assert first is second
+        return await asyncio.gather(queue.wait(first), queue.wait(second))
+
+    first, second = asyncio.run(request_twice())
+    assert first.status == second.status == READY
+    assert renders == [report_id]
+
+    db.expire_all()
+    report = db.get(WeeklyReport, report_id)
+    assert report.pdf_path == first.path
+    assert report.updated_at == updated_at  # Cache bookkeeping leaves the report's validators alone
+
+
+def test_cached_pdfs_are_not_rendered_again(client, auth_headers, report_id, renders):
+    url = f"/api/v1/reports/export/pdf/{report_id}"
+    first = client.get(url, headers=auth_headers)
+    second = client.get(url, headers=auth_headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.content.startswith(b"%PDF")
+    assert renders == [report_id]
+
+
+def test_queued_jobs_share_an_id(client, auth_headers, report_id):
+    url = f"/api/v1/reports/export/pdf/{report_id}"
+    first = client.post(url, headers=auth_headers)
+    second = client.post(url, headers=auth_headers)
+
+    assert first.status_code == second.status_code == 202
+    assert first.json()["job_id"] == second.json()["job_id"]
+    assert client.get(f"/api/v1/reports/export/pdf/{report_id}", headers=auth_headers).status_code == 200
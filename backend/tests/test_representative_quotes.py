@@ -0,0 +1,92 @@
+"""
+Stored representative quotes equal a brute-force ranking of the raw rows
+"""
+from collections import defaultdict
+from datetime import date
+import pytest
+from app.models.analytics import AnalyticsBatch, AnalyticsLocation, RepresentativeQuote, SENTIMENT_CODES
+from app.models.feedback import FeedbackCategory
+from app.services.feedback_archive import week_feedback
+from app.services.representative_quotes import QUOTES_PER_CELL, quote_text, rebuild_quotes
+from app.utils.weeks import week_key
+
+CATEGORY_TOPICS = [category.value for category in FeedbackCategory]
+
+
+def brute_force_quotes(db, keys):
+    """(week, batch, location, sentiment, category) -> best (feedback id, score), best first"""
+    candidates = defaultdict(list)
+    for key in keys:
+        for feedback in week_feedback(db, key):
+            if not feedback.open_text:
+                continue
+            analysis = feedback.sentiment_analysis
+            cell = (key, feedback.training_batch, feedback.location, int(SENTIMENT_CODES[analysis.sentiment_category]))
+            for mapping in feedback.category_mappings:
+                score = (analysis.confidence_score or 0.0) * (mapping.relevance_score or 0.0)
+                candidates[(*cell, mapping.category.value)].append((score, feedback.id, quote_text(feedback.open_text)))
+
+    best = {}
+    for cell, quotes in candidates.items():
+        texts, kept = set(), []
+        for score, feedback_id, text in sorted(quotes, key=lambda quote: (-quote[0], quote[1])):
+            if text not in texts and len(kept) < QUOTES_PER_CELL:
+                texts.add(text)
+                kept.append((feedback_id, score))
+        best[cell] = kept
+    return best
+
+
+def stored_quotes(db, keys):
+    cells = defaultdict(list)
+    for *cell, feedback_id, score in db.query(
+        RepresentativeQuote.week_key, AnalyticsBatch.name, AnalyticsLocation.name, RepresentativeQuote.sentiment_code,
+        RepresentativeQuote.topic, RepresentativeQuote.feedback_id, RepresentativeQuote.score
+    ).join(AnalyticsBatch, AnalyticsBatch.id == RepresentativeQuote.batch_id).join(
+        AnalyticsLocation, AnalyticsLocation.id == RepresentativeQuote.location_id
+    ).filter(RepresentativeQuote.week_key.in_(keys), RepresentativeQuote.topic.in_(CATEGORY_TOPICS)):
+        cells[tuple(cell)].append((feedback_id, score))
+    return {cell: sorted(quotes, key=lambda quote: (-quote[1], quote[0])) for cell, quotes in cells.items()}
+
+
+def test_category_quotes_match_the_raw_rows(ingested, db):
+    stored = stored_quotes(db, ingested)
+    expected = brute_force_quotes(db, ingested)
+
+    assert stored.keys() == expected.keys()
+    for cell, quotes in expected.items():
+        assert [feedback_id for feedback_id, _ in stored[cell]] == [feedback_id for feedback_id, _ in quotes], cell
+        assert [score for _, score in stored[cell]] == pytest.approx([score for _, score in quotes])
+
+
+def test_rebuilt_quotes_equal_the_incremental_ones(ingested, db):
+    incremental = stored_quotes(db, ingested)
+    rebuild_quotes(db, ingested)
+    assert stored_quotes(db, ingested) == incremental
+
+
+def upload_rows(client, auth_headers, texts):
+    lines = ["trainee_id,location,training_batch,category_tags,rating_score,open_text,week_start_date,week_end_date"]
+    lines += [
+        f'T{index:03d},Chennai,L1-2024-Q9,infrastructure,1,"{text}",2024-12-02,2024-12-08'
+        for index, text in enumerate(texts)
+    ]
+    response = client.post(
+        "/api/v1/feedback/upload", files={"file": ("quotes.csv", "\n".join(lines).encode(), "text/csv")},
+        headers=auth_headers
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_cells_are_pruned_to_their_best_quotes_across_ingests(client, auth_headers, ingested, db):
+    problems = ["laptop keeps freezing", "network is down again", "projector is broken", "wifi drops every hour"]
+    upload_rows(client, auth_headers, [f"Terrible week, the {problem} and nobody fixes it" for problem in problems * 2])
+    upload_rows(client, auth_headers, [f"Awful, the {problem} in the lab, very frustrating" for problem in problems])
+
+    key = week_key(date(2024, 12, 2))
+    expected = brute_force_quotes(db, [key])
+    assert max(len(quotes) for quotes in expected.values()) == QUOTES_PER_CELL
+    stored = stored_quotes(db, [key])
+    assert {cell: [feedback_id for feedback_id, _ in quotes] for cell, quotes in stored.items()} == {
+        cell: [feedback_id for feedback_id, _ in quotes] for cell, quotes in expected.items()
+    }
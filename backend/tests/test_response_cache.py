@@ -0,0 +1,66 @@
+"""
+Response cache tiers and ingest-driven invalidation of cached analysis responses
+"""
+import pytest
+from app.services.data_versions import bump_week_versions
+from app.services.response_cache import DictRemoteTier, LRUTier, ResponseCache, response_cache
+from app.utils.weeks import week_start_from_key
+
+
+class BrokenTier:
+    def get(self, key):
+        raise ConnectionError("down")
+
+    def set(self, key, value, ex=None):
+        raise ConnectionError("down")
+
+
+def test_remote_hits_are_copied_to_the_local_tier():
+    cache = ResponseCache(LRUTier(1), DictRemoteTier())
+    cache.set("a", "1")
+    cache.set("b", "2")  # Evicts "a" from the one-entry LRU
+
+    assert cache.local.get("a") is None
+    assert cache.get("a") == "1"
+    assert cache.local.get("a") == "1"
+
+
+def test_an_unavailable_remote_tier_degrades_to_the_local_tier():
+    cache = ResponseCache(LRUTier(4), BrokenTier())
+    cache.set("a", "1")
+
+    assert cache.get("a") == "1"
+    assert cache.get("missing") is None
+
+
+@pytest.fixture
+def shared_tier():
+    remote, response_cache.remote = response_cache.remote, DictRemoteTier()
+    response_cache.clear()
+    try:
+        yield response_cache.remote
+    finally:
+        response_cache.remote = remote
+        response_cache.clear()
+
+
+def test_cached_responses_are_shared_and_invalidated_by_a_version_bump(client, auth_headers, ingested, db, shared_tier):
+    params = {"week_start": week_start_from_key(ingested[-1]).date().isoformat()}
+    url = "/api/v1/analysis/8-week-trends"
+
+    first = client.get(url, params=params, headers=auth_headers)
+    assert first.status_code == 200
+    assert len(shared_tier.store) == 1
+
+    # Another process: its local tier is empty, the shared tier serves the response
+    response_cache.clear()
+    again = client.get(url, params=params, headers=auth_headers)
+    assert again.json() == first.json()
+    assert len(shared_tier.store) == 1
+    assert len(response_cache.local) == 1
+
+    bump_week_versions(db, [ingested[-1]])
+    db.commit()
+    after_bump = client.get(url, params=params, headers=auth_headers)
+    assert after_bump.json() == first.json()
+    assert len(shared_tier.store) == 2  # Recomputed under a new key
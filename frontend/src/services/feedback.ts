@@ -1,5 +1,7 @@
 import api from './api'
-import { Feedback, WeeklyReport, TrendData, Insight } from '../types'
+import { Feedback, WeeklyReport, TrendData, Insight, PdfExportJob } from '../types'
+
+const PDF_POLL_INTERVAL_MS = 1000
 
 export const feedbackService = {
   uploadFile: async (file: File) => {
@@ -111,8 +113,17 @@ export const syncService = {
 }
 
 export const pdfService = {
+  // Queues the render, polls until it is ready, then downloads it
   exportPDF: async (week_id: number): Promise<Blob> => {
-    const response = await api.get(`/reports/export/pdf/${week_id}`, {
+    let job: PdfExportJob = (await api.post(`/reports/export/pdf/${week_id}`)).data
+    while (job.status === 'queued' || job.status === 'rendering') {
+      await new Promise((resolve) => setTimeout(resolve, PDF_POLL_INTERVAL_MS))
+      job = (await api.get(`/reports/export/jobs/${job.job_id}`)).data
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'PDF rendering failed')
+    }
+    const response = await api.get(`/reports/export/jobs/${job.job_id}/pdf`, {
       responseType: 'blob',
     })
     return response.data
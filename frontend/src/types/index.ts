@@ -110,3 +110,14 @@ export interface Insight {
   }
 }
 
+
+export interface PdfExportJob {
+  job_id: string
+  report_id: number
+  status: 'queued' | 'rendering' | 'ready' | 'failed'
+  position: number
+  error?: string
+  created_at: string
+  started_at?: string
+  finished_at?: string
+}